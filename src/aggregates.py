@@ -0,0 +1,515 @@
+# imports
+import numpy as np
+import pandas as pd
+
+from sketches import QuantileSketch
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Module states in the order the Canvas export moves a student through them
+module_states = ["locked", "unlocked", "started", "completed"]
+
+# Relative accuracy of the time to complete quantiles
+duration_accuracy = 0.01
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def _string_keys(aggregate, keys):
+    """
+    Returns the aggregate indexed by its keys as plain strings
+
+    String keys match the dropdown values and the module_dict keys.
+    """
+    aggregate = aggregate.reset_index()
+    aggregate[keys] = aggregate[keys].astype(str)
+    return aggregate.set_index(keys)
+
+
+# -------------------------------------------------------------
+########################
+#  AGGREGATE BUILDERS  #
+########################
+def build_state_cube(df):
+    """
+    Returns the distinct student counts per course, module and state
+
+    The cube is built once when the data is loaded so that the module
+    percentages can be read back without re-filtering the raw rows.
+
+    Inputs
+    ------
+    df: dataframe, module data as read from the module_data.csv export, or
+        the module_progress table of its StarSchema
+
+    Returns
+    -------
+    cube: dataframe, indexed by (course_id, module_id) as strings with one
+          column of distinct student counts per state and a 'total' column
+          holding the distinct students in the module
+    """
+    keys = ["course_id", "module_id"]
+
+    counts = df.groupby(
+        keys + ["state"], observed=True, sort=False
+    ).student_id.nunique()
+    totals = df.groupby(keys, observed=True, sort=False).student_id.nunique()
+    return _finish_state_cube(counts, totals)
+
+
+def _finish_state_cube(counts, totals):
+    """
+    Returns the state cube of distinct student counts, sorted and string keyed
+
+    Inputs
+    ------
+    counts: series, distinct students indexed by (course_id, module_id, state)
+    totals: series, distinct students indexed by (course_id, module_id)
+    """
+    keys = ["course_id", "module_id"]
+
+    cube = counts.unstack("state", fill_value=0)
+    cube.columns = cube.columns.astype(str)
+    cube = cube.reindex(columns=module_states, fill_value=0)
+    cube["total"] = totals
+
+    cube.columns.name = None
+
+    # rows in module code order, see DimensionIndex.aggregate_slices
+    cube = cube.sort_index(level="module_id", sort_remaining=False)
+    return _string_keys(cube, keys)
+
+
+def build_completion_timeline(df):
+    """
+    Returns the cumulative distinct completers per module and day
+
+    Each student is counted once, on the day they completed the module, and
+    the daily counts are accumulated per module so the value on a date is
+    the number of students who completed the module by the end of that day.
+    Rows are sorted by date so a date range is a contiguous slice.
+
+    Inputs
+    ------
+    df: dataframe, module data as read from the module_data.csv export, or
+        the module_progress table of its StarSchema
+
+    Returns
+    -------
+    timeline: dataframe, with columns 'date' (datetime normalised to midnight),
+              'module_id' (str), 'completers' (cumulative distinct students)
+              and 'total' (distinct students in the module)
+    """
+    completed = df.loc[
+        (df.state == "completed") & df.completed_at.notna(),
+        ["module_id", "student_id", "completed_at"],
+    ]
+
+    first_completion = (
+        completed.groupby(["module_id", "student_id"], observed=True)
+        .completed_at.min()
+        .dt.normalize()
+        .rename("date")
+        .reset_index()
+    )
+
+    daily = first_completion.groupby(["module_id", "date"], observed=True).size()
+    module_totals = df.groupby("module_id", observed=True).student_id.nunique()
+    return _finish_completion_timeline(daily, module_totals)
+
+
+def _finish_completion_timeline(daily, module_totals):
+    """
+    Returns the completion timeline of the daily first completions
+
+    Inputs
+    ------
+    daily: series, students completing a module for the first time indexed
+           by (module_id, date), sorted by date within each module
+    module_totals: series, distinct students per module id
+    """
+    completers = daily.groupby(level="module_id", observed=True).cumsum()
+
+    timeline = completers.rename("completers").reset_index()
+    timeline["total"] = timeline.module_id.map(module_totals).astype(int)
+    timeline["module_id"] = timeline.module_id.astype(str)
+
+    timeline = timeline.sort_values(["date", "module_id"], kind="stable")
+    return timeline[["date", "module_id", "completers", "total"]].reset_index(drop=True)
+
+
+def completion_window(timeline, start_date, end_date):
+    """
+    Returns the rows of the completion timeline between two dates (inclusive)
+
+    Inputs
+    ------
+    timeline: dataframe, as returned by build_completion_timeline
+    start_date: datetime.date, first date of the window, None or NaT for
+                the first date of the timeline
+    end_date: datetime.date, last date of the window, None or NaT for the
+              last date of the timeline
+
+    Returns
+    -------
+    timeline: dataframe, contiguous slice of the timeline
+    """
+    dates = timeline["date"].to_numpy()
+
+    def bound(date, side, default):
+        if pd.isna(date):
+            return default
+        return dates.searchsorted(
+            np.datetime64(pd.Timestamp(date)).astype(dates.dtype), side=side
+        )
+
+    lo = bound(start_date, "left", 0)
+    hi = bound(end_date, "right", len(dates))
+    return timeline.iloc[lo:hi]
+
+
+def build_item_completion(df):
+    """
+    Returns the distinct students who completed each item of each module
+
+    Items are keyed by id so that items sharing a title do not collide, and
+    the denominator is the number of students in the item's module.
+
+    Inputs
+    ------
+    df: dataframe, module data as read from the module_data.csv export
+
+    Returns
+    -------
+    items: dataframe, indexed by (module_id, items_id) as strings and sorted
+           by item position within each module, with columns 'items_title',
+           'items_position', 'completers' and 'total'
+    """
+    keys = ["module_id", "items_id"]
+
+    items = df.groupby(keys, observed=True, sort=False).agg(
+        items_title=("items_title", "first"),
+        items_position=("items_position", "first"),
+    )
+    completed = df[df.item_cp_req_completed == True]
+    items["completers"] = (
+        completed.groupby(keys, observed=True)
+        .student_id.nunique()
+        .reindex(items.index, fill_value=0)
+    )
+
+    module_totals = df.groupby("module_id", observed=True).student_id.nunique()
+    return _finish_item_completion(items, module_totals)
+
+
+def build_schema_item_completion(schema):
+    """
+    Returns the item completion of module data split into a StarSchema
+
+    Reads the item_progress fact table, whose rows point at the items table,
+    and gives the same result as build_item_completion on the module data.
+
+    Inputs
+    ------
+    schema: StarSchema, of the module data
+
+    Returns
+    -------
+    items: dataframe, as returned by build_item_completion
+    """
+    facts = schema.item_progress
+    completed = facts[facts.completed]
+
+    keys = ["module_id", "items_id"]
+    items = schema.items[keys + ["items_title", "items_position"]].set_index(keys)
+    items["completers"] = (
+        completed.groupby("item")
+        .student_id.nunique()
+        .reindex(range(len(items)), fill_value=0)
+        .to_numpy()
+    )
+
+    module_totals = schema.module_progress.groupby(
+        "module_id", observed=True
+    ).student_id.nunique()
+    return _finish_item_completion(items, module_totals)
+
+
+def _finish_item_completion(items, module_totals):
+    """
+    Returns the item completion counts with module totals, sorted and string keyed
+
+    Inputs
+    ------
+    items: dataframe, indexed by categorical (module_id, items_id) with columns
+           'items_title', 'items_position' and 'completers'
+    module_totals: series, distinct students per module id
+    """
+    items["items_title"] = items.items_title.astype(str)
+    items["total"] = items.index.get_level_values("module_id").map(module_totals)
+
+    # rows in module code order, see DimensionIndex.aggregate_slices
+    items = items.sort_values(["module_id", "items_position"], kind="stable")
+    return _string_keys(items, ["module_id", "items_id"])
+
+
+def completion_durations(enrollments):
+    """
+    Returns the seconds from unlock to completion of completed enrollments
+
+    Inputs
+    ------
+    enrollments: dataframe, with 'module_id', 'state', 'unlock_at' and
+                 'completed_at' columns
+
+    Returns
+    -------
+    durations: series, seconds indexed like the completed enrollments that
+               have both timestamps
+    """
+    done = enrollments[
+        (enrollments.state == "completed")
+        & enrollments.unlock_at.notna()
+        & enrollments.completed_at.notna()
+    ]
+    return (done.completed_at - done.unlock_at).dt.total_seconds()
+
+
+def build_duration_sketches(df):
+    """
+    Returns a quantile sketch of the time to complete of every module
+
+    Inputs
+    ------
+    df: dataframe, module data as read from the module_data.csv export, or
+        the module_progress table of its StarSchema
+
+    Returns
+    -------
+    sketches: dict, module id (str) to the QuantileSketch of the seconds its
+              students took from unlock to completion, modules without
+              timed completions have an empty sketch
+    """
+    # module state and timestamps repeat on every item row of a student
+    enrollments = df[["module_id", "student_id", "state", "unlock_at", "completed_at"]]
+    enrollments = enrollments.drop_duplicates(["module_id", "student_id"])
+
+    sketches = {
+        str(module): QuantileSketch(duration_accuracy)
+        for module in enrollments.module_id.unique()
+    }
+    return _add_durations(sketches, enrollments)
+
+
+def _add_durations(sketches, enrollments):
+    """
+    Adds the durations of enrollments to the sketch of their module
+    """
+    durations = completion_durations(enrollments)
+    modules = enrollments.module_id.loc[durations.index]
+
+    for module, seconds in durations.groupby(modules.astype(str).to_numpy()):
+        sketches.setdefault(module, QuantileSketch(duration_accuracy)).add(seconds)
+    return sketches
+
+
+def select_modules(aggregate, module, module_slices=None):
+    """
+    Returns the rows of a module keyed aggregate for a single module or all modules
+
+    Inputs
+    ------
+    aggregate: dataframe, as returned by build_state_cube or build_item_completion
+    module: str, module id as selected in the dropdown or 'All'
+    module_slices: dict, optional, module id to row slice as returned by
+                   DimensionIndex.aggregate_slices. Without it the module
+                   index level is compared instead of sliced.
+
+    Returns
+    -------
+    aggregate: dataframe, subset of the aggregate
+    """
+    if module == "All":
+        return aggregate
+
+    if module_slices is None:
+        return aggregate[aggregate.index.get_level_values("module_id") == module]
+
+    return aggregate.iloc[module_slices.get(module, slice(0, 0))]
+
+
+def state_percentages(cube, states=("unlocked", "started", "completed")):
+    """
+    Returns the percentage of students per state for every module in the cube
+
+    Inputs
+    ------
+    cube: dataframe, as returned by build_state_cube
+    states: iterable of str, states to compute the percentage for
+
+    Returns
+    -------
+    percentages: dataframe, indexed like the cube, one column per state
+    """
+    states = list(states)
+    return cube[states].div(cube["total"], axis=0).fillna(0.0) * 100
+
+
+# -------------------------------------------------------------
+########################
+#  STREAMING           #
+########################
+class AggregateAccumulator:
+    """
+    Dimension dictionaries and aggregates updated one chunk of rows at a time
+
+    Lets an export larger than memory be summarised in a single pass: each
+    chunk is folded into one row per (student, module) enrollment, holding
+    its state and completion time, and one row per item, holding its
+    completed row count, before the chunk is released. Memory is bounded by
+    the chunk size plus the enrollments and items, not by the item rows of
+    every student.
+
+    Item completion adds up completed rows, which counts distinct students
+    since the export holds one row per student and item.
+    """
+
+    enrollment_cols = [
+        "course_id",
+        "module_id",
+        "student_id",
+        "state",
+        "unlock_at",
+        "completed_at",
+    ]
+    item_keys = ["course_id", "module_id", "items_id"]
+
+    def __init__(self):
+        self.rows = 0
+
+        # id (str) to the name carried by the export
+        self.course_names, self.module_names, self.item_titles, self.student_names = (
+            {} for _ in range(4)
+        )
+
+        # (module id, student id) of every enrollment seen, and the frames of
+        # the enrollments each chunk added
+        self._seen = set()
+        self._enrollments = []
+
+        # (course id, module id, item id) to its title, position and completers
+        self._items = {}
+
+        # course id to module id to the sketch of its time to complete
+        self._durations = {}
+
+    def update(self, chunk):
+        """
+        Folds a chunk of module data rows into the dictionaries and aggregates
+
+        Only the rows of the chunk are scanned: enrollments already seen are
+        found in a set of their keys and item counts are added in place, so
+        each chunk costs the same however many came before it.
+
+        Inputs
+        ------
+        chunk: dataframe, rows of a module_data.csv export with completed_at
+               parsed as datetime
+        """
+        self.rows += len(chunk)
+
+        for key, label, names in (
+            ("course_id", "course_name", self.course_names),
+            ("module_id", "module_name", self.module_names),
+            ("items_id", "items_title", self.item_titles),
+            ("student_id", "student_name", self.student_names),
+        ):
+            pairs = chunk[[key, label]].drop_duplicates(key, keep="last")
+            names.update(zip(pairs[key].astype(str), pairs[label]))
+
+        # module state and completion time repeat on every item row of a student
+        enrollments = chunk[self.enrollment_cols].drop_duplicates(
+            ["module_id", "student_id"]
+        )
+        keys = list(zip(enrollments.module_id, enrollments.student_id))
+        new = enrollments[[key not in self._seen for key in keys]]
+        self._seen.update(keys)
+
+        # the enrollments first seen in this chunk are added to the sketches
+        for course, course_enrollments in new.groupby(
+            new.course_id.astype(str).to_numpy()
+        ):
+            _add_durations(self._durations.setdefault(course, {}), course_enrollments)
+        self._enrollments.append(new)
+
+        items = (
+            chunk.assign(completers=chunk.item_cp_req_completed == True)
+            .groupby(self.item_keys, sort=False)
+            .agg(
+                items_title=("items_title", "first"),
+                items_position=("items_position", "first"),
+                completers=("completers", "sum"),
+            )
+        )
+        for key, title, position, completers in zip(
+            items.index, items.items_title, items.items_position, items.completers
+        ):
+            if key in self._items:
+                self._items[key][2] += int(completers)
+            else:
+                self._items[key] = [title, position, int(completers)]
+
+    def course_tables(self):
+        """
+        Yields the course id and the aggregate tables of every course
+
+        The tables are the ones build_state_cube, build_completion_timeline,
+        build_item_completion and build_duration_sketches return for the rows
+        of the course.
+
+        Returns
+        -------
+        course_id: str
+        tables: dict, 'state_cube', 'completion_timeline', 'item_completion'
+                and 'duration_sketches'
+        """
+        if not self._enrollments:
+            return
+
+        enrollments = pd.concat(self._enrollments, ignore_index=True)
+        items = pd.DataFrame(
+            [(*key, *values) for key, values in self._items.items()],
+            columns=self.item_keys + ["items_title", "items_position", "completers"],
+        )
+        for col in ["course_id", "module_id", "student_id"]:
+            enrollments[col] = enrollments[col].astype("category")
+        for col in self.item_keys:
+            items[col] = items[col].astype("category")
+
+        for course, course_enrollments in enrollments.groupby(
+            "course_id", observed=True
+        ):
+            course_items = (
+                items[items.course_id == course]
+                .drop(columns="course_id")
+                .set_index(["module_id", "items_id"])
+            )
+            module_totals = course_enrollments.groupby(
+                "module_id", observed=True
+            ).student_id.nunique()
+
+            yield str(course), {
+                "state_cube": build_state_cube(course_enrollments),
+                "completion_timeline": build_completion_timeline(course_enrollments),
+                "item_completion": _finish_item_completion(course_items, module_totals),
+                "duration_sketches": {
+                    str(module): self._durations.get(str(course), {}).get(
+                        str(module), QuantileSketch(duration_accuracy)
+                    )
+                    for module in module_totals.index
+                },
+            }
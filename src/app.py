@@ -1,776 +1,1142 @@
 # imports
-from dash import dash, html, dcc, Input, Output
+from dash import dash, html, dcc, Input, Output, Patch
 import dash_bootstrap_components as dbc
 import dash
 from dash import dash_table
-from dash.dependencies import Input, Output, State
-import re
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import Response
+import functools
+import logging
+import os
+import time
 
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.io as pio
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
-from collections import defaultdict
+from aggregates import completion_durations, select_modules
+from dataset import DatasetStore, PhaseTimer, StatusWatcher, format_seconds
+from figure_cache import FigureCache
+from figures import (
+    item_completion_barplot,
+    lineplot_window_points,
+    module_completion_barplot,
+    module_completion_lineplot,
+    module_completion_table,
+    module_duration_boxplot,
+    parse_date,
+    student_completion_scatter,
+    student_completion_table,
+    student_duration_scatter,
+    student_item_scatter,
+    student_module_scatter,
+)
+from metrics import callback_metrics
+from shards import CourseShardStore, default_data_dir, shard_status_path
+from sketches import exact_box_stats
+from sqlstore import SqlStore
 
 from datetime import *
 import datetime
 
+# Optional: runs the heavy figure callbacks as background jobs, see README
+try:
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:
+    diskcache = None
+
+# Optional: gzip compresses the responses, which are sent uncompressed
+# without it, see the payload budget in figures.py
+try:
+    import flask_compress
+except ImportError:
+    flask_compress = None
+
 pio.renderers.default = "iframe"
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds spent in each phase of the start up, logged once it is done
+startup_seconds = {}
+startup_timer = PhaseTimer(startup_seconds)
 # -----------------------------------------------------------
 
 external_stylesheets = [dbc.themes.BOOTSTRAP]
 
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+app = dash.Dash(
+    __name__,
+    external_stylesheets=external_stylesheets,
+    compress=flask_compress is not None,
+)
+if flask_compress is None:
+    logger.warning(
+        "Sending the responses uncompressed: gzip needs pip install flask-compress"
+    )
 
 
 # ---------------------------------------------------
 # reading the data
-data = pd.read_csv("../data/SAMPLE_module_data.csv")
-
-# dtype conversion
-categorical_cols = [
-    "course_id",
-    "module_id",
-    "module_name",
-    "state",
-    "student_id",
-    "student_name",
-    "items_id",
-    "items_title",
-    "items_type",
-    "items_module_id",
-    "item_cp_req_type",
-    "item_cp_req_completed",
-    "course_name",
-]
-
-# convert the timestamp to datetime format
-# fix the column data types
-data["completed_at"] = pd.to_datetime(data["completed_at"])
-for col in categorical_cols:
-    data[col] = data[col].astype("category")
+# A snapshot written by `python snapshot.py ../data/SAMPLE_module_data.csv`
+# is loaded instead of the csv when it is up to date
+data_path = "../data/SAMPLE_module_data.csv"
+status_path = "../data/SAMPLE_status.csv"
+
+# The export and canvas.py write one folder per course (see data/INFO.txt),
+# listed in the status.csv next to them. Once the status lists a course with a
+# folder, courses are loaded on first use instead of reading data_path at once.
+data_dir = default_data_dir
+shard_status = shard_status_path(data_dir)
+
+# Bytes of course datasets kept in memory when courses are loaded on first use
+shard_memory_budget = 2 * 1024**3
+
+# A database written by `python sqlstore.py ../data/SAMPLE_module_data.csv`
+# keeps the rows on disk for exports larger than memory. When it exists the
+# aggregates are queried from it and only they are held in memory.
+sql_path = "../data/SAMPLE_module_data.sqlite"
 
 
 # -----------------------------------------------------------
 ########################
 #  GLOBAL VARIABLES    #
 ########################
-modules = list(data.module_id.unique())
-total_students = data.student_id.unique().size
-
-# Make a dictionary of module id and module names
-module_dict, item_dict, course_dict, student_dict = (defaultdict(str) for _ in range(4))
-
-for _, row in data.iterrows():
-    module_dict[str(row["module_id"])] = re.sub(
-        r"^Module\s+\d+:\s+", "", row["module_name"]
-    )
-    item_dict[str(row["items_module_id"])] = row["items_title"]
-    course_dict[str(row["course_id"])] = row["course_name"]
-    student_dict[str(row["student_id"])] = row["student_name"]
-
-# Creating a dictionary of items per module
-items_in_module = defaultdict(str)
-
-for module in module_dict.keys():
-    items_in_module[str(module)] = list(
-        data[data.module_id.astype(str) == module].items_title.unique()
-    )
+# The data and the lookup tables derived from it (module_dict, items_in_module,
+# total_students, date bounds, ...) live on one dataset per course held by the
+# store. Callbacks read store.get(course) once so a reload never mixes two versions.
+if os.path.exists(sql_path):
+    store = SqlStore(sql_path, status_path)
+else:
+    store = CourseShardStore(data_dir, shard_status, shard_memory_budget)
+    if not store.courses():
+        store = DatasetStore(data_path, status_path)
+startup_timer.lap("store")
+
+# Seconds between two checks of the status file for a refreshed export
+reload_interval = 60
+
+# Figures already built for a callback, its inputs and the dataset version,
+# at most figure_cache_bytes of JSON per worker. Cached figures are shared
+# between requests and must not be modified.
+figure_cache_bytes = 128 * 1024**2
+figure_cache = FigureCache(max_entries=256, max_bytes=figure_cache_bytes)
+
+# Callbacks slower than this many seconds are logged with their inputs
+slow_callback_seconds = 1.0
+
+# Latency, phase and payload histograms of the callbacks, served on /metrics
+callback_metrics.slow_seconds = slow_callback_seconds
+
+# Module dropdown changes are handled in the browser: the module, item and
+# time to complete figures of every dropdown value are sent once per course
+# into a dcc.Store and the dropdown picks one of them without a request to
+# the server. The store holds three finished figures per module plus 'All',
+# about 160 KB for the 6 modules of the sample export, so its size grows with
+# the number of modules and it is sent again on every course or student
+# change. Set with DASHBOARD_CLIENTSIDE_MODULES=1.
+clientside_modules = os.environ.get("DASHBOARD_CLIENTSIDE_MODULES") == "1"
+
+# The line plot and item barplot callbacks run as background jobs whose
+# results are kept on disk and reused for the same inputs and data version.
+# They need the dash[diskcache] extra (diskcache, multiprocess and psutil),
+# which a plain install of dash lacks. Without it they run in the request
+# thread and a warning is logged at start up, see the README.
+background_callbacks = True
+background_cache_dir = "../data/background_cache"
+
+# Seconds a background result is reused
+background_cache_expire = 3600
+
+# The time to complete box plot of courses with at most this many students is
+# computed from every duration, larger courses read it from the quantile
+# sketch of each module built with the dataset
+exact_box_max_students = 1000
+
+background_manager = None
+if background_callbacks:
+    # DiskcacheManager also imports multiprocess and psutil
+    try:
+        if diskcache is None:
+            raise ImportError("diskcache")
+        background_manager = DiskcacheManager(
+            diskcache.Cache(background_cache_dir),
+            cache_by=[lambda: str(sorted(store.versions().items()))],
+            expire=background_cache_expire,
+        )
+    except ImportError:
+        logger.warning(
+            "Running the figure callbacks in the request: the background "
+            'callbacks need pip install "dash[diskcache]"'
+        )
 
 
 # -------------------------------------------------------------
 ########################
 #  HELPER FUNCTIONS    #
 ########################
-def get_completed_percentage(df, module, state="completed"):
+def get_completed_percentage(cube, module, state="completed"):
     """
-    Returns the state percentage of module in df
-
-    Input:
-    ---------
+    Returns the state percentage of module from the precomputed state cube
 
+    Inputs
+    ------
+    cube: dataframe, distinct student counts as returned by build_state_cube
+    module: str, module id
+    state: str, module state whose percentage is desired
 
-    Returns:
-    ---------
+    Returns
+    -------
+    percentage: float, fraction of the module students in the state
     """
-    df_module = df[df.module_id.astype(str) == module]
+    counts = select_modules(cube, module)
 
-    # df is a subset dataframe that contains a specific module as selected in the dropdown
-    # Thus when other modules are iterated the size of the dataframe will be 0
+    # cube may be a subset that contains a specific module as selected in the dropdown
+    # Thus when other modules are looked up there will be no rows
 
-    if df_module.shape[0] == 0:
+    total_module_students = counts["total"].sum()
+    if total_module_students == 0:
         return 0
 
-    total_module_students = df_module.student_id.unique().size
-    percentage = (
-        df_module[df_module.state == state].student_id.unique().size
-        / total_module_students
-    )
+    percentage = counts[state].sum() / total_module_students
     return percentage
 
 
-def get_completed_percentage_date(df, module, date):
+def get_students_percentage(
+    bitmaps, modules, state="completed", students=None, excluded=()
+):
     """
-    Returns the completed percentage of a module in df until a specified date
+    Returns the state percentage of several modules from the student bitmaps
+
+    A student counts once, when in the state in any of the modules, out of
+    the distinct students of the modules.
 
     Inputs
     ------
-    df: dataframe
-    module: str, name of the module
-    date: datetime.date, date till which the completion percentage of each module is desired
+    bitmaps: StudentBitmaps, of the dataset
+    modules: list of str, module ids
+    state: str, module state whose percentage is desired
+    students: list of str, optional, student ids of a group to restrict to
+    excluded: list of str, module ids, students in the state in any of them
+              are not counted, e.g. modules ["A"] and excluded ["B"] gives
+              the students who completed A but not B
 
     Returns
     -------
-    percentage: float, percentage value
+    percentage: float, fraction of the students of the modules in the state
+    """
+    group = bitmaps.group(students) if students is not None else None
+    return bitmaps.state_percentage(modules, state, group, excluded)
+
 
+def get_completed_percentage_date(timeline, module, date):
     """
+    Returns the completed percentage of a module until a specified date
+
+    Inputs
+    ------
+    timeline: dataframe, as returned by build_completion_timeline
+    module: str, module id
+    date: datetime.date, date till which the completion percentage of each module is desired
 
-    # Convert the date to datetime with time component set to midnight
-    datetime_date = datetime.datetime.combine(date, datetime.datetime.min.time())
+    Returns
+    -------
+    percentage: float, percentage value
 
-    # CHANGE TO MODULE ID INSTEAD OF NAME
-    df_module = df[df.module_id.astype(str) == module]
-    total_module_students = df_module.student_id.unique().size
+    """
+    module_timeline = timeline[
+        (timeline.module_id == module) & (timeline.date <= pd.Timestamp(date))
+    ]
 
-    # If there is not a single row with completion date then we get a datetime error since blanks are not compared to date
-    # In order to get around this edge case, return 0
-    if df_module[df_module.state == "completed"].size == 0:
+    # If there is not a single completion by the date there is nothing to accumulate
+    if module_timeline.shape[0] == 0:
         return 0.0
 
-    percentage = (
-        df_module[
-            (df_module.state == "completed")
-            & (df_module["completed_at"].dt.date <= date)
-        ]
-        .student_id.unique()
-        .size
-        / total_module_students
-    )
+    latest = module_timeline.iloc[-1]
+    percentage = latest["completers"] / latest["total"]
 
     return percentage
 
 
-# ------------------------------------------------------
+# -----------------------------------------------------------------------
 ########################
-#  PLOT FUNCTIONS      #
+#  STYLE LAYOUT        #
 ########################
 
-# Define shared style settings
-axis_label_font_size = 12
 
-# Colors
-# Define custom colors for the bars
-colors = ["#823551", "#1E88E5", "#FFC107", "#5C5934", "#DA981D", "#4F6793"]
+# Define the style for the tabs
+tab_style = {
+    "height": "30px",
+    "padding": "8px",
+}
+
+# Define the style for the selected tab
+selected_tab_style = {
+    "height": "30px",
+    "padding": "3px",
+    "borderTop": "2px solid #13233e",
+    "borderBottom": "2px solid #13233e",
+    "backgroundColor": "#13233e",
+    "color": "white",
+}
+
+# Define header style
+heading_style = {
+    "borderTop": "2px solid #aab4c2",
+    "borderBottom": "2px solid #aab4c2",
+    "backgroundColor": "#aab4c2",
+    "color": "white",
+    "padding": "5px",
+    "text-align": "center",
+}
+
+# Define Tab text style
+text_style = {
+    "font-size": "16px",
+    "font-weight": "bold",
+    "color": "#13233e",
+    "padding": "5px",
+}
+
+
+# Style Html Div
+div_style = {
+    "display": "flex",
+    "justify-content": "center",
+    "align-items": "center",
+}
+
+# dropdpown options
 
 
-def module_completion_table(df):
+def course_options():
     """
-    Returns datatable of student percentage module completion per module
+    Returns the course dropdown options sorted by course name
+    """
+    return [
+        {"label": course_name, "value": course_id}
+        for course_id, course_name in sorted(
+            store.courses().items(), key=lambda course: str(course[1])
+        )
+    ]
 
-    Input:
-    -----------
 
+def is_student(student):
+    """
+    Returns True when a single student is selected in the student dropdown
+    """
+    return student not in (None, "All")
 
-    Returns:
-    -----------
 
+def student_rows(frame, module, dimension_index=None):
     """
-    result = {}
-    modules = list(df.module_id.unique().astype(str))
+    Returns the rows of a student's modules or items for a module dropdown value
 
-    for module in modules:
-        result[module_dict.get(module)] = [
-            round(get_completed_percentage(df, module, "unlocked") * 100, 1),
-            round(get_completed_percentage(df, module, "started") * 100, 1),
-            round(get_completed_percentage(df, module, "completed") * 100, 1),
-        ]
+    The module is resolved to its category code, see DimensionIndex. Without
+    a dimension index, as on the SQL backend, the ids are plain integers.
+    """
+    if module == "All":
+        return frame
+    if dimension_index is None:
+        return frame[frame["module_id"].to_numpy() == int(module)]
 
-    df_mod = (
-        pd.DataFrame(result, index=["unlocked", "started", "completed"])
-        .T.reset_index()
-        .rename(columns={"index": "Module"})
-    )
+    code = dimension_index.code("module", module)
+    return frame[frame["module_id"].cat.codes.to_numpy() == code]
 
-    return df_mod
 
+def module_table(course, dataset, student="All"):
+    """
+    Returns the DataTable data and columns of the module completion table
 
-def module_completion_barplot(df):
+    The table of all students is built once per course and dataset version
+    and shared by the layout and the table callback. The table of a single
+    student is read from the student index instead.
     """
-    Plots a horizontal barplot of student percentage module completion per module
 
-    Input:
-    -----------
+    def build():
+        if is_student(student):
+            table = student_completion_table(
+                dataset.student_index.student_modules(student), dataset.module_dict
+            )
+        else:
+            table = module_completion_table(dataset.state_cube, dataset.module_dict)
+        callback_metrics.lap("frame")
+
+        records = table.to_dict("records")
+        callback_metrics.lap("to_dict")
+        return records, [{"name": col, "id": col} for col in table.columns]
 
+    # A student's views are built from the index in constant time and are not
+    # cached, so browsing students does not evict the course figures
+    if is_student(student):
+        return build()
+    return figure_cache.get_or_build(("module_table", course, dataset.version), build)
 
-    Returns:
-    -----------
 
+def no_progress(progress):
+    """
+    Progress reporter of a callback that is not run in the background
     """
-    result = {}
-    modules = list(df.module_id.unique().astype(str))
 
-    for module in modules:
-        result[module_dict.get(module)] = [
-            round(get_completed_percentage(df, module, "unlocked") * 100, 1),
-            round(get_completed_percentage(df, module, "started") * 100, 1),
-            round(get_completed_percentage(df, module, "completed") * 100, 1),
-        ]
 
-    df_mod = (
-        pd.DataFrame(result, index=["unlocked", "started", "completed"])
-        .T.reset_index()
-        .rename(columns={"index": "Module"})
-    )
+def module_figure(course, dataset, val, student="All"):
+    """
+    Returns the module completion barplot of a module dropdown value, or the
+    module status scatter plot of the selected student
+    """
+    if is_student(student):
+        return student_module_scatter(
+            student_rows(
+                dataset.student_index.student_modules(student),
+                val,
+                dataset.dimension_index,
+            ),
+            dataset.module_dict,
+            dataset.student_dict[student],
+        )
 
-    # Melt the DataFrame to convert columns to rows
-    melted_df = pd.melt(
-        df_mod,
-        id_vars="Module",
-        value_vars=["unlocked", "started", "completed"],
-        var_name="Status",
-        value_name="Percentage Completion",
-    )
+    def build():
+        # if a specific module is selected then look up that module alone, else select all.
+        subset_cube = select_modules(dataset.state_cube, val, dataset.state_cube_slices)
+        return module_completion_barplot(subset_cube, dataset.module_dict)
 
-    # Define the color mapping
-    color_mapping = {
-        "unlocked": "#cafb9c",
-        "started": "#77bc34",
-        "completed": "#0d203e",
-    }
-
-    # Create a horizontal bar chart using Plotly
-    fig_1 = px.bar(
-        melted_df,
-        y="Module",
-        x="Percentage Completion",
-        color="Status",
-        orientation="h",
-        labels={"Percentage Completion": "Percentage Completion (%)"},
-        title="Percentage Completion by Students for Each Module",
-        category_orders={"Module": sorted(melted_df["Module"].unique())},
-        color_discrete_map=color_mapping,  # Set the color mapping
+    return figure_cache.get_or_build(
+        ("update_module", (course, val), dataset.version), build
     )
 
-    fig_1.update_layout(
-        showlegend=True,  # Show the legend indicating the module status colors
-        legend_title="Status",  # Customize the legend title,
-        legend_traceorder="reversed",  # Reverse the order of the legend items
-    )
 
-    # Modify the plotly configuration to change the background color
-    fig_1.update_layout(
-        plot_bgcolor="rgb(255, 255, 255)",
-        xaxis=dict(title_font=dict(size=axis_label_font_size)),
-        yaxis=dict(title_font=dict(size=axis_label_font_size)),
-    )
+def items_figure(course, dataset, val, student="All", progress=no_progress):
+    """
+    Returns the item completion barplot of a module dropdown value, or the
+    item completion scatter plot of the selected student
+    """
+    if is_student(student):
+        return student_item_scatter(
+            student_rows(
+                dataset.student_index.student_items(student),
+                val,
+                dataset.dimension_index,
+            ),
+            dataset.module_dict,
+            dataset.student_dict[student],
+        )
 
-    # Convert the figure to a JSON serializable format
-    fig_1_json = fig_1.to_dict()
+    def build():
+        progress((1, 3))
+        # if a specific module is selected then look up the items that belong to that module alone, else select all
+        subset_items = select_modules(
+            dataset.item_completion, val, dataset.item_completion_slices
+        )
+        progress((2, 3))
+        return item_completion_barplot(subset_items, dataset.module_dict)
 
-    return fig_1_json
+    fig = figure_cache.get_or_build(
+        ("update_items", (course, val), dataset.version), build
+    )
+    progress((3, 3))
+    return fig
 
 
-def module_completion_lineplot(df, start_date, end_date):
+def durations_figure(course, dataset, val, student="All"):
+    """
+    Returns the time to complete box plot of a module dropdown value, or the
+    time to complete scatter plot of the selected student
     """
-    Return a lineplot showing the percentage completion by data
-    of each module
+    if is_student(student):
+        return student_duration_scatter(
+            student_rows(
+                dataset.student_index.student_modules(student),
+                val,
+                dataset.dimension_index,
+            ),
+            dataset.module_dict,
+            dataset.student_dict[student],
+        )
 
-    Inputs:
-    ---------
+    return figure_cache.get_or_build(
+        ("update_durations", (course, val), dataset.version),
+        lambda: module_duration_boxplot(
+            duration_stats(dataset, val), dataset.module_dict
+        ),
+    )
 
 
-    Returns:
-    --------
+def student_options(dataset, search_value, student):
     """
-    # Convert the start_date and the end_date to datetime object if they are of type string
-    if isinstance(start_date, str):
-        start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
-    if isinstance(end_date, str):
-        end_date = datetime.datetime.strptime(end_date, "%Y-%m-%d").date()
+    Returns the student dropdown options matching a search, 'All' first
 
-    assert isinstance(start_date, datetime.date)
-    assert isinstance(end_date, datetime.date)
+    Only the students whose name starts with the search are sent, so the
+    dropdown stays small whatever the number of students. The selected
+    student is kept so its label is shown.
+    """
+    ids = dataset.student_index.search(search_value) if search_value else []
+    if is_student(student) and student not in ids:
+        ids.insert(0, student)
+
+    options = [{"label": "All", "value": "All"}]
+    options.extend(
+        {"label": dataset.student_dict[student_id], "value": student_id}
+        for student_id in ids
+    )
+    return options
 
-    # For each module, create a lineplot with date on the x axis, percentage completion on y axis
-    result_time = pd.DataFrame(columns=["Date", "Module", "Percentage Completion"])
 
-    for module in module_dict.keys():
-        timestamps = df[df.module_id.astype(str) == module][
-            "completed_at"
-        ].dt.date.unique()
-        timestamps = [
-            x for x in timestamps if type(x) != pd._libs.tslibs.nattype.NaTType
-        ]
+def duration_stats(dataset, val):
+    """
+    Returns the time to complete box plot statistics of a module dropdown value
 
-        filtered_timestamps = [
-            timestamp for timestamp in timestamps if start_date <= timestamp <= end_date
-        ]
+    Small courses are summarised from every duration, see
+    exact_box_max_students, larger ones from the module quantile sketches.
 
-        for date in filtered_timestamps:
-            value = round(get_completed_percentage_date(df, module, date) * 100, 1)
+    Returns
+    -------
+    stats: dict, module id to its box plot statistics in seconds, modules
+           without timed completions are left out
+    """
+    modules = list(dataset.module_dict) if val == "All" else [val]
 
-            new_df = pd.DataFrame(
-                [[date, module_dict.get(module), value]],
-                columns=["Date", "Module", "Percentage Completion"],
-            )
+    if dataset.total_students <= exact_box_max_students:
+        enrollments = dataset.student_index.modules
+        durations = completion_durations(enrollments)
+        grouped = durations.groupby(
+            enrollments.module_id.loc[durations.index].astype(str).to_numpy()
+        )
+        values = {module: rows.to_numpy() for module, rows in grouped}
+        stats = {module: exact_box_stats(values.get(module, [])) for module in modules}
+    else:
+        stats = {
+            module: dataset.duration_sketches[module].box_stats()
+            for module in modules
+            if module in dataset.duration_sketches
+        }
 
-            result_time = pd.concat([result_time, new_df], ignore_index=True)
-
-    # Plotting
-    fig_2 = go.Figure()
-    for i, (module, group) in enumerate(result_time.groupby("Module")):
-        sorted_group = group.sort_values("Date")
-
-        if len(sorted_group) == 1:
-            fig_2.add_trace(
-                go.Scatter(
-                    x=sorted_group["Date"],
-                    y=sorted_group["Percentage Completion"],
-                    mode="markers",
-                    name=module,
-                    marker=dict(color=colors[i % len(colors)]),
-                )
-            )
+    return {module: box for module, box in stats.items() if box is not None}
 
-        else:
-            fig_2.add_trace(
-                go.Scatter(
-                    x=sorted_group["Date"],
-                    y=sorted_group["Percentage Completion"],
-                    mode="lines",
-                    name=module,
-                    line=dict(color=colors[i % len(colors)]),
-                )
-            )
 
-    fig_2.update_layout(
-        title="Percentage Completion by Module",
-        xaxis=dict(
-            title="Date", tickangle=-90, title_font=dict(size=axis_label_font_size)
-        ),
-        yaxis=dict(title="Percentage", title_font=dict(size=axis_label_font_size)),
-        plot_bgcolor="rgba(240, 240, 240, 0.8)",  # Light gray background color
-        xaxis_gridcolor="rgba(200, 200, 200, 0.2)",  # Faint gridlines
-        yaxis_gridcolor="rgba(200, 200, 200, 0.2)",  # Faint gridlines
-        margin=dict(l=50, r=50, t=50, b=50),  # Add margin for a border line
-        paper_bgcolor="white",  # Set the background color of the entire plot
-    )
+def module_options(dataset):
+    """
+    Returns the module dropdown options of a course dataset, 'All' last
+    """
+    options = [
+        {"label": module_name, "value": module_id}
+        for module_id, module_name in dataset.module_dict.items()
+    ]
+    options.extend([{"label": "All", "value": "All"}])
+    return options
 
-    # Set custom start and end dates for the x-axis
-    fig_2.update_xaxes(range=[start_date, end_date])
 
-    # Specify custom spacing between dates on the x-axis
-    date_spacing = "D7"  # Weekly spacing, adjust as per your requirement
-    fig_2.update_xaxes(dtick=date_spacing)
+# ----------------------------
+########################
+#  FUNCTION CALLBACKS  #
+########################
 
-    # Convert the figure to a JSON serializable format
-    fig_2_json = fig_2.to_dict()
 
-    return fig_2_json
+def get_dataset(course):
+    """
+    Returns the dataset of the selected course, skips the update if it is unknown
+    """
+    dataset = store.get(course)
+    if dataset is None:
+        raise PreventUpdate
+    return dataset
 
 
-def item_completion_barplot(df):
+def background_callback(progress_id, *dependencies):
     """
-    Return a horizontal barplot showing the percentage completion
-    of each item under each module
+    Registers a callback as a background job when a background manager exists
 
-    Inputs:
-    --------------
+    The callback takes a `progress` keyword, called with (step, steps) as the
+    figure is built and shown by the html.Progress `progress_id`, which is
+    only visible while the job runs. Dash cancels a running job when its
+    inputs change, and a finished result is reused for identical inputs and
+    data version. Without a manager the callback is registered as usual.
+    Jobs run in a separate process, so their timings do not reach /metrics.
 
+    Inputs
+    ------
+    progress_id: str, id of the html.Progress of the callback
+    dependencies: Output and Input of the callback, as for app.callback
 
-    Returns:
-    --------------
+    Returns
+    -------
+    register: decorator, registers the callback and returns it unchanged
     """
-    # result dataframe
-    student_completion_per_item = pd.DataFrame(
-        columns=["Module", "Item", "Item Percentage Completion", "Item Position"]
-    )
 
-    # Computing the percentage completion in each item of a module
-    modules = list(df.module_id.unique().astype(str))
-
-    for module in modules:
-        # number of student id related to Module
-        # CHANGE THE NAME TO ID
-        df_module = df[(df.module_id.astype(str) == module)]
-
-        for i, item in enumerate(items_in_module.get(module)):
-            df_module_item = df_module[df_module.items_title.astype(str) == item]
-
-            item_percent_completion = round(
-                (
-                    df_module_item[df_module_item["item_cp_req_completed"] == True][
-                        "student_id"
-                    ]
-                    .unique()
-                    .size
-                )
-                * 100
-                / total_students,
-                0,
-            )
-            new_df = pd.DataFrame(
-                [[module_dict.get(module), item, item_percent_completion, i + 1]],
-                columns=[
-                    "Module",
-                    "Item",
-                    "Item Percentage Completion",
-                    "Item Position",
-                ],
-            )
+    def register(callback):
+        if background_manager is None:
+            app.callback(*dependencies)(callback)
+            return callback
+
+        @functools.wraps(callback)
+        def job(set_progress, *args):
+            return callback(*args, progress=set_progress)
+
+        app.callback(
+            *dependencies,
+            background=True,
+            manager=background_manager,
+            progress=[Output(progress_id, "value"), Output(progress_id, "max")],
+            running=[
+                (Output(progress_id, "style"), {"width": "100%"}, {"display": "none"})
+            ],
+        )(job)
+        return callback
 
-            student_completion_per_item = pd.concat(
-                [student_completion_per_item, new_df], ignore_index=True
-            )
+    return register
 
-    # Plotting
-    # Group the DataFrame by 'module'
-    grouped_df = student_completion_per_item.groupby("Module")
-
-    # Create subplots with one subplot per module
-    fig_3 = make_subplots(
-        rows=1,
-        cols=len(grouped_df),
-        shared_yaxes=True,
-        horizontal_spacing=0.01,
-        subplot_titles=list(grouped_df.groups.keys()),
-    )
 
-    # Iterate over each module group
-    for i, (module, group) in enumerate(grouped_df):
-        # Commenting out since the items should not be sorted
-        # Items need to appear in the same order as in the module
-        # sorted_group = group.sort_values('Item Percentage Completion', ascending=True)
-
-        # Create a horizontal bar chart for the module
-        fig_3.add_trace(
-            go.Bar(
-                x=group["Item"],
-                y=group["Item Percentage Completion"],
-                orientation="v",
-                name=module,
-                marker=dict(color=colors[i % len(colors)], opacity=0.8),
-                text=[],
-                hovertemplate="Item Title: %{x}<br>Completion: %{y}%<extra></extra>",
-            ),
-            row=1,
-            col=i + 1,
-        )
+def module_dropdown_callback(*dependencies, progress_id=None):
+    """
+    Registers a callback of the module dropdown unless it is handled clientside
 
-    # Update the layout of the figure
-    fig_3.update_layout(
-        height=400,
-        title="Percentage Completion by Item for Each Module",
-        xaxis=dict(title="Items", title_font=dict(size=axis_label_font_size)),
-        yaxis=dict(
-            title="Percentage Completion", title_font=dict(size=axis_label_font_size)
-        ),
-    )
+    Inputs
+    ------
+    dependencies: Output and Input of the callback, as for app.callback
+    progress_id: str, id of the html.Progress of a callback to run in the
+                 background, see background_callback
 
-    # Convert the figure to a JSON serializable format
-    fig_3_json = fig_3.to_dict()
+    Returns
+    -------
+    register: decorator, registers the callback and returns it unchanged
+    """
 
-    return fig_3_json
+    def register(callback):
+        if clientside_modules:
+            return callback
+        if progress_id is not None:
+            return background_callback(progress_id, *dependencies)(callback)
 
+        app.callback(*dependencies)(callback)
+        return callback
 
-# -----------------------------------------------------------------------
-########################
-#  STYLE LAYOUT        #
-########################
+    return register
 
 
-# Define the style for the tabs
-tab_style = {
-    "height": "30px",
-    "padding": "8px",
-}
+@app.callback(
+    Output("module-dropdown", "options"),
+    Output("module-dropdown", "value"),
+    Output("student-dropdown", "value"),
+    Output("date-slider", "min_date_allowed"),
+    Output("date-slider", "max_date_allowed"),
+    Output("date-slider", "start_date"),
+    Output("date-slider", "end_date"),
+    Input("course-dropdown", "value"),
+)
+@callback_metrics.instrument
+def update_course(course):
+    dataset = get_dataset(course)
+
+    options = module_options(dataset)
+
+    return (
+        options,
+        options[-1]["value"],
+        "All",
+        dataset.min_date,
+        dataset.max_date,
+        dataset.min_date,
+        dataset.max_date,
+    )
 
-# Define the style for the selected tab
-selected_tab_style = {
-    "height": "30px",
-    "padding": "3px",
-    "borderTop": "2px solid #13233e",
-    "borderBottom": "2px solid #13233e",
-    "backgroundColor": "#13233e",
-    "color": "white",
-}
 
-# Define header style
-heading_style = {
-    "borderTop": "2px solid #aab4c2",
-    "borderBottom": "2px solid #aab4c2",
-    "backgroundColor": "#aab4c2",
-    "color": "white",
-    "padding": "5px",
-    "text-align": "center",
-}
+@app.callback(
+    Output("student-dropdown", "options"),
+    Input("course-dropdown", "value"),
+    Input("student-dropdown", "search_value"),
+    State("student-dropdown", "value"),
+)
+@callback_metrics.instrument
+def update_student_options(course, search_value, student):
+    return student_options(get_dataset(course), search_value, student)
 
-# Define Tab text style
-text_style = {
-    "font-size": "16px",
-    "font-weight": "bold",
-    "color": "#13233e",
-    "padding": "5px",
-}
 
+@app.callback(
+    Output("module-table", "data"),
+    Output("module-table", "columns"),
+    Input("course-dropdown", "value"),
+    Input("student-dropdown", "value"),
+)
+@callback_metrics.instrument
+def update_table(course, student="All"):
+    return module_table(course, get_dataset(course), student)
 
-# Style Html Div
-div_style = {
-    "display": "flex",
-    "justify-content": "center",
-    "align-items": "center",
-}
 
-# dropdpown options
+@module_dropdown_callback(
+    Output("plot1", "figure"),
+    [
+        Input("course-dropdown", "value"),
+        Input("module-dropdown", "value"),
+        Input("student-dropdown", "value"),
+    ],
+)
+@callback_metrics.instrument
+def update_module(course, val, student="All"):
+    return module_figure(course, get_dataset(course), val, student)
 
-module_options = [
-    {"label": module_name, "value": module_id}
-    for module_id, module_name in module_dict.items()
-]
-module_options.extend([{"label": "All", "value": "All"}])
 
+@module_dropdown_callback(
+    Output("plot3", "figure"),
+    [
+        Input("course-dropdown", "value"),
+        Input("module-dropdown", "value"),
+        Input("student-dropdown", "value"),
+    ],
+    progress_id="plot3-progress",
+)
+@callback_metrics.instrument
+def update_items(course, val, student="All", progress=no_progress):
+    return items_figure(course, get_dataset(course), val, student, progress)
 
-# ----------------------------
-########################
-#  FUNCTION CALLBACKS  #
-########################
 
+if clientside_modules:
 
-@app.callback(
-    Output("plot1", "figure"),
-    [Input("module-dropdown", "value")],
-)
-def update_module(val):
-    subset_data = data.copy()
-    # if a specific module is selected then filter the dataframe by that alone, else select all.
-    if val != "All":
-        subset_data = data[data.module_id.astype(str) == val]
+    @app.callback(
+        Output("module-figures", "data"),
+        Input("course-dropdown", "value"),
+        Input("student-dropdown", "value"),
+    )
+    @callback_metrics.instrument
+    def update_module_figures(course, student):
+        dataset = get_dataset(course)
+        values = [option["value"] for option in module_options(dataset)]
+
+        def build():
+            return {
+                "plot1": {
+                    val: module_figure(course, dataset, val, student) for val in values
+                },
+                "plot3": {
+                    val: items_figure(course, dataset, val, student) for val in values
+                },
+                "plot4": {
+                    val: durations_figure(course, dataset, val, student)
+                    for val in values
+                },
+            }
+
+        # the figures of a student are not cached, see module_table
+        if is_student(student):
+            return build()
+        return figure_cache.get_or_build(
+            ("update_module_figures", course, dataset.version), build
+        )
 
-    fig = module_completion_barplot(subset_data)
-    return fig
+    # The module dropdown only picks one of the figures sent with the course,
+    # see assets/clientside.js
+    for graph, function_name in [
+        ("plot1", "module_figure"),
+        ("plot3", "items_figure"),
+        ("plot4", "durations_figure"),
+    ]:
+        app.clientside_callback(
+            ClientsideFunction(namespace="modules", function_name=function_name),
+            Output(graph, "figure"),
+            Input("module-figures", "data"),
+            Input("module-dropdown", "value"),
+        )
 
 
-@app.callback(
-    Output("plot3", "figure"),
-    [Input("module-dropdown", "value")],
+@module_dropdown_callback(
+    Output("plot4", "figure"),
+    [
+        Input("course-dropdown", "value"),
+        Input("module-dropdown", "value"),
+        Input("student-dropdown", "value"),
+    ],
+)
+@callback_metrics.instrument
+def update_durations(course, val, student="All"):
+    return durations_figure(course, get_dataset(course), val, student)
+
+
+@background_callback(
+    "plot2-progress",
+    Output("plot2", "figure"),
+    Input("course-dropdown", "value"),
+    Input("student-dropdown", "value"),
+    State("date-slider", "start_date"),
+    State("date-slider", "end_date"),
 )
-def update_items(val):
-    subset_data = data.copy()
-    # if a specific module is selected then filter the items that belong to that module alone, else seletc all
-    if val != "All":
-        subset_data = data[data.module_id.astype(str) == val]
+@callback_metrics.instrument
+def update_lineplot(
+    course, student="All", start_date=None, end_date=None, progress=no_progress
+):
+    dataset = get_dataset(course)
+
+    # The lines of the whole date range of the course are sent with the
+    # course, a date range change only updates them, see update_lineplot_range
+    def build():
+        progress((1, 2))
+        return module_completion_lineplot(
+            dataset.completion_timeline,
+            dataset.module_dict,
+            dataset.min_date,
+            dataset.max_date,
+        )
 
-    fig = item_completion_barplot(subset_data)
+    if is_student(student):
+        fig = student_completion_scatter(
+            dataset.student_index.student_modules(student),
+            dataset.module_dict,
+            dataset.student_dict[student],
+            dataset.min_date,
+            dataset.max_date,
+        )
+    else:
+        fig = figure_cache.get_or_build(
+            ("update_lineplot", course, dataset.version), build
+        )
+    progress((2, 2))
+
+    # A new course resets the date picker to its whole range, a new student
+    # keeps the range selected. Cached figures are copied, not modified.
+    if (
+        start_date
+        and end_date
+        and "course-dropdown.value" not in dash.ctx.triggered_prop_ids
+    ):
+        xaxis = {**fig["layout"]["xaxis"], "range": [start_date, end_date]}
+        fig = {**fig, "layout": {**fig["layout"], "xaxis": xaxis}}
     return fig
 
 
 @app.callback(
-    Output("plot2", "figure"),
+    Output("plot2", "figure", allow_duplicate=True),
     Input("date-slider", "start_date"),
     Input("date-slider", "end_date"),
+    State("course-dropdown", "value"),
+    State("student-dropdown", "value"),
+    prevent_initial_call=True,
 )
-def update_lineplot(start_date, end_date):
-    subset_data = data.copy()
+@callback_metrics.instrument
+def update_lineplot_range(start_date, end_date, course, student="All"):
+    dataset = get_dataset(course)
+
+    # A cleared date picker shows the whole date range
+    start_date = parse_date(start_date or dataset.min_date)
+    end_date = parse_date(end_date or dataset.max_date)
+
+    patch = Patch()
+    patch["layout"]["xaxis"]["range"] = [start_date, end_date]
+    patch["layout"]["xaxis"]["autorange"] = False
+
+    # The scatter plot of a student always holds every point
+    if is_student(student):
+        return patch
+
+    points = figure_cache.get_or_build(
+        ("update_lineplot_range", (course, start_date, end_date), dataset.version),
+        lambda: lineplot_window_points(
+            dataset.completion_timeline, dataset.module_dict, start_date, end_date
+        ),
+    )
+    for i, (x, y) in enumerate(points or []):
+        patch["data"][i]["x"] = x
+        patch["data"][i]["y"] = y
 
-    assert isinstance(start_date, str)
+    return patch
 
-    fig = module_completion_lineplot(subset_data, start_date, end_date)
 
-    fig["layout"]["xaxis"]["autorange"] = True  # Set x-axis to autoscale
-    return fig
+# ----------------------------
+########################
+#  METRICS             #
+########################
+# Size of every callback response
+app.server.after_request(callback_metrics.observe_response)
+
+
+@app.server.route("/metrics")
+def metrics():
+    """
+    Returns the callback and figure cache metrics in the Prometheus text format
+    """
+    return Response(
+        callback_metrics.render(figure_cache),
+        mimetype="text/plain; version=0.0.4",
+    )
 
 
 # ----------------------------
 
-app.layout = dbc.Container(
-    fluid=True,
-    children=[
-        html.Div(
-            children=[
-                html.H2(
-                    "Module Progress Demo Dashboard",
-                    style=heading_style,
-                ),
-            ],
-            style={"padding": "0.05px"},
-        ),
-        html.Div(
-            children=[
-                dcc.Tabs(
-                    id="tabs",
-                    value="Modules",
-                    children=[
-                        dcc.Tab(
-                            label="About",
-                            style=tab_style,
-                            selected_style=selected_tab_style,
-                            children=[
-                                html.Div(
-                                    className="about-container",
-                                    children=[
-                                        html.H1("About"),
-                                        html.P(
-                                            """This Sample Dashboard is created using Dash and Plotly in Python. It provides an interactive visualization of student progression in different modules. The dashboard allows you to explore module details, view student progress through completion bar plots, and analyze overall module completion using a line plot. With an intuitive interface and visually appealing design, this dashboard offers a comprehensive overview of student progress and module completion. It is a powerful tool for educators and administrators to track and monitor student performance in an easy-to-understand manner."""
-                                        ),
-                                    ],
-                                )
-                            ],
-                        ),
-                        dcc.Tab(
-                            label="Module Details",
-                            value="Module Details",
-                            style=tab_style,
-                            selected_style=selected_tab_style,
-                            children=[
-                                html.Div(
-                                    className="module-dropdown-container",
-                                    children=[
-                                        html.Label(
-                                            "Select a module to view the student progression details ",
-                                            style={
-                                                "font-weight": "bold",
-                                                "margin-right": "10px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="module-dropdown",
-                                            options=module_options,
-                                            value=module_options[-1]["value"],
-                                            style={"width": "300px", "fontsize": "1px"},
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "align-items": "center",
-                                        "margin-top": "10px",
-                                        "margin-bottom": "10px",
-                                    },
-                                ),
-                                html.Div(
-                                    className="plot-container",
-                                    children=[
-                                        html.Div(
-                                            className="first-row",
-                                            style=div_style,
-                                            children=[
-                                                dcc.Graph(
-                                                    id="plot1",
-                                                    style={
-                                                        "width": "50%",
-                                                        "height": "400px",
-                                                        "display": "inline-block",
-                                                        "border": "2px solid #ccc",
-                                                        "border-radius": "5px",
-                                                        "padding": "10px",
-                                                    },
-                                                ),
-                                                dash_table.DataTable(
-                                                    data=module_completion_table(
-                                                        data
-                                                    ).to_dict(
-                                                        "records"
-                                                    ),  # Convert DataFrame to dictionary format
-                                                    columns=[
-                                                        {"name": col, "id": col}
-                                                        for col in module_completion_table(
-                                                            data
-                                                        ).columns
-                                                    ],  # Define column names
-                                                    style_table={
-                                                        "width": "50%",  # Set the table width to 80% of the parent container
-                                                        "border": "1px solid #ccc",
-                                                        "border-radius": "5px",
-                                                    },
-                                                    style_header={
-                                                        "backgroundColor": "lightgray",
-                                                        "fontWeight": "bold",
-                                                        "border": "1px solid #ccc",
-                                                    },
-                                                    style_cell={
-                                                        "textAlign": "center",
-                                                        "border": "1px solid #ccc",
-                                                    },
-                                                ),
-                                            ],
-                                            # style={
-                                            #     "display": "flex",
-                                            #     "justify-content": "space-between",
-                                            # },
-                                        ),
-                                        html.Div(
-                                            className="second-row",
-                                            children=[
-                                                dcc.Graph(
-                                                    id="plot3",
-                                                    style={
-                                                        "width": "100%",
-                                                        "height": "400px",
-                                                        "display": "inline-block",
-                                                        "border": "2px solid #ccc",
-                                                        "border-radius": "5px",
-                                                        "padding": "10px",
-                                                    },
-                                                ),
-                                            ],
-                                            style={
-                                                "display": "flex",
-                                                "justify-content": "space-between",
-                                            },
-                                        ),
-                                    ],
-                                ),
-                            ],
-                        ),
-                        dcc.Tab(
-                            label="Progress Lineplot",
-                            style=tab_style,
-                            selected_style=selected_tab_style,
-                            children=[
-                                html.H3("Select the Date Range", style=text_style),
-                                dcc.DatePickerRange(
-                                    id="date-slider",
-                                    min_date_allowed=min(
-                                        pd.to_datetime(data["completed_at"])
-                                    ).date(),
-                                    max_date_allowed=max(
-                                        pd.to_datetime(data["completed_at"])
-                                    ).date(),
-                                    start_date=min(
-                                        pd.to_datetime(data["completed_at"])
-                                    ).date(),
-                                    end_date=max(
-                                        pd.to_datetime(data["completed_at"])
-                                    ).date(),
-                                    clearable=True,
-                                ),
-                                dcc.Graph(
-                                    id="plot2",
-                                    style={
-                                        "width": "100%",
-                                        "height": "400px",
-                                        "display": "inline-block",
-                                        "border": "2px solid #ccc",
-                                        "border-radius": "5px",
-                                        "padding": "10px",
-                                    },
-                                ),
-                            ],
-                        ),
-                    ],
-                )
-            ],
-            style={
-                "padding": "20px",
-                "background-color": "#F8F8FF",
-                "fontSize": "16px",
-            },
-        ),
-    ],
-)
 
+def serve_layout():
+    """
+    Returns the dashboard layout built from the dataset currently served
+
+    Dash calls it on every page load, so a reloaded dataset shows up in the
+    dropdowns, the table and the date range on the next refresh. The first
+    course (alphabetically) is selected by default. While the store serves
+    no course the dropdowns and the table are left empty.
+    """
+    courses = course_options()
+    course = courses[0]["value"] if courses else None
+    dataset = store.get(course) if course is not None else None
+
+    # dropdpown options
+    if dataset is None:
+        modules = [{"label": "All", "value": "All"}]
+        table_data, table_columns = [], []
+        min_date = max_date = None
+    else:
+        modules = module_options(dataset)
+        table_data, table_columns = module_table(course, dataset)
+        min_date, max_date = dataset.min_date, dataset.max_date
+
+    return dbc.Container(
+        fluid=True,
+        children=[
+            html.Div(
+                children=[
+                    html.H2(
+                        "Module Progress Demo Dashboard",
+                        style=heading_style,
+                    ),
+                ],
+                style={"padding": "0.05px"},
+            ),
+            html.Div(
+                className="course-dropdown-container",
+                children=[
+                    html.Label(
+                        "Select a course ",
+                        style={
+                            "font-weight": "bold",
+                            "margin-right": "10px",
+                        },
+                    ),
+                    # Figures of every module dropdown value, in clientside mode
+                    dcc.Store(id="module-figures"),
+                    dcc.Dropdown(
+                        id="course-dropdown",
+                        options=courses,
+                        value=course,
+                        clearable=False,
+                        style={"width": "300px"},
+                    ),
+                    html.Label(
+                        "Select a student ",
+                        style={
+                            "font-weight": "bold",
+                            "margin-left": "20px",
+                            "margin-right": "10px",
+                        },
+                    ),
+                    # Students are searched by name, see update_student_options
+                    dcc.Dropdown(
+                        id="student-dropdown",
+                        options=[{"label": "All", "value": "All"}],
+                        value="All",
+                        clearable=False,
+                        placeholder="Type a student name",
+                        style={"width": "300px"},
+                    ),
+                ],
+                style={
+                    "display": "flex",
+                    "align-items": "center",
+                    "padding": "10px 20px 0px 20px",
+                },
+            ),
+            html.Div(
+                children=[
+                    dcc.Tabs(
+                        id="tabs",
+                        value="Modules",
+                        children=[
+                            dcc.Tab(
+                                label="About",
+                                style=tab_style,
+                                selected_style=selected_tab_style,
+                                children=[
+                                    html.Div(
+                                        className="about-container",
+                                        children=[
+                                            html.H1("About"),
+                                            html.P(
+                                                """This Sample Dashboard is created using Dash and Plotly in Python. It provides an interactive visualization of student progression in different modules. The dashboard allows you to explore module details, view student progress through completion bar plots, and analyze overall module completion using a line plot. With an intuitive interface and visually appealing design, this dashboard offers a comprehensive overview of student progress and module completion. It is a powerful tool for educators and administrators to track and monitor student performance in an easy-to-understand manner."""
+                                            ),
+                                        ],
+                                    )
+                                ],
+                            ),
+                            dcc.Tab(
+                                label="Module Details",
+                                value="Module Details",
+                                style=tab_style,
+                                selected_style=selected_tab_style,
+                                children=[
+                                    html.Div(
+                                        className="module-dropdown-container",
+                                        children=[
+                                            html.Label(
+                                                "Select a module to view the student progression details ",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "margin-right": "10px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="module-dropdown",
+                                                options=modules,
+                                                value=modules[-1]["value"],
+                                                style={
+                                                    "width": "300px",
+                                                    "fontsize": "1px",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "align-items": "center",
+                                            "margin-top": "10px",
+                                            "margin-bottom": "10px",
+                                        },
+                                    ),
+                                    html.Div(
+                                        className="plot-container",
+                                        children=[
+                                            html.Div(
+                                                className="first-row",
+                                                style=div_style,
+                                                children=[
+                                                    dcc.Graph(
+                                                        id="plot1",
+                                                        style={
+                                                            "width": "50%",
+                                                            "height": "400px",
+                                                            "display": "inline-block",
+                                                            "border": "2px solid #ccc",
+                                                            "border-radius": "5px",
+                                                            "padding": "10px",
+                                                        },
+                                                    ),
+                                                    dash_table.DataTable(
+                                                        id="module-table",
+                                                        data=table_data,  # Convert DataFrame to dictionary format
+                                                        columns=table_columns,  # Define column names
+                                                        style_table={
+                                                            "width": "50%",  # Set the table width to 80% of the parent container
+                                                            "border": "1px solid #ccc",
+                                                            "border-radius": "5px",
+                                                        },
+                                                        style_header={
+                                                            "backgroundColor": "lightgray",
+                                                            "fontWeight": "bold",
+                                                            "border": "1px solid #ccc",
+                                                        },
+                                                        style_cell={
+                                                            "textAlign": "center",
+                                                            "border": "1px solid #ccc",
+                                                        },
+                                                    ),
+                                                ],
+                                                # style={
+                                                #     "display": "flex",
+                                                #     "justify-content": "space-between",
+                                                # },
+                                            ),
+                                            html.Progress(
+                                                id="plot3-progress",
+                                                value="0",
+                                                max="3",
+                                                style={"display": "none"},
+                                            ),
+                                            html.Div(
+                                                className="second-row",
+                                                children=[
+                                                    dcc.Graph(
+                                                        id="plot3",
+                                                        style={
+                                                            "width": "100%",
+                                                            "height": "400px",
+                                                            "display": "inline-block",
+                                                            "border": "2px solid #ccc",
+                                                            "border-radius": "5px",
+                                                            "padding": "10px",
+                                                        },
+                                                    ),
+                                                ],
+                                                style={
+                                                    "display": "flex",
+                                                    "justify-content": "space-between",
+                                                },
+                                            ),
+                                            html.Div(
+                                                className="third-row",
+                                                children=[
+                                                    dcc.Graph(
+                                                        id="plot4",
+                                                        style={
+                                                            "width": "100%",
+                                                            "height": "400px",
+                                                            "display": "inline-block",
+                                                            "border": "2px solid #ccc",
+                                                            "border-radius": "5px",
+                                                            "padding": "10px",
+                                                        },
+                                                    ),
+                                                ],
+                                            ),
+                                        ],
+                                    ),
+                                ],
+                            ),
+                            dcc.Tab(
+                                label="Progress Lineplot",
+                                style=tab_style,
+                                selected_style=selected_tab_style,
+                                children=[
+                                    html.H3("Select the Date Range", style=text_style),
+                                    dcc.DatePickerRange(
+                                        id="date-slider",
+                                        min_date_allowed=min_date,
+                                        max_date_allowed=max_date,
+                                        start_date=min_date,
+                                        end_date=max_date,
+                                        clearable=True,
+                                    ),
+                                    html.Progress(
+                                        id="plot2-progress",
+                                        value="0",
+                                        max="2",
+                                        style={"display": "none"},
+                                    ),
+                                    dcc.Graph(
+                                        id="plot2",
+                                        style={
+                                            "width": "100%",
+                                            "height": "400px",
+                                            "display": "inline-block",
+                                            "border": "2px solid #ccc",
+                                            "border-radius": "5px",
+                                            "padding": "10px",
+                                        },
+                                    ),
+                                ],
+                            ),
+                        ],
+                    )
+                ],
+                style={
+                    "padding": "20px",
+                    "background-color": "#F8F8FF",
+                    "fontSize": "16px",
+                },
+            ),
+        ],
+    )
+
+
+app.layout = serve_layout
+
+# Build the table of the default course now rather than on the first page load
+serve_layout()
+startup_timer.lap("layout")
+logger.info("Started in %s", format_seconds(startup_seconds))
 
 if __name__ == "__main__":
+    # Reload the data in the background when the export is refreshed
+    StatusWatcher(store, reload_interval).start()
+
     app.run_server(debug=True)
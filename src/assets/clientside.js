@@ -0,0 +1,19 @@
+// Clientside callbacks of the dashboard, used when clientside_modules is set
+// in app.py. The module-figures store holds the figures of every module
+// dropdown value of the selected course, keyed by graph id then value.
+function selectFigure(graph) {
+    return function (figures, module) {
+        if (!figures || !figures[graph] || !(module in figures[graph])) {
+            return window.dash_clientside.no_update;
+        }
+        return figures[graph][module];
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    modules: {
+        module_figure: selectFigure("plot1"),
+        items_figure: selectFigure("plot3"),
+        durations_figure: selectFigure("plot4"),
+    },
+});
@@ -0,0 +1,336 @@
+# imports
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import app
+from aggregates import (
+    build_state_cube,
+    build_completion_timeline,
+    build_duration_sketches,
+    build_item_completion,
+    build_schema_item_completion,
+)
+from dataset import Dataset, DatasetStore
+from figure_cache import FigureCache
+from schema import StarSchema
+from snapshot import ingest, load_module_data, read_module_csv
+from sqlstore import SqlDataset, SqlStore, ingest_sql
+from students import StudentIndex
+from synthetic import generate_module_data, generate_status, write_module_csv
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Rows of module data in each size tier
+size_tiers = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "1M": 1_000_000,
+    "10M": 10_000_000,
+}
+
+# Shape of the synthetic courses, the students make up the rows of a tier
+tier_modules = 10
+tier_items_per_module = 10
+
+# A benchmark slower than the baseline by more than this factor is reported
+regression_tolerance = 1.25
+
+
+# -------------------------------------------------------------
+########################
+#  MEASURING           #
+########################
+def measure(func, repeat=3):
+    """
+    Returns the best wall time and the peak traced memory of func
+
+    The time is the fastest of `repeat` untraced calls, the peak memory is
+    taken from one more call with tracemalloc running as tracing slows the
+    call down.
+
+    Inputs
+    ------
+    func: callable, called without arguments
+    repeat: int, number of timed calls
+
+    Returns
+    -------
+    result: dict, 'seconds' and 'peak_bytes'
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def tier_data(rows, workdir):
+    """
+    Writes the synthetic export of a size tier, returns its csv and status paths
+    """
+    students = max(rows // (tier_modules * tier_items_per_module), 1)
+    df = generate_module_data(
+        students=students, modules=tier_modules, items_per_module=tier_items_per_module
+    )
+
+    csv_path = os.path.join(workdir, "module_data.csv")
+    status_path = os.path.join(workdir, "status.csv")
+    write_module_csv(df, csv_path)
+    generate_status(df).to_csv(status_path)
+    return csv_path, status_path
+
+
+def tier_benchmarks(csv_path, status_path):
+    """
+    Returns the name and function of every benchmark on one export
+
+    The callbacks are run on the app with its store replaced by the export.
+    They are timed once with a disabled figure cache, which is the cost of a
+    first request, and once with a cache already holding their figure.
+    """
+    data = read_module_csv(csv_path)
+    dataset = Dataset(data)
+    progress = dataset.schema.module_progress
+    modules = list(dataset.module_dict)
+    student = next(iter(dataset.student_dict))
+
+    app.store = DatasetStore(csv_path, status_path)
+    course = next(iter(app.store.courses()))
+    start_date, end_date = str(dataset.min_date), str(dataset.max_date)
+
+    # the same export queried from its SQLite database
+    sql_store = SqlStore(ingest_sql(csv_path), status_path)
+    sql_dataset = sql_store.get(course)
+
+    def cold(callback, *args):
+        def run():
+            app.figure_cache = FigureCache(max_entries=0)
+            return callback(course, *args)
+
+        return run
+
+    def warm(callback, *args):
+        cache = FigureCache()
+        app.figure_cache = cache
+        callback(course, *args)
+
+        def run():
+            app.figure_cache = cache
+            return callback(course, *args)
+
+        return run
+
+    return {
+        # load path
+        "read_module_csv": lambda: read_module_csv(csv_path),
+        "ingest": lambda: ingest(csv_path),
+        "load_module_data (snapshot)": lambda: load_module_data(csv_path),
+        "Dataset": lambda: Dataset(data),
+        "build_state_cube": lambda: build_state_cube(data),
+        "build_completion_timeline": lambda: build_completion_timeline(data),
+        "build_item_completion": lambda: build_item_completion(data),
+        "build_duration_sketches": lambda: build_duration_sketches(data),
+        # the same aggregates read from the star schema
+        "build_state_cube (schema)": lambda: build_state_cube(progress),
+        "build_completion_timeline (schema)": lambda: build_completion_timeline(
+            progress
+        ),
+        "build_schema_item_completion": lambda: build_schema_item_completion(
+            dataset.schema
+        ),
+        "build_duration_sketches (schema)": lambda: build_duration_sketches(progress),
+        "StarSchema": lambda: StarSchema(data),
+        "StudentIndex": lambda: StudentIndex(
+            dataset.schema, dataset.dimension_index, dataset.student_dict
+        ),
+        # SQL backend
+        "ingest_sql": lambda: ingest_sql(csv_path, csv_path + ".bench.sqlite"),
+        "SqlDataset": lambda: SqlDataset(sql_store, course),
+        "student_modules (sql)": lambda: sql_dataset.student_index.student_modules(
+            student
+        ),
+        "student_items (sql)": lambda: sql_dataset.student_index.student_items(student),
+        # helpers, every module of the course
+        "get_completed_percentage": lambda: [
+            app.get_completed_percentage(dataset.state_cube, module)
+            for module in modules
+        ],
+        "get_completed_percentage_date": lambda: [
+            app.get_completed_percentage_date(
+                dataset.completion_timeline, module, dataset.max_date
+            )
+            for module in modules
+        ],
+        # distinct counts of growing module selections
+        **{
+            f"get_students_percentage ({n} modules)": (
+                lambda n=n: app.get_students_percentage(
+                    dataset.student_bitmaps, modules[:n]
+                )
+            )
+            for n in (1, len(modules) // 2, len(modules))
+        },
+        # plot functions
+        "module_completion_table": lambda: app.module_completion_table(
+            dataset.state_cube, dataset.module_dict
+        ),
+        "module_completion_barplot": lambda: app.module_completion_barplot(
+            dataset.state_cube, dataset.module_dict
+        ),
+        "module_completion_lineplot": lambda: app.module_completion_lineplot(
+            dataset.completion_timeline, dataset.module_dict, start_date, end_date
+        ),
+        "item_completion_barplot": lambda: app.item_completion_barplot(
+            dataset.item_completion, dataset.module_dict
+        ),
+        # callbacks
+        "update_course": lambda: app.update_course(course),
+        "update_module": cold(app.update_module, "All"),
+        "update_module (cached)": warm(app.update_module, "All"),
+        "update_items": cold(app.update_items, "All"),
+        "update_items (cached)": warm(app.update_items, "All"),
+        "update_lineplot": cold(app.update_lineplot),
+        "update_lineplot (cached)": warm(app.update_lineplot),
+        "update_module (student)": cold(app.update_module, "All", student),
+        "update_items (student)": cold(app.update_items, "All", student),
+        "update_lineplot (student)": cold(app.update_lineplot, student),
+        "update_durations": cold(app.update_durations, "All"),
+        "update_lineplot_range": cold(
+            lambda course: app.update_lineplot_range(start_date, end_date, course)
+        ),
+    }
+
+
+def run_tier(rows, repeat=3):
+    """
+    Returns the measurement of every benchmark on a synthetic export of rows
+
+    Inputs
+    ------
+    rows: int, rows of module data
+    repeat: int, number of timed calls of each benchmark
+
+    Returns
+    -------
+    results: dict, benchmark name to its measurement
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmarks = tier_benchmarks(*tier_data(rows, workdir))
+        return {name: measure(func, repeat) for name, func in benchmarks.items()}
+
+
+# -------------------------------------------------------------
+########################
+#  BASELINE            #
+########################
+def compare(results, baseline, tolerance=regression_tolerance):
+    """
+    Returns the benchmarks slower than the baseline by more than tolerance
+
+    Inputs
+    ------
+    results: dict, tier to benchmark name to measurement
+    baseline: dict, stored results of a previous run
+    tolerance: float, allowed ratio of the time to the baseline time
+
+    Returns
+    -------
+    regressions: list of (tier, benchmark name, ratio)
+    """
+    regressions = []
+    for tier, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            previous = baseline.get(tier, {}).get(name)
+            if previous is None or previous["seconds"] == 0:
+                continue
+
+            ratio = result["seconds"] / previous["seconds"]
+            if ratio > tolerance:
+                regressions.append((tier, name, ratio))
+    return regressions
+
+
+def report(results, baseline=None):
+    """
+    Returns the results as a text table, with the ratio to the baseline
+    """
+    lines = [
+        f"{'tier':>5}  {'benchmark':<30} {'seconds':>10} {'peak MB':>9} {'ratio':>6}"
+    ]
+    for tier, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            previous = (baseline or {}).get(tier, {}).get(name)
+            ratio = (
+                f"{result['seconds'] / previous['seconds']:.2f}"
+                if previous and previous["seconds"]
+                else ""
+            )
+            lines.append(
+                f"{tier:>5}  {name:<30} {result['seconds']:>10.4f} "
+                f"{result['peak_bytes'] / 1024**2:>9.1f} {ratio:>6}"
+            )
+    return "\n".join(lines)
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the load path, helpers, plots and callbacks of the app "
+        "on synthetic exports of increasing size"
+    )
+    parser.add_argument(
+        "--tiers",
+        default="1k,10k,100k",
+        help=f"comma separated size tiers out of {', '.join(size_tiers)}",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="timed calls per benchmark"
+    )
+    parser.add_argument("--baseline", help="compare against the results in this json")
+    parser.add_argument("--save", help="write the results to this json")
+    parser.add_argument("--tolerance", type=float, default=regression_tolerance)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for tier in args.tiers.split(","):
+        results[tier] = run_tier(size_tiers[tier], args.repeat)
+        print(report({tier: results[tier]}, baseline), flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for tier, name, ratio in regressions:
+            print(f"REGRESSION {tier} {name}: {ratio:.2f}x the baseline time")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
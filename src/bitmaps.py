@@ -0,0 +1,245 @@
+# imports
+import numpy as np
+import pandas as pd
+
+from aggregates import module_states
+
+# Optional: compressed roaring bitmaps, dense numpy bitsets otherwise
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Set bits of every byte value, to count the bits of numpy bitsets without
+# np.bitwise_count (numpy < 2)
+_byte_popcount = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# -------------------------------------------------------------
+########################
+#  BITSETS             #
+########################
+class StudentSet:
+    """
+    Set of student codes held as a bitmap
+
+    Backed by a pyroaring BitMap when pyroaring is installed, which
+    compresses runs and sparse sets, otherwise by a dense numpy array of
+    64-bit words, one bit per student of the dataset. Sets combine with
+    & (and), | (or) and - (and not) and len() counts their students, each a
+    pass over the words rather than over rows of module data.
+
+    Inputs
+    ------
+    bits: pyroaring.BitMap or np.array of uint64, the bitmap
+    size: int, number of students of the dataset
+    """
+
+    __slots__ = ("bits", "size")
+
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def from_codes(cls, codes, size):
+        """
+        Returns the set of an array of student codes
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        if BitMap is not None:
+            return cls(BitMap(codes.astype(np.uint32)), size)
+
+        words = np.zeros((size + 63) // 64, dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), (codes & 63).astype(np.uint64))
+        np.bitwise_or.at(words, codes >> 6, bits)
+        return cls(words, size)
+
+    @classmethod
+    def empty(cls, size):
+        return cls.from_codes([], size)
+
+    def __and__(self, other):
+        return StudentSet(self.bits & other.bits, self.size)
+
+    def __or__(self, other):
+        return StudentSet(self.bits | other.bits, self.size)
+
+    def __sub__(self, other):
+        if BitMap is not None:
+            return StudentSet(self.bits - other.bits, self.size)
+        return StudentSet(self.bits & ~other.bits, self.size)
+
+    def __len__(self):
+        if BitMap is not None:
+            return len(self.bits)
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self.bits).sum())
+        return int(_byte_popcount[self.bits.view(np.uint8)].sum())
+
+    def nbytes(self):
+        """
+        Returns the bytes held by the bitmap
+        """
+        if BitMap is not None:
+            return self.bits.get_serialized_size_in_bytes()
+        return self.bits.nbytes
+
+    def codes(self):
+        """
+        Returns the student codes in the set, ascending
+        """
+        if BitMap is not None:
+            return np.array(self.bits, dtype=np.int64)
+        bits = np.unpackbits(self.bits.view(np.uint8), bitorder="little")
+        return np.flatnonzero(bits[: self.size])
+
+
+def union(sets, size):
+    """
+    Returns the students in any of the sets
+    """
+    result = StudentSet.empty(size)
+    for student_set in sets:
+        result = result | student_set
+    return result
+
+
+def intersection(sets, size):
+    """
+    Returns the students in every one of the sets, every student when empty
+    """
+    sets = list(sets)
+    if not sets:
+        return StudentSet.from_codes(np.arange(size), size)
+
+    result = sets[0]
+    for student_set in sets[1:]:
+        result = result & student_set
+    return result
+
+
+# -------------------------------------------------------------
+########################
+#  BITMAP INDEX        #
+########################
+class StudentBitmaps:
+    """
+    Student sets per module, per (module, state) and per completed item
+
+    Every distinct student count of the dashboard is the size of a
+    combination of these sets: the students of several modules in a state
+    are a union, "completed A but not B" a difference, and a student group
+    an intersection with the group's set. Counting them takes a pass over
+    bitmaps of the students, whatever the number of rows or selections.
+
+    Inputs
+    ------
+    students: list of str, student ids of the dataset, the code of a student
+              is its position
+    enrollments: dataframe, one row per student and module with 'module_id',
+                 'student_id' and 'state' columns
+    completions: dataframe, one row per item a student completed with
+                 'items_id' and 'student_id' columns
+    """
+
+    def __init__(self, students, enrollments, completions):
+        self.size = len(students)
+        self._lookup = pd.Index([str(student) for student in students])
+        self._empty = StudentSet.empty(self.size)
+
+        # module id (str) to its students, and (module id, state) to the
+        # students in that state
+        codes = pd.Series(self._codes(enrollments["student_id"]))
+        modules = enrollments["module_id"].astype(str).to_numpy()
+        states = enrollments["state"].astype(str).to_numpy()
+
+        self.module_students = self._sets(codes.groupby(modules))
+        in_states = np.isin(states, module_states)
+        self.state_students = self._sets(
+            codes[in_states].groupby([modules[in_states], states[in_states]])
+        )
+
+        # item id (str) to the students who completed it
+        codes = pd.Series(self._codes(completions["student_id"]))
+        self.item_students = self._sets(
+            codes.groupby(completions["items_id"].astype(str).to_numpy())
+        )
+
+    def _codes(self, student_ids):
+        """
+        Returns the codes of a column of student ids, -1 for unknown ids
+        """
+        return self._lookup.get_indexer(np.asarray(student_ids).astype(str))
+
+    def _sets(self, groups):
+        """
+        Returns the group key to the set of the known student codes of a groupby
+        """
+        return {
+            key: StudentSet.from_codes(np.unique(codes[codes >= 0]), self.size)
+            for key, codes in ((key, rows.to_numpy()) for key, rows in groups)
+        }
+
+    def students(self, module, state=None):
+        """
+        Returns the students of a module, or those in a state of the module
+        """
+        if state is None:
+            return self.module_students.get(str(module), self._empty)
+        return self.state_students.get((str(module), state), self._empty)
+
+    def completed_item(self, item):
+        """
+        Returns the students who completed an item
+        """
+        return self.item_students.get(str(item), self._empty)
+
+    def group(self, student_ids):
+        """
+        Returns the set of a group of student ids, unknown ids are left out
+        """
+        codes = self._codes(list(student_ids))
+        return StudentSet.from_codes(codes[codes >= 0], self.size)
+
+    def state_percentage(self, modules, state, group=None, excluded=()):
+        """
+        Returns the fraction of the students of modules in a state in any of them
+
+        Inputs
+        ------
+        modules: list of str, module ids
+        state: str, module state
+        group: StudentSet, optional, only count these students
+        excluded: list of str, module ids, students in the state in any of
+                  them are not counted as in the state, e.g. "completed A but
+                  not B" is modules ["A"] and excluded ["B"]
+
+        Returns
+        -------
+        percentage: float, 0 when the modules have no students
+        """
+        total = union((self.students(module) for module in modules), self.size)
+        in_state = union(
+            (self.students(module, state) for module in modules), self.size
+        ) - union((self.students(module, state) for module in excluded), self.size)
+        if group is not None:
+            total, in_state = total & group, in_state & group
+
+        total = len(total)
+        return len(in_state) / total if total else 0
+
+    def memory_usage(self):
+        """
+        Returns the bytes held by the bitmaps
+        """
+        sets = [
+            *self.module_students.values(),
+            *self.state_students.values(),
+            *self.item_students.values(),
+        ]
+        return sum(student_set.nbytes() for student_set in sets)
@@ -0,0 +1,586 @@
+# imports
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+from shards import default_data_dir, shard_status_path
+from synthetic import export_columns
+
+# Optional: the fetcher needs aiohttp, see README
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Items per page requested from the paginated endpoints, the Canvas maximum
+per_page = 100
+
+# Requests in flight, also the size of the keep-alive connection pool
+default_concurrency = 16
+
+# Attempts of a request failing with a server, connection or rate limit error
+max_attempts = 6
+
+# Seconds before the first retry, doubled on each further attempt
+retry_seconds = 0.5
+
+# Requests slow down once Canvas reports less of the rate limit bucket left
+rate_limit_low_water = 100.0
+
+# Date format of the timestamps of the export
+export_date_format = "%Y-%m-%d %H:%M"
+
+status_columns = ["Course Id", "Course Name", "Status", "Message", "Data Updated On"]
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def next_link(link_header):
+    """
+    Returns the rel="next" url of a Link header, None on the last page
+    """
+    for part in (link_header or "").split(","):
+        match = re.match(r'\s*<([^>]+)>\s*;\s*rel="next"', part)
+        if match:
+            return match.group(1)
+    return None
+
+
+def export_date(timestamp):
+    """
+    Returns a Canvas ISO 8601 timestamp in the date format of the export
+    """
+    if not timestamp:
+        return ""
+    date = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    return date.strftime(export_date_format)
+
+
+def progress_rows(course, student, modules):
+    """
+    Returns the export rows of a student's module progress
+
+    Inputs
+    ------
+    course: dict, Canvas course with 'id' and 'name'
+    student: dict, Canvas user with 'id' and 'name'
+    modules: list of dict, Canvas modules of the student with their 'items'
+
+    Returns
+    -------
+    rows: list of dict, one per item of every module, keyed by export_columns
+    """
+    rows = []
+    for module in modules:
+        for item in module.get("items") or []:
+            requirement = item.get("completion_requirement") or {}
+            completed = requirement.get("completed")
+
+            rows.append(
+                {
+                    "completed_at": export_date(module.get("completed_at")),
+                    "course_id": course["id"],
+                    "module_id": module["id"],
+                    "items_count": module.get("items_count", len(module["items"])),
+                    "module_name": module.get("name", ""),
+                    "module_position": module.get("position", ""),
+                    "state": module.get("state", ""),
+                    "unlock_at": export_date(module.get("unlock_at")),
+                    "student_id": student["id"],
+                    "student_name": student.get("name", ""),
+                    "items_id": item["id"],
+                    "items_title": item.get("title", ""),
+                    "items_position": item.get("position", ""),
+                    "items_indent": item.get("indent", 0),
+                    "items_type": item.get("type", ""),
+                    "items_module_id": item.get("module_id", module["id"]),
+                    "item_cp_req_type": requirement.get("type", ""),
+                    "item_cp_req_completed": (
+                        "" if completed is None else str(bool(completed)).upper()
+                    ),
+                    "course_name": course.get("name", ""),
+                }
+            )
+    return rows
+
+
+def update_status(status_path, course_id, course_name, updated_on):
+    """
+    Sets the row of a course in the status.csv, keeping the other courses
+
+    Inputs
+    ------
+    status_path: str, path of the status.csv read by the dashboard
+    course_id: str, course id
+    course_name: str, course name
+    updated_on: datetime, 'Data Updated On' of the course
+    """
+    rows = []
+    if os.path.exists(status_path):
+        with open(status_path, newline="") as f:
+            rows = [
+                row
+                for row in csv.DictReader(f)
+                if row.get("Course Id") != str(course_id)
+            ]
+
+    rows.append(
+        {
+            "Course Id": str(course_id),
+            "Course Name": course_name,
+            "Status": "Success",
+            "Message": "Course folder has been created in data directory",
+            "Data Updated On": updated_on.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    )
+
+    # written aside and moved in place, the dashboard may read it at any time
+    with open(status_path + ".tmp", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([""] + status_columns)
+        for i, row in enumerate(rows):
+            writer.writerow([i] + [row.get(col, "") for col in status_columns])
+    os.replace(status_path + ".tmp", status_path)
+
+
+# -------------------------------------------------------------
+########################
+#  CANVAS CLIENT       #
+########################
+class RetryableError(Exception):
+    """
+    A request failed in a way that may succeed when retried
+    """
+
+
+class CanvasClient:
+    """
+    Asynchronous Canvas REST API client over a pool of keep-alive connections
+
+    At most `concurrency` requests are in flight, sharing as many pooled
+    connections. Paginated endpoints are followed through their Link
+    headers. Requests failing with a server error, a dropped connection or
+    Canvas' rate limit (403 "Rate Limit Exceeded" or 429) are retried with
+    exponential backoff, and requests are spaced out while the
+    X-Rate-Limit-Remaining header reports the bucket is running low.
+
+    Use as an async context manager, which opens and closes the pool.
+
+    Inputs
+    ------
+    base_url: str, Canvas url, e.g. https://canvas.example.edu
+    token: str, Canvas API access token
+    concurrency: int, requests in flight
+    """
+
+    def __init__(self, base_url, token, concurrency=default_concurrency):
+        if aiohttp is None:
+            raise ImportError("The Canvas fetcher needs aiohttp: pip install aiohttp")
+
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.concurrency = concurrency
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rate_limit_remaining = None
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            headers={"Authorization": f"Bearer {self.token}"},
+            connector=aiohttp.TCPConnector(
+                limit=self.concurrency, keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=120),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def url(self, path):
+        """
+        Returns the absolute url of an API path
+        """
+        return path if path.startswith("http") else self.base_url + path
+
+    async def _request(self, url, params):
+        """
+        Returns the decoded JSON and the next page url of one request
+        """
+        async with self._slots:
+            # space out requests while the rate limit bucket is running low
+            remaining = self.rate_limit_remaining
+            if remaining is not None and remaining < rate_limit_low_water:
+                await asyncio.sleep(
+                    retry_seconds * (1 - remaining / rate_limit_low_water)
+                )
+
+            self.requests += 1
+            try:
+                async with self._session.get(url, params=params) as response:
+                    remaining = response.headers.get("X-Rate-Limit-Remaining")
+                    if remaining is not None:
+                        self.rate_limit_remaining = float(remaining)
+
+                    if response.status in (403, 429):
+                        text = await response.text()
+                        if response.status == 429 or "Rate Limit Exceeded" in text:
+                            self.throttled += 1
+                            raise RetryableError(f"rate limited on {url}")
+                    if response.status >= 500:
+                        raise RetryableError(f"{response.status} on {url}")
+                    response.raise_for_status()
+
+                    return await response.json(), next_link(
+                        response.headers.get("Link")
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                raise RetryableError(f"{error!r} on {url}") from error
+
+    async def _retrying(self, url, params):
+        for attempt in range(max_attempts):
+            try:
+                return await self._request(url, params)
+            except RetryableError as error:
+                if attempt == max_attempts - 1:
+                    raise
+                self.retries += 1
+                delay = retry_seconds * 2**attempt * (0.5 + random.random())
+                logger.debug("Retrying in %.2fs: %s", delay, error)
+                await asyncio.sleep(delay)
+
+    async def get(self, path, params=None):
+        """
+        Returns the decoded JSON of a single object endpoint
+        """
+        body, _ = await self._retrying(self.url(path), params)
+        return body
+
+    async def get_all(self, path, params=None):
+        """
+        Returns the objects of every page of a paginated endpoint
+        """
+        params = {**(params or {}), "per_page": per_page}
+        url = self.url(path)
+
+        objects = []
+        while url is not None:
+            page, url = await self._retrying(url, params)
+            objects.extend(page)
+            # the next page url carries the query parameters
+            params = None
+        return objects
+
+
+# -------------------------------------------------------------
+########################
+#  COURSE OUTPUT       #
+########################
+class CourseWriter:
+    """
+    Writes the module_data.csv of a course as the students are fetched
+
+    Rows are appended to `module_data.csv.partial` and each fetched student
+    id to `module_data.progress` once its rows are written, both in the
+    course folder. A fetch that stopped half way resumes with the students
+    missing from the progress file, rows of a student whose id did not make
+    it to the file are dropped. finish() moves the complete csv in place.
+
+    Inputs
+    ------
+    data_dir: str, directory holding one folder per course
+    course_id: str, course id
+    """
+
+    def __init__(self, data_dir, course_id):
+        course_dir = os.path.join(data_dir, str(course_id))
+        os.makedirs(course_dir, exist_ok=True)
+
+        self.path = os.path.join(course_dir, "module_data.csv")
+        self.partial_path = self.path + ".partial"
+        self.progress_path = os.path.join(course_dir, "module_data.progress")
+
+        self.done = set()
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path) as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+        self._keep_done_rows()
+        self.rows = 0
+
+        self._csv_file = open(self.partial_path, "a", newline="")
+        self._csv = csv.DictWriter(self._csv_file, fieldnames=export_columns)
+        if self._csv_file.tell() == 0:
+            self._csv.writeheader()
+        self._progress = open(self.progress_path, "a")
+
+    def _keep_done_rows(self):
+        """
+        Drops the rows of the students missing from the progress file
+        """
+        if not os.path.exists(self.partial_path):
+            return
+
+        with open(self.partial_path, newline="") as f, open(
+            self.partial_path + ".tmp", "w", newline=""
+        ) as out:
+            writer = csv.DictWriter(out, fieldnames=export_columns)
+            writer.writeheader()
+            writer.writerows(
+                row for row in csv.DictReader(f) if row["student_id"] in self.done
+            )
+        os.replace(self.partial_path + ".tmp", self.partial_path)
+
+    def write(self, student_id, rows):
+        """
+        Appends the rows of a student and marks it fetched
+        """
+        self._csv.writerows(rows)
+        self._csv_file.flush()
+        self._progress.write(f"{student_id}\n")
+        self._progress.flush()
+
+        self.done.add(str(student_id))
+        self.rows += len(rows)
+
+    def close(self):
+        self._csv_file.close()
+        self._progress.close()
+
+    def finish(self):
+        """
+        Publishes the complete module_data.csv of the course
+        """
+        self.close()
+        os.replace(self.partial_path, self.path)
+        os.remove(self.progress_path)
+
+
+# -------------------------------------------------------------
+########################
+#  FETCHER             #
+########################
+class ProgressFetcher:
+    """
+    Fetches the module progress of every student of courses into the data dir
+
+    For each course the students are listed, then `concurrency` workers
+    fetch the modules, with their items and the student's progress, of one
+    student at a time. Each course is written to `<data_dir>/<course id>/
+    module_data.csv`, the layout CourseShardStore reads, and its row in the
+    status.csv is dated once the course is complete, so a running dashboard
+    reloads it.
+
+    Inputs
+    ------
+    client: CanvasClient, open client
+    data_dir: str, directory holding one folder per course
+    status_path: str, path of the status.csv read by the dashboard
+    """
+
+    def __init__(self, client, data_dir, status_path):
+        self.client = client
+        self.data_dir = data_dir
+        self.status_path = status_path
+
+        self.students = 0
+        self.rows = 0
+
+    async def course_ids(self):
+        """
+        Returns the ids of the courses visible to the token
+        """
+        courses = await self.client.get_all("/api/v1/courses")
+        return [str(course["id"]) for course in courses]
+
+    async def student_modules(self, course_id, student_id):
+        """
+        Returns the modules of a course with the items and progress of a student
+        """
+        params = {"student_id": student_id, "include[]": "items"}
+        modules = await self.client.get_all(
+            f"/api/v1/courses/{course_id}/modules", params
+        )
+
+        # Canvas leaves out the items of modules with too many of them
+        for module in modules:
+            if "items" not in module:
+                module["items"] = await self.client.get_all(
+                    f"/api/v1/courses/{course_id}/modules/{module['id']}/items",
+                    {"student_id": student_id},
+                )
+        return modules
+
+    async def fetch_course(self, course_id):
+        """
+        Fetches the progress of every student of a course, resuming a stopped fetch
+
+        Returns
+        -------
+        rows: int, rows written by this call
+        """
+        course = await self.client.get(f"/api/v1/courses/{course_id}")
+        students = await self.client.get_all(
+            f"/api/v1/courses/{course_id}/users", {"enrollment_type[]": "student"}
+        )
+
+        writer = CourseWriter(self.data_dir, course_id)
+        queue = asyncio.Queue()
+        for student in students:
+            if str(student["id"]) not in writer.done:
+                queue.put_nowait(student)
+        logger.info(
+            "Course %s: %d students, %d already fetched",
+            course_id,
+            len(students),
+            len(students) - queue.qsize(),
+        )
+
+        async def worker():
+            while True:
+                try:
+                    student = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                modules = await self.student_modules(course_id, student["id"])
+                writer.write(student["id"], progress_rows(course, student, modules))
+                self.students += 1
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(self.client.concurrency)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            # what was written is kept for the next run to resume from
+            writer.close()
+            raise
+
+        writer.finish()
+        update_status(
+            self.status_path,
+            course_id,
+            course.get("name", ""),
+            datetime.now(timezone.utc),
+        )
+        self.rows += writer.rows
+        return writer.rows
+
+    async def fetch(self, course_ids=None):
+        """
+        Fetches the given courses, every course visible to the token by default
+
+        Returns
+        -------
+        rows: dict, course id to the rows written
+        """
+        course_ids = course_ids or await self.course_ids()
+        return {
+            course_id: await self.fetch_course(course_id) for course_id in course_ids
+        }
+
+
+async def fetch_progress(
+    base_url,
+    token,
+    data_dir,
+    status_path,
+    course_ids=None,
+    concurrency=default_concurrency,
+):
+    """
+    Fetches the module progress of courses into the data dir, see ProgressFetcher
+
+    Returns
+    -------
+    stats: dict, 'courses', 'students', 'rows', 'requests', 'retries',
+           'throttled' and 'seconds'
+    """
+    start = time.perf_counter()
+    async with CanvasClient(base_url, token, concurrency) as client:
+        fetcher = ProgressFetcher(client, data_dir, status_path)
+        rows = await fetcher.fetch(course_ids)
+
+    return {
+        "courses": len(rows),
+        "students": fetcher.students,
+        "rows": fetcher.rows,
+        "requests": client.requests,
+        "retries": client.retries,
+        "throttled": client.throttled,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch the module progress of Canvas courses into the "
+        "dashboard's per-course data directory"
+    )
+    parser.add_argument("url", help="Canvas url, e.g. https://canvas.example.edu")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("CANVAS_TOKEN"),
+        help="API access token (default: $CANVAS_TOKEN)",
+    )
+    parser.add_argument(
+        "--courses", help="comma separated course ids (default: every course)"
+    )
+    parser.add_argument("--data-dir", default=default_data_dir)
+    parser.add_argument(
+        "--status",
+        help="status.csv read by the dashboard (default: status.csv in the data dir)",
+    )
+    parser.add_argument("--concurrency", type=int, default=default_concurrency)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = asyncio.run(
+        fetch_progress(
+            args.url,
+            args.token,
+            args.data_dir,
+            args.status or shard_status_path(args.data_dir),
+            args.courses.split(",") if args.courses else None,
+            args.concurrency,
+        )
+    )
+    print(
+        f"Fetched {stats['rows']} rows of {stats['students']} students in "
+        f"{stats['courses']} courses with {stats['requests']} requests "
+        f"({stats['retries']} retried, {stats['throttled']} rate limited) "
+        f"in {stats['seconds']:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+# imports
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+import pandas as pd
+
+from aggregates import (
+    build_state_cube,
+    build_completion_timeline,
+    build_duration_sketches,
+    build_schema_item_completion,
+)
+from bitmaps import StudentBitmaps
+from dimensions import DimensionIndex, dimension_columns
+from schema import StarSchema
+from snapshot import load_course_tables, load_module_data
+from students import StudentIndex
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------
+########################
+#  DATASET             #
+########################
+class Dataset:
+    """
+    The module data together with every lookup table derived from it
+
+    The module data is held as a StarSchema and the module metrics are built
+    from its module_progress table. The item rows are only read while the
+    dataset is built.
+
+    A dataset is built in full before it is published and is never modified
+    afterwards, so a callback that reads one dataset sees a consistent view
+    of the data even while a newer dataset is being built. Only the student
+    bitmaps, which few callers need, are built from its tables on first use.
+
+    Inputs
+    ------
+    data: dataframe, module data as returned by load_module_data
+    version: pd.Timestamp, 'Data Updated On' of the export the data came from
+    tables: dict, the aggregate tables of the course stored by the streaming
+            ingest (see load_course_tables), built from the data if None
+    """
+
+    def __init__(self, data, version=None, tables=None):
+        self.version = version
+        tables = tables or {}
+
+        # Seconds spent building each group of lookup tables
+        self.build_seconds = {}
+        timer = PhaseTimer(self.build_seconds)
+
+        # Dimension and fact tables replace the module data, which repeats
+        # the module fields of a student on each of its item rows
+        data_bytes = int(data.memory_usage(deep=True).sum())
+        self.schema = StarSchema(data)
+        timer.lap("star_schema")
+
+        self.modules = list(self.schema.modules.module_id)
+        self.total_students = len(self.schema.students)
+
+        # Integer codes of the course, module, student and item ids
+        self.dimension_index = DimensionIndex(data)
+        timer.lap("dimension_index")
+
+        # Make a dictionary of module id and module names
+        schema = self.schema
+        self.module_dict = id_lookup(
+            schema.modules.module_id, schema.modules.module_name, module_title
+        )
+        self.item_dict = id_lookup(data.items_module_id, data.items_title)
+        self.course_dict = id_lookup(
+            schema.courses.course_id, schema.courses.course_name
+        )
+        self.student_dict = id_lookup(
+            schema.students.student_id, schema.students.student_name
+        )
+        timer.lap("lookup_dicts")
+
+        # Module states and item completions of each student, for the student filter
+        self.student_index = StudentIndex(
+            schema, self.dimension_index, self.student_dict
+        )
+        timer.lap("student_index")
+
+        # Distinct student counts per course, module and state
+        self.state_cube = tables.get("state_cube")
+        if self.state_cube is None:
+            self.state_cube = build_state_cube(schema.module_progress)
+        self.state_cube_slices = self.dimension_index.aggregate_slices(self.state_cube)
+        timer.lap("state_cube")
+
+        # Cumulative distinct completers per module and day
+        self.completion_timeline = tables.get("completion_timeline")
+        if self.completion_timeline is None:
+            self.completion_timeline = build_completion_timeline(schema.module_progress)
+        timer.lap("completion_timeline")
+
+        # Distinct students who completed each item of each module
+        self.item_completion = tables.get("item_completion")
+        if self.item_completion is None:
+            self.item_completion = build_schema_item_completion(schema)
+        self.item_completion_slices = self.dimension_index.aggregate_slices(
+            self.item_completion
+        )
+        timer.lap("item_completion")
+
+        # Students per module, per module state and per completed item, built
+        # on first use by student_bitmaps
+        self._student_bitmaps = None
+        self._bitmaps_lock = threading.Lock()
+
+        # Quantile sketch of the time to complete of each module
+        self.duration_sketches = tables.get("duration_sketches")
+        if self.duration_sketches is None:
+            self.duration_sketches = build_duration_sketches(schema.module_progress)
+        timer.lap("duration_sketches")
+
+        # Creating a dictionary of items per module
+        # The items are in the order of their first row, so the distinct titles
+        # of a module are in the order of its rows
+        self.items_in_module = defaultdict(str)
+
+        titles = schema.items[["module_id", "items_title"]].drop_duplicates()
+        for module, rows in titles.groupby("module_id", observed=True):
+            self.items_in_module[str(module)] = list(rows["items_title"])
+        timer.lap("items_in_module")
+
+        # Date bounds of the DatePickerRange
+        progress = schema.module_progress
+        self.min_date, self.max_date = date_bounds(
+            (progress["completed_at"].min(), progress["completed_at"].max()),
+            (progress["unlock_at"].min(), progress["unlock_at"].max()),
+        )
+        timer.lap("date_bounds")
+
+        logger.debug(
+            "Built the lookup tables of %d rows in %s, module data of %d bytes "
+            "split into a star schema of %d bytes",
+            len(data),
+            format_seconds(self.build_seconds),
+            data_bytes,
+            sum(schema.memory_usage().values()),
+        )
+
+    @property
+    def student_bitmaps(self):
+        """
+        Returns the StudentBitmaps of the dataset, building them on first use
+        """
+        with self._bitmaps_lock:
+            if self._student_bitmaps is None:
+                facts = self.schema.item_progress
+                done = facts[facts.completed]
+                items = self.schema.items["items_id"].to_numpy()
+                self._student_bitmaps = StudentBitmaps(
+                    self.dimension_index.values["student"],
+                    self.schema.module_progress,
+                    pd.DataFrame(
+                        {
+                            "items_id": items[done["item"].to_numpy()],
+                            "student_id": done["student_id"].to_numpy(),
+                        }
+                    ),
+                )
+        return self._student_bitmaps
+
+    def memory_usage(self):
+        """
+        Returns the bytes held by the star schema, the aggregate tables and the
+        student bitmaps once built
+        """
+        frames = [
+            *self.schema.tables().values(),
+            self.state_cube,
+            self.completion_timeline,
+            self.item_completion,
+        ]
+        return int(
+            sum(frame.memory_usage(deep=True).sum() for frame in frames)
+            + self.student_index.memory_usage()
+            + (
+                self._student_bitmaps.memory_usage()
+                if self._student_bitmaps is not None
+                else 0
+            )
+        )
+
+
+class DatasetStore:
+    """
+    Holds one dataset per course of a single module_data.csv export
+
+    Every course of the export is kept in memory. Callbacks call get() once
+    and work on the returned dataset, a reload publishes the datasets of the
+    new export by replacing the reference in a single step.
+
+    Inputs
+    ------
+    data_path: str, path of the module_data.csv export
+    status_path: str, path of the status.csv written by the export
+    """
+
+    def __init__(self, data_path, status_path):
+        self.data_path = data_path
+        self.status_path = status_path
+        self._datasets = self._load(read_status(status_path))
+
+    def _load(self, status):
+        versions = course_versions(status)
+        latest = max(versions.values(), default=None)
+
+        seconds = {}
+        timer = PhaseTimer(seconds)
+        data = load_module_data(self.data_path)
+        course_tables = load_course_tables(self.data_path) or {}
+        timer.lap("load_module_data")
+
+        datasets, tables = {}, {}
+        for course, frame in split_courses(data):
+            timer.lap("split_courses")
+            datasets[course] = Dataset(
+                frame, versions.get(course, latest), course_tables.get(course)
+            )
+            timer.lap("datasets")
+            for phase, phase_seconds in datasets[course].build_seconds.items():
+                tables[phase] = tables.get(phase, 0.0) + phase_seconds
+
+        logger.info(
+            "Loaded %d courses of %s in %s, datasets: %s",
+            len(datasets),
+            self.data_path,
+            format_seconds(seconds),
+            format_seconds(tables),
+        )
+        return datasets
+
+    def courses(self):
+        """
+        Returns the course id to course name of every course served
+        """
+        return {
+            course: dataset.course_dict[course]
+            for course, dataset in self._datasets.items()
+        }
+
+    def get(self, course_id):
+        """
+        Returns the dataset of a course, None when the course is unknown
+        """
+        return self._datasets.get(str(course_id))
+
+    def versions(self):
+        """
+        Returns the course id to version of every course served
+        """
+        return {course: dataset.version for course, dataset in self._datasets.items()}
+
+    def refresh(self):
+        """
+        Reloads the export if its status is newer, returns True if it did
+        """
+        status = read_status(self.status_path)
+        versions = course_versions(status)
+        served = {course: dataset.version for course, dataset in self._datasets.items()}
+
+        if not any(
+            course not in served or served[course] is None or version > served[course]
+            for course, version in versions.items()
+        ):
+            return False
+
+        self._datasets = self._load(status)
+        logger.info("Reloaded %s", self.data_path)
+        return True
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def id_lookup(ids, values, clean=None):
+    """
+    Returns a dictionary of every id (as str) to its value
+
+    Built from the distinct ids rather than row by row, with the same result:
+    ids are in the order of their first row and map to the value of their
+    last row.
+
+    Inputs
+    ------
+    ids: pd.Series, id column
+    values: pd.Series, value column of the same rows
+    clean: callable, applied to the value of each id
+
+    Returns
+    -------
+    lookup: defaultdict(str), id to value
+    """
+    rows = pd.DataFrame({"id": ids, "value": values})
+    order = rows["id"].drop_duplicates()
+    last = rows.drop_duplicates("id", keep="last")
+    latest = dict(zip(last["id"], last["value"]))
+
+    clean = clean or (lambda value: value)
+    return defaultdict(str, ((str(key), clean(latest[key])) for key in order))
+
+
+def date_bounds(*ranges):
+    """
+    Returns the first and last date of the first range with both ends known
+
+    A course nobody has completed a module of yet has no completion dates,
+    its date picker spans the unlock dates instead, or today without those.
+
+    Inputs
+    ------
+    ranges: (first, last) timestamps, NaT or None when unknown, e.g. the
+            completion dates then the unlock dates of a course
+
+    Returns
+    -------
+    min_date, max_date: datetime.date
+    """
+    for first, last in ranges:
+        if pd.notna(first) and pd.notna(last):
+            return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    today = date.today()
+    return today, today
+
+
+def module_title(module_name):
+    """
+    Returns a module name without its "Module <n>: " prefix
+    """
+    return re.sub(r"^Module\s+\d+:\s+", "", module_name)
+
+
+class PhaseTimer:
+    """
+    Records the wall time between consecutive laps under the name of each lap
+
+    Inputs
+    ------
+    seconds: dict, phase name to seconds, filled by lap()
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Records the time since the previous lap as phase
+        """
+        now = time.perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + now - self._last
+        self._last = now
+
+
+def format_seconds(seconds):
+    """
+    Returns the total and the phase times recorded by a PhaseTimer as text
+    """
+    phases = ", ".join(f"{phase} {s:.3f}s" for phase, s in seconds.items())
+    return f"{sum(seconds.values()):.3f}s ({phases})"
+
+
+# -------------------------------------------------------------
+########################
+#  RELOADING           #
+########################
+def read_status(status_path):
+    """
+    Returns the status file written by the export, one row per course
+
+    Inputs
+    ------
+    status_path: str, path of the status.csv written by the export
+
+    Returns
+    -------
+    status: dataframe, with 'Course Id' as str and 'Data Updated On' as
+            datetime, empty when the file is missing
+    """
+    try:
+        status = pd.read_csv(status_path, dtype={"Course Id": str})
+    except FileNotFoundError:
+        return pd.DataFrame(columns=["Course Id", "Course Name", "Data Updated On"])
+
+    status["Data Updated On"] = pd.to_datetime(
+        status["Data Updated On"], errors="coerce", format="mixed"
+    )
+    return status
+
+
+def course_versions(status):
+    """
+    Returns the course id to 'Data Updated On' of every dated course in status
+    """
+    dated = status.dropna(subset=["Data Updated On"])
+    return dict(zip(dated["Course Id"], dated["Data Updated On"]))
+
+
+def split_courses(data):
+    """
+    Yields the course id and rows of every course in the module data
+
+    The id categories of each course are reduced to the values it uses so the
+    dimension codes of a course dataset stay dense.
+    """
+    for course, rows in data.groupby("course_id", observed=True):
+        rows = rows.reset_index(drop=True)
+        for col in dimension_columns.values():
+            rows[col] = rows[col].cat.remove_unused_categories()
+        yield str(course), rows
+
+
+class StatusWatcher(threading.Thread):
+    """
+    Background thread that reloads the data when the export is refreshed
+
+    Every `interval` seconds the store is asked to refresh. The store compares
+    the 'Data Updated On' of the status file with the data it serves and
+    builds any newer dataset on this thread before swapping it in. A failed
+    reload is logged and the current data keeps being served until the next
+    poll.
+
+    Inputs
+    ------
+    store: DatasetStore, CourseShardStore or SqlStore, store to refresh
+    interval: float, seconds between two polls of the status file
+    """
+
+    def __init__(self, store, interval=60):
+        super().__init__(name="status-watcher", daemon=True)
+        self.store = store
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.store.refresh()
+            except Exception:
+                logger.exception("Reloading the module data failed")
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,116 @@
+# imports
+import numpy as np
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Dimension name and the categorical column holding its ids
+dimension_columns = {
+    "course": "course_id",
+    "module": "module_id",
+    "student": "student_id",
+    "item": "items_id",
+}
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def sort_by_module(df):
+    """
+    Returns the rows of df ordered by module so each module is contiguous
+
+    Inputs
+    ------
+    df: dataframe, module data with a categorical module_id column
+
+    Returns
+    -------
+    df: dataframe, rows stably sorted by the module_id category code
+    """
+    order = np.argsort(df.module_id.cat.codes.to_numpy(), kind="stable")
+    return df.iloc[order].reset_index(drop=True)
+
+
+# -------------------------------------------------------------
+########################
+#  DIMENSION INDEX     #
+########################
+class DimensionIndex:
+    """
+    Dense integer codes for the course, module, student and item dimensions
+
+    The codes are the category codes of the id columns, so a dropdown value
+    is resolved to a code with a dictionary lookup and rows are selected by
+    comparing or slicing integer arrays instead of converting whole columns
+    to strings.
+
+    Inputs
+    ------
+    df: dataframe, module data with categorical id columns, sorted by
+        sort_by_module
+    """
+
+    def __init__(self, df):
+        self.values, self.lookup, self.codes = {}, {}, {}
+
+        for dimension, col in dimension_columns.items():
+            values = [str(value) for value in df[col].cat.categories]
+
+            self.values[dimension] = values
+            self.lookup[dimension] = {value: code for code, value in enumerate(values)}
+            self.codes[dimension] = df[col].cat.codes.to_numpy()
+
+        # Row slice of every module in df
+        self.module_rows = self.module_slices(self.codes["module"])
+
+    def code(self, dimension, value):
+        """
+        Returns the integer code of a dimension value, -1 when it is unknown
+        """
+        return self.lookup[dimension].get(str(value), -1)
+
+    def module_slices(self, module_codes):
+        """
+        Returns the row slice of every module in an array of module codes
+
+        Inputs
+        ------
+        module_codes: np.array, module codes sorted in ascending order
+
+        Returns
+        -------
+        slices: dict, module id (str) to the slice of its rows
+        """
+        modules = self.values["module"]
+        bounds = np.searchsorted(module_codes, np.arange(len(modules) + 1))
+
+        return {
+            module: slice(int(bounds[code]), int(bounds[code + 1]))
+            for code, module in enumerate(modules)
+            if bounds[code] < bounds[code + 1]
+        }
+
+    def aggregate_slices(self, aggregate):
+        """
+        Returns the row slice of every module in a module ordered aggregate
+
+        Inputs
+        ------
+        aggregate: dataframe, with a module_id index level, ordered by module
+                   code as returned by the aggregate builders
+
+        Returns
+        -------
+        slices: dict, module id (str) to the slice of its rows
+        """
+        module_codes = np.array(
+            [
+                self.lookup["module"][module]
+                for module in aggregate.index.get_level_values("module_id")
+            ],
+            dtype=np.int64,
+        )
+        return self.module_slices(module_codes)
@@ -0,0 +1,139 @@
+# imports
+import threading
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+
+# -------------------------------------------------------------
+########################
+#  FIGURE CACHE        #
+########################
+class FigureCache:
+    """
+    Bounded least recently used cache of the figures returned by callbacks
+
+    Keys combine the callback name, its input values and the version of the
+    dataset the figure was built from, so a reloaded dataset never serves a
+    figure of the previous one. Cached figures are shared between requests
+    and must not be modified once returned.
+
+    The line plot of a large course is far bigger than a bar chart, so the
+    cache is bounded by the bytes of its figures as well as by their number.
+    The size of a figure is the length of its JSON, about what it takes in
+    memory and what the response sends. A figure larger than the whole
+    budget is returned without being cached.
+
+    Inputs
+    ------
+    max_entries: int, number of figures kept before the least recently used
+                 one is evicted, 0 disables the cache
+    max_bytes: int, JSON bytes of the figures kept before the least recently
+               used ones are evicted, None for no byte budget
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # callback name to its [hits, misses]
+        self.callback_lookups = {}
+
+        # key to (figure, JSON bytes)
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._figures)
+
+    def get_or_build(self, key, build):
+        """
+        Returns the cached figure of key, building and caching it on a miss
+
+        Inputs
+        ------
+        key: tuple, (callback name, input values, dataset version)
+        build: callable, returns the figure when it is not cached
+
+        Returns
+        -------
+        figure: dict, JSON serializable plotly figure
+        """
+        with self._lock:
+            lookups = self.callback_lookups.setdefault(key[0], [0, 0])
+            if key in self._figures:
+                self.hits += 1
+                lookups[0] += 1
+                self._figures.move_to_end(key)
+                return self._figures[key][0]
+            self.misses += 1
+            lookups[1] += 1
+
+        # built and sized outside the lock so one slow figure does not block
+        # the others
+        figure = build()
+        size = figure_bytes(figure) if self.max_bytes is not None else 0
+        if self.max_entries <= 0 or (
+            self.max_bytes is not None and size > self.max_bytes
+        ):
+            return figure
+
+        with self._lock:
+            previous = self._figures.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._figures[key] = (figure, size)
+            self.bytes += size
+
+            while len(self._figures) > self.max_entries or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                _, (_, evicted) = self._figures.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+        return figure
+
+    def clear(self):
+        """
+        Drops every cached figure, the counters are kept
+        """
+        with self._lock:
+            self._figures.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Returns the size and hit/miss counters of the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._figures),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "callbacks": {
+                    name: {"hits": hits, "misses": misses}
+                    for name, (hits, misses) in self.callback_lookups.items()
+                },
+            }
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def figure_bytes(figure):
+    """
+    Returns the length of the JSON of a cached value, as Dash would send it
+    """
+    return len(to_json_plotly(figure))
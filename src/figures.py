@@ -0,0 +1,750 @@
+# imports
+import datetime
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from aggregates import (
+    completion_durations,
+    completion_window,
+    module_states,
+    state_percentages,
+)
+from metrics import callback_metrics
+from payload import compact_figure, downsample_line, narrow_values
+
+# ------------------------------------------------------
+########################
+#  PLOT FUNCTIONS      #
+########################
+# The plot functions build the figures of the dashboard from the aggregates
+# of a dataset. They are shared by the callbacks of app.py and the static
+# reports of reports.py, so importing them has no side effect.
+
+# Define shared style settings
+axis_label_font_size = 12
+
+# Payload budget: the line traces of a figure are downsampled to at most the
+# points below, about the plot width in pixels, and drawn with WebGL when
+# the figure has more than webgl_points points. Bars are never dropped, the
+# numeric arrays of every figure are sent in their most compact type. The
+# responses are only gzip compressed with flask-compress installed, which
+# app.py warns about at start up when it is missing.
+payload_budget = True
+figure_max_points = {"module_completion_lineplot": 1000}
+webgl_points = 5000
+
+# Colors
+# Define custom colors for the bars
+colors = ["#823551", "#1E88E5", "#FFC107", "#5C5934", "#DA981D", "#4F6793"]
+
+# Define the color mapping of the module states
+state_colors = {
+    "locked": "#d9d9d9",
+    "unlocked": "#cafb9c",
+    "started": "#77bc34",
+    "completed": "#0d203e",
+}
+
+
+def module_completion_table(cube, module_dict):
+    """
+    Returns datatable of student percentage module completion per module
+
+    Input:
+    -----------
+    cube: dataframe, distinct student counts as returned by build_state_cube
+    module_dict: dict, module id to module name
+
+    Returns:
+    -----------
+    df_mod: dataframe, one row per module with the unlocked, started and
+            completed student percentages
+    """
+    modules = cube.index.get_level_values("module_id")
+
+    df_mod = (
+        state_percentages(cube)
+        .round(1)
+        .set_axis([module_dict.get(module) for module in modules])
+        .rename_axis("Module")
+        .reset_index()
+    )
+
+    return df_mod
+
+
+def module_completion_barplot(cube, module_dict):
+    """
+    Plots a horizontal barplot of student percentage module completion per module
+
+    Input:
+    -----------
+    cube: dataframe, distinct student counts as returned by build_state_cube
+    module_dict: dict, module id to module name
+
+    Returns:
+    -----------
+    fig_1_json: dict, JSON serializable plotly figure
+    """
+    df_mod = module_completion_table(cube, module_dict)
+
+    # Melt the DataFrame to convert columns to rows
+    melted_df = pd.melt(
+        df_mod,
+        id_vars="Module",
+        value_vars=["unlocked", "started", "completed"],
+        var_name="Status",
+        value_name="Percentage Completion",
+    )
+    callback_metrics.lap("frame")
+
+    # Create a horizontal bar chart using Plotly
+    fig_1 = px.bar(
+        melted_df,
+        y="Module",
+        x="Percentage Completion",
+        color="Status",
+        orientation="h",
+        labels={"Percentage Completion": "Percentage Completion (%)"},
+        title="Percentage Completion by Students for Each Module",
+        category_orders={"Module": sorted(melted_df["Module"].unique())},
+        color_discrete_map=state_colors,  # Set the color mapping
+    )
+
+    fig_1.update_layout(
+        showlegend=True,  # Show the legend indicating the module status colors
+        legend_title="Status",  # Customize the legend title,
+        legend_traceorder="reversed",  # Reverse the order of the legend items
+    )
+
+    # Modify the plotly configuration to change the background color
+    fig_1.update_layout(
+        plot_bgcolor="rgb(255, 255, 255)",
+        xaxis=dict(title_font=dict(size=axis_label_font_size)),
+        yaxis=dict(title_font=dict(size=axis_label_font_size)),
+    )
+    callback_metrics.lap("figure")
+
+    # Convert the figure to a JSON serializable format
+    fig_1_json = fig_1.to_dict()
+    if payload_budget:
+        fig_1_json = compact_figure(fig_1_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_1_json
+
+
+def parse_date(date):
+    """
+    Returns a date of the DatePickerRange as datetime.date
+
+    Inputs
+    ------
+    date: str or datetime.date, 'YYYY-MM-DD' as sent by the DatePickerRange
+
+    Returns
+    -------
+    date: datetime.date
+    """
+    # Convert the date to datetime object if it is of type string
+    if isinstance(date, str):
+        date = datetime.datetime.strptime(date[:10], "%Y-%m-%d").date()
+
+    assert isinstance(date, datetime.date)
+    return date
+
+
+def lineplot_lines(timeline, module_dict, start_date, end_date):
+    """
+    Returns the points of every line of the module completion lineplot
+
+    Inputs
+    ------
+    timeline: dataframe, as returned by build_completion_timeline
+    module_dict: dict, module id to module name
+    start_date: datetime.date, first date shown
+    end_date: datetime.date, last date shown
+
+    Returns
+    -------
+    lines: list of (module name, dates, percentages), ordered by module name,
+           each line reduced to the points budget
+    """
+    window = completion_window(timeline, start_date, end_date)
+
+    result_time = pd.DataFrame(
+        {
+            "Date": window["date"].dt.date,
+            "Module": window["module_id"].map(module_dict),
+            "Percentage Completion": (
+                window["completers"] * 100 / window["total"]
+            ).round(1),
+        }
+    )
+
+    # Lines are reduced to the points budget while keeping their shape
+    max_points = (
+        figure_max_points.get("module_completion_lineplot") if payload_budget else None
+    )
+    lines = []
+    for module, group in result_time.groupby("Module"):
+        sorted_group = group.sort_values("Date")
+        x, y = downsample_line(
+            sorted_group["Date"], sorted_group["Percentage Completion"], max_points
+        )
+        lines.append((module, x, y))
+
+    return lines
+
+
+def lineplot_window_points(timeline, module_dict, start_date, end_date):
+    """
+    Returns the points of the lineplot traces needed to show a date window
+
+    The lineplot of a course holds the lines of its whole date range, so a
+    window of it only needs the x axis range, unless a line was reduced to
+    the points budget: the window is then drawn from the points budget of
+    the window instead of the fewer points of the whole range falling in it.
+
+    Inputs
+    ------
+    timeline: dataframe, as returned by build_completion_timeline
+    module_dict: dict, module id to module name
+    start_date: datetime.date, first date shown
+    end_date: datetime.date, last date shown
+
+    Returns
+    -------
+    points: list of (dates, percentages) lists, one per trace of the whole
+            range lineplot, None when it already holds every point
+    """
+    max_points = (
+        figure_max_points.get("module_completion_lineplot") if payload_budget else None
+    )
+    if max_points is None or timeline.empty:
+        return None
+    if timeline.groupby("module_id", sort=False).size().max() <= max_points:
+        return None
+
+    # Traces of the whole range lineplot are ordered by module name
+    modules = sorted(set(timeline["module_id"].map(module_dict).dropna()))
+    lines = {
+        module: (x.astype(str).tolist(), y.tolist())
+        for module, x, y in lineplot_lines(timeline, module_dict, start_date, end_date)
+    }
+    return [lines.get(module, ([], [])) for module in modules]
+
+
+def module_completion_lineplot(timeline, module_dict, start_date, end_date):
+    """
+    Return a lineplot showing the percentage completion by data
+    of each module
+
+    Inputs:
+    ---------
+    timeline: dataframe, as returned by build_completion_timeline
+    module_dict: dict, module id to module name
+    start_date: str or datetime.date, first date shown
+    end_date: str or datetime.date, last date shown
+
+    Returns:
+    --------
+    fig_2_json: dict, JSON serializable plotly figure
+    """
+    start_date, end_date = parse_date(start_date), parse_date(end_date)
+
+    # For each module, create a lineplot with date on the x axis, percentage completion on y axis
+    lines = lineplot_lines(timeline, module_dict, start_date, end_date)
+
+    # WebGL draws many points faster than SVG
+    points = sum(len(x) for _, x, _ in lines)
+    scatter = go.Scattergl if payload_budget and points > webgl_points else go.Scatter
+    callback_metrics.lap("frame")
+
+    # Plotting
+    fig_2 = go.Figure()
+    for i, (module, x, y) in enumerate(lines):
+        # whole percentages are sent as small integers
+        if payload_budget:
+            y = narrow_values(y)
+
+        if len(x) == 1:
+            fig_2.add_trace(
+                scatter(
+                    x=x,
+                    y=y,
+                    mode="markers",
+                    name=module,
+                    marker=dict(color=colors[i % len(colors)]),
+                )
+            )
+
+        else:
+            fig_2.add_trace(
+                scatter(
+                    x=x,
+                    y=y,
+                    mode="lines",
+                    name=module,
+                    line=dict(color=colors[i % len(colors)]),
+                )
+            )
+
+    fig_2.update_layout(
+        title="Percentage Completion by Module",
+        xaxis=dict(
+            title="Date", tickangle=-90, title_font=dict(size=axis_label_font_size)
+        ),
+        yaxis=dict(title="Percentage", title_font=dict(size=axis_label_font_size)),
+        plot_bgcolor="rgba(240, 240, 240, 0.8)",  # Light gray background color
+        xaxis_gridcolor="rgba(200, 200, 200, 0.2)",  # Faint gridlines
+        yaxis_gridcolor="rgba(200, 200, 200, 0.2)",  # Faint gridlines
+        margin=dict(l=50, r=50, t=50, b=50),  # Add margin for a border line
+        paper_bgcolor="white",  # Set the background color of the entire plot
+    )
+
+    # Set custom start and end dates for the x-axis
+    fig_2.update_xaxes(range=[start_date, end_date])
+
+    # Specify custom spacing between dates on the x-axis
+    date_spacing = "D7"  # Weekly spacing, adjust as per your requirement
+    fig_2.update_xaxes(dtick=date_spacing)
+    callback_metrics.lap("figure")
+
+    # Convert the figure to a JSON serializable format
+    fig_2_json = fig_2.to_dict()
+    if payload_budget:
+        fig_2_json = compact_figure(fig_2_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_2_json
+
+
+def item_completion_barplot(items, module_dict):
+    """
+    Return a horizontal barplot showing the percentage completion
+    of each item under each module
+
+    Inputs:
+    --------------
+    items: dataframe, item completion counts as returned by build_item_completion
+    module_dict: dict, module id to module name
+
+    Returns:
+    --------------
+    fig_3_json: dict, JSON serializable plotly figure
+    """
+    items = items.reset_index()
+
+    # Items are keyed by id, titles repeated within a module are told apart by position
+    titles = item_titles(items)
+
+    # Computing the percentage completion in each item of a module
+    student_completion_per_item = pd.DataFrame(
+        {
+            "Module": items["module_id"].map(module_dict),
+            "Item": titles,
+            "Item Percentage Completion": (
+                items["completers"] * 100 / items["total"]
+            ).round(0),
+            "Item Position": items["items_position"],
+        }
+    )
+
+    # Plotting
+    # Group the DataFrame by 'module'
+    grouped_df = student_completion_per_item.groupby("Module")
+    callback_metrics.lap("frame")
+
+    # Create subplots with one subplot per module
+    fig_3 = make_subplots(
+        rows=1,
+        cols=len(grouped_df),
+        shared_yaxes=True,
+        horizontal_spacing=0.01,
+        subplot_titles=list(grouped_df.groups.keys()),
+    )
+
+    # Iterate over each module group
+    for i, (module, group) in enumerate(grouped_df):
+        # Commenting out since the items should not be sorted
+        # Items need to appear in the same order as in the module
+        # sorted_group = group.sort_values('Item Percentage Completion', ascending=True)
+
+        # Percentages are rounded to whole numbers, sent as small integers
+        percentages = group["Item Percentage Completion"]
+        if payload_budget:
+            percentages = narrow_values(percentages)
+
+        # Create a horizontal bar chart for the module
+        fig_3.add_trace(
+            go.Bar(
+                x=group["Item"],
+                y=percentages,
+                orientation="v",
+                name=module,
+                marker=dict(color=colors[i % len(colors)], opacity=0.8),
+                text=[],
+                hovertemplate="Item Title: %{x}<br>Completion: %{y}%<extra></extra>",
+            ),
+            row=1,
+            col=i + 1,
+        )
+
+    # Update the layout of the figure
+    fig_3.update_layout(
+        height=400,
+        title="Percentage Completion by Item for Each Module",
+        xaxis=dict(title="Items", title_font=dict(size=axis_label_font_size)),
+        yaxis=dict(
+            title="Percentage Completion", title_font=dict(size=axis_label_font_size)
+        ),
+    )
+    callback_metrics.lap("figure")
+
+    # Convert the figure to a JSON serializable format
+    fig_3_json = fig_3.to_dict()
+    if payload_budget:
+        fig_3_json = compact_figure(fig_3_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_3_json
+
+
+def item_titles(items):
+    """
+    Returns the item titles, titles repeated within a module told apart by position
+
+    Inputs
+    ------
+    items: dataframe, with columns 'module_id', 'items_title' and 'items_position'
+    """
+    titles = items["items_title"].astype(str)
+    repeated = items.duplicated(["module_id", "items_title"], keep=False)
+    return titles.where(
+        ~repeated, titles + " (" + items["items_position"].astype(str) + ")"
+    )
+
+
+def student_completion_table(modules, module_dict):
+    """
+    Returns datatable of the module states of a single student
+
+    Input:
+    -----------
+    modules: dataframe, module states of the student as returned by
+             StudentIndex.student_modules
+    module_dict: dict, module id to module name
+
+    Returns:
+    -----------
+    df_mod: dataframe, one row per module with its state, unlock and
+            completion dates
+    """
+
+    def dates(col):
+        return modules[col].dt.strftime("%Y-%m-%d %H:%M").fillna("").to_numpy()
+
+    df_mod = pd.DataFrame(
+        {
+            "Module": modules["module_id"].astype(str).map(module_dict).to_numpy(),
+            "State": modules["state"].astype(str).to_numpy(),
+            "Unlocked At": dates("unlock_at"),
+            "Completed At": dates("completed_at"),
+        }
+    )
+
+    return df_mod
+
+
+def student_module_scatter(modules, module_dict, student_name):
+    """
+    Plots a scatter plot of the state of each module of a single student
+
+    Input:
+    -----------
+    modules: dataframe, module states of the student as returned by
+             StudentIndex.student_modules
+    module_dict: dict, module id to module name
+    student_name: str, shown in the title
+
+    Returns:
+    -----------
+    fig_1_json: dict, JSON serializable plotly figure
+    """
+    states = modules["state"].astype(str)
+    names = modules["module_id"].astype(str).map(module_dict)
+    callback_metrics.lap("frame")
+
+    fig_1 = go.Figure(
+        go.Scattergl(
+            x=states,
+            y=names,
+            mode="markers",
+            marker=dict(size=14, color=states.map(state_colors)),
+            hovertemplate="Module: %{y}<br>Status: %{x}<extra></extra>",
+        )
+    )
+
+    fig_1.update_layout(
+        title=f"Module Status of {student_name}",
+        plot_bgcolor="rgb(255, 255, 255)",
+        xaxis=dict(
+            title="Status",
+            categoryorder="array",
+            categoryarray=module_states,
+            title_font=dict(size=axis_label_font_size),
+        ),
+        yaxis=dict(
+            title="Module",
+            categoryorder="category ascending",
+            title_font=dict(size=axis_label_font_size),
+        ),
+    )
+    callback_metrics.lap("figure")
+
+    fig_1_json = fig_1.to_dict()
+    if payload_budget:
+        fig_1_json = compact_figure(fig_1_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_1_json
+
+
+def student_completion_scatter(
+    modules, module_dict, student_name, start_date, end_date
+):
+    """
+    Plots a scatter plot of the completion date of each module of a single student
+
+    Inputs:
+    ---------
+    modules: dataframe, module states of the student as returned by
+             StudentIndex.student_modules
+    module_dict: dict, module id to module name
+    student_name: str, shown in the title
+    start_date: datetime.date, first date shown
+    end_date: datetime.date, last date shown
+
+    Returns:
+    --------
+    fig_2_json: dict, JSON serializable plotly figure
+    """
+    completed = modules[(modules.state == "completed") & modules.completed_at.notna()]
+    names = completed["module_id"].astype(str).map(module_dict)
+    callback_metrics.lap("frame")
+
+    fig_2 = go.Figure(
+        go.Scattergl(
+            x=completed["completed_at"],
+            y=names,
+            mode="markers",
+            marker=dict(size=12, color=state_colors["completed"]),
+            hovertemplate="Module: %{y}<br>Completed: %{x}<extra></extra>",
+        )
+    )
+
+    fig_2.update_layout(
+        title=f"Module Completion Dates of {student_name}",
+        xaxis=dict(
+            title="Date", tickangle=-90, title_font=dict(size=axis_label_font_size)
+        ),
+        yaxis=dict(
+            title="Module",
+            categoryorder="category ascending",
+            title_font=dict(size=axis_label_font_size),
+        ),
+        plot_bgcolor="rgba(240, 240, 240, 0.8)",  # Light gray background color
+        xaxis_gridcolor="rgba(200, 200, 200, 0.2)",  # Faint gridlines
+        yaxis_gridcolor="rgba(200, 200, 200, 0.2)",  # Faint gridlines
+        margin=dict(l=50, r=50, t=50, b=50),  # Add margin for a border line
+        paper_bgcolor="white",  # Set the background color of the entire plot
+    )
+    fig_2.update_xaxes(range=[start_date, end_date], dtick="D7")
+    callback_metrics.lap("figure")
+
+    fig_2_json = fig_2.to_dict()
+    if payload_budget:
+        fig_2_json = compact_figure(fig_2_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_2_json
+
+
+def student_item_scatter(items, module_dict, student_name):
+    """
+    Plots a scatter plot of the completion of each item of a single student
+
+    Inputs:
+    --------------
+    items: dataframe, item completions of the student as returned by
+           StudentIndex.student_items
+    module_dict: dict, module id to module name
+    student_name: str, shown in the title
+
+    Returns:
+    --------------
+    fig_3_json: dict, JSON serializable plotly figure
+    """
+    titles = item_titles(items)
+    modules = items["module_id"].astype(str)
+    callback_metrics.lap("frame")
+
+    fig_3 = go.Figure()
+    for i, module in enumerate(modules.unique()):
+        rows = (modules == module).to_numpy()
+        fig_3.add_trace(
+            go.Scattergl(
+                x=titles[rows],
+                y=items["completed"][rows] * 100,
+                mode="markers",
+                name=module_dict.get(module),
+                marker=dict(size=12, color=colors[i % len(colors)]),
+                hovertemplate="Item Title: %{x}<br>Completion: %{y}%<extra></extra>",
+            )
+        )
+
+    fig_3.update_layout(
+        height=400,
+        title=f"Item Completion of {student_name}",
+        xaxis=dict(title="Items", title_font=dict(size=axis_label_font_size)),
+        yaxis=dict(
+            title="Completion (%)",
+            range=[-10, 110],
+            tickvals=[0, 100],
+            title_font=dict(size=axis_label_font_size),
+        ),
+    )
+    callback_metrics.lap("figure")
+
+    fig_3_json = fig_3.to_dict()
+    if payload_budget:
+        fig_3_json = compact_figure(fig_3_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_3_json
+
+
+def module_duration_boxplot(stats, module_dict):
+    """
+    Plots a box plot of the time students took to complete each module
+
+    Inputs:
+    --------------
+    stats: dict, module id to its box plot statistics in seconds, as returned
+           by QuantileSketch.box_stats or exact_box_stats
+    module_dict: dict, module id to module name
+
+    Returns:
+    --------------
+    fig_4_json: dict, JSON serializable plotly figure
+    """
+    days = 86_400
+    modules = sorted(stats, key=lambda module: str(module_dict.get(module)))
+    callback_metrics.lap("frame")
+
+    fig_4 = go.Figure()
+    for i, module in enumerate(modules):
+        box = stats[module]
+        name = module_dict.get(module)
+
+        # the statistics are precomputed, outliers are reported as counts
+        fig_4.add_trace(
+            go.Box(
+                x=[name],
+                q1=[box["q1"] / days],
+                median=[box["median"] / days],
+                q3=[box["q3"] / days],
+                lowerfence=[box["lowerfence"] / days],
+                upperfence=[box["upperfence"] / days],
+                name=name,
+                marker=dict(color=colors[i % len(colors)]),
+                showlegend=False,
+            )
+        )
+        outliers = box["outliers_low"] + box["outliers_high"]
+        fig_4.add_annotation(
+            x=name,
+            y=box["upperfence"] / days,
+            text=f"n={box['count']}, outliers: {outliers}",
+            showarrow=False,
+            yshift=10,
+            font=dict(size=10),
+        )
+
+    fig_4.update_layout(
+        height=400,
+        title="Time to Complete Each Module",
+        plot_bgcolor="rgb(255, 255, 255)",
+        xaxis=dict(title="Module", title_font=dict(size=axis_label_font_size)),
+        yaxis=dict(
+            title="Days from Unlock to Completion",
+            rangemode="tozero",
+            title_font=dict(size=axis_label_font_size),
+        ),
+    )
+    callback_metrics.lap("figure")
+
+    fig_4_json = fig_4.to_dict()
+    if payload_budget:
+        fig_4_json = compact_figure(fig_4_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_4_json
+
+
+def student_duration_scatter(modules, module_dict, student_name):
+    """
+    Plots a scatter plot of the time a single student took to complete each module
+
+    Inputs:
+    --------------
+    modules: dataframe, module states of the student as returned by
+             StudentIndex.student_modules
+    module_dict: dict, module id to module name
+    student_name: str, shown in the title
+
+    Returns:
+    --------------
+    fig_4_json: dict, JSON serializable plotly figure
+    """
+    durations = completion_durations(modules) / 86_400
+    names = modules["module_id"].loc[durations.index].astype(str).map(module_dict)
+    callback_metrics.lap("frame")
+
+    fig_4 = go.Figure(
+        go.Scattergl(
+            x=names,
+            y=durations.round(2),
+            mode="markers",
+            marker=dict(size=12, color=state_colors["completed"]),
+            hovertemplate="Module: %{x}<br>Days: %{y}<extra></extra>",
+        )
+    )
+
+    fig_4.update_layout(
+        height=400,
+        title=f"Time to Complete Each Module of {student_name}",
+        plot_bgcolor="rgb(255, 255, 255)",
+        xaxis=dict(
+            title="Module",
+            categoryorder="category ascending",
+            title_font=dict(size=axis_label_font_size),
+        ),
+        yaxis=dict(
+            title="Days from Unlock to Completion",
+            rangemode="tozero",
+            title_font=dict(size=axis_label_font_size),
+        ),
+    )
+    callback_metrics.lap("figure")
+
+    fig_4_json = fig_4.to_dict()
+    if payload_budget:
+        fig_4_json = compact_figure(fig_4_json)
+    callback_metrics.lap("to_dict")
+
+    return fig_4_json
@@ -0,0 +1,23 @@
+# Gunicorn settings of the dashboard, run from src/ with
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# DASHBOARD_BIND and DASHBOARD_WORKERS override the address and worker count.
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:server"
+bind = os.environ.get("DASHBOARD_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("DASHBOARD_WORKERS", multiprocessing.cpu_count()))
+
+# Load the data once in the parent so the forked workers share it
+preload_app = True
+
+# Building the figures of a large course can take a while
+timeout = 120
+
+
+def post_fork(server, worker):
+    import wsgi
+
+    wsgi.start_status_watcher()
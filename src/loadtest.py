@@ -0,0 +1,688 @@
+# imports
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+# Optional: the virtual users need aiohttp, as the Canvas fetcher does
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Concurrent virtual users of each step of the ramp
+default_users = [1, 2, 4, 8, 16, 32]
+
+# Seconds each step of the ramp lasts
+default_step_seconds = 30.0
+
+# Interactions of a session after its page load, and their relative weights
+session_interactions = 10
+interaction_weights = {"tab": 0.2, "module": 0.5, "dates": 0.3}
+
+# Mean seconds a virtual user waits between two interactions
+default_think_seconds = 1.0
+
+# Seconds between two polls of a background callback, the renderer's default
+default_poll_seconds = 1.0
+
+# Callbacks fired in a row by the outputs of the previous ones, at most
+max_chain = 10
+
+# A p95 latency slower than the baseline by more than this factor is reported
+regression_tolerance = 1.25
+
+
+# -------------------------------------------------------------
+########################
+#  DASH PROTOCOL       #
+########################
+class Callback:
+    """
+    A server callback of the app as listed by /_dash-dependencies
+
+    Inputs
+    ------
+    spec: dict, one entry of the /_dash-dependencies response
+    """
+
+    def __init__(self, spec):
+        self.output = spec["output"]
+
+        # several outputs are listed as "..id.prop...id.prop.."
+        self.multi = self.output.startswith("..")
+        outputs = self.output.strip(".").split("...") if self.multi else [self.output]
+        self.outputs = [_split_prop(output.split("@")[0]) for output in outputs]
+
+        self.inputs = [(dep["id"], dep["property"]) for dep in spec["inputs"]]
+        self.state = [(dep["id"], dep["property"]) for dep in spec.get("state", [])]
+        self.prevent_initial_call = bool(spec.get("prevent_initial_call"))
+        self.clientside = spec.get("clientside_function") is not None
+
+        self.input_props = {f"{i}.{p}" for i, p in self.inputs}
+        self.output_props = {f"{i}.{p}" for i, p in self.outputs}
+
+        # named after its outputs, e.g. "plot1.figure"
+        self.name = ",".join(sorted(self.output_props))
+
+    def payload(self, values, changed):
+        """
+        Returns the request body the renderer sends to run the callback
+
+        Inputs
+        ------
+        values: dict, "id.prop" to the current value of the property
+        changed: set of "id.prop", the inputs that triggered the call
+        """
+        outputs = [{"id": i, "property": p} for i, p in self.outputs]
+        return {
+            "output": self.output,
+            "outputs": outputs if self.multi else outputs[0],
+            "inputs": [
+                {"id": i, "property": p, "value": values.get(f"{i}.{p}")}
+                for i, p in self.inputs
+            ],
+            "changedPropIds": sorted(changed & self.input_props),
+            "state": [
+                {"id": i, "property": p, "value": values.get(f"{i}.{p}")}
+                for i, p in self.state
+            ],
+        }
+
+
+def _split_prop(prop_id):
+    component, prop = prop_id.rsplit(".", 1)
+    return component, prop
+
+
+def layout_props(layout):
+    """
+    Returns "id.prop" to value of every property of the components with an id
+
+    Inputs
+    ------
+    layout: dict, the /_dash-layout response
+    """
+    values = {}
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            props = node.get("props") if "type" in node else None
+            if isinstance(props, dict):
+                if isinstance(props.get("id"), str):
+                    for prop, value in props.items():
+                        values[f"{props['id']}.{prop}"] = value
+                stack.extend(props.values())
+            else:
+                stack.extend(node.values())
+    return values
+
+
+def tab_values(layout):
+    """
+    Returns the values of the tabs of every Tabs component with an id
+    """
+    tabs = defaultdict(list)
+    stack = [(layout, None)]
+    while stack:
+        node, parent = stack.pop()
+        if isinstance(node, list):
+            stack.extend((child, parent) for child in node)
+        elif isinstance(node, dict) and isinstance(node.get("props"), dict):
+            props = node["props"]
+            if node.get("type") == "Tab" and parent and props.get("value"):
+                tabs[parent].append(props["value"])
+            if node.get("type") == "Tabs":
+                parent = props.get("id")
+            stack.append((props.get("children"), parent))
+    return dict(tabs)
+
+
+# -------------------------------------------------------------
+########################
+#  VIRTUAL USERS       #
+########################
+class LoadStats:
+    """
+    Latencies and errors of the requests of one step of the ramp
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, seconds):
+        """
+        Returns the throughput and the latency percentiles of every request name
+
+        Inputs
+        ------
+        seconds: float, wall time of the step
+
+        Returns
+        -------
+        summary: dict, with 'requests', 'requests_per_second', 'error_rate'
+                 and 'callbacks', request name to its 'count', 'p50', 'p95'
+                 and 'p99' seconds and 'error_rate'
+        """
+        callbacks = {}
+        for name, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            callbacks[name] = {
+                "count": len(latencies),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "error_rate": self.errors[name] / len(latencies),
+            }
+
+        requests = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "requests": requests,
+            "requests_per_second": requests / seconds if seconds else 0.0,
+            "error_rate": sum(self.errors.values()) / requests if requests else 0.0,
+            "callbacks": callbacks,
+        }
+
+
+class VirtualUser:
+    """
+    One admin using the dashboard: a page load followed by interactions
+
+    The user keeps the property values a browser would hold. Changing a
+    property runs the server callbacks listening to it with the request
+    body the renderer sends, applies their outputs and runs the callbacks
+    those outputs trigger in turn. A callback waits for the callbacks of
+    the same round that produce one of its inputs, as the renderer does.
+    Clientside callbacks, and properties no server callback listens to such
+    as the selected tab, cost no request.
+
+    Inputs
+    ------
+    session: aiohttp.ClientSession, shared by the users
+    url: str, url of the dashboard
+    callbacks: list of Callback, of the app
+    stats: LoadStats, the requests are recorded into
+    rng: random.Random, of the user
+    think_seconds: float, mean wait between two interactions
+    poll_seconds: float, wait between two polls of a background callback
+    """
+
+    def __init__(
+        self, session, url, callbacks, stats, rng, think_seconds, poll_seconds
+    ):
+        self.session = session
+        self.url = url.rstrip("/")
+        self.callbacks = [callback for callback in callbacks if not callback.clientside]
+        self.stats = stats
+        self.rng = rng
+        self.think_seconds = think_seconds
+        self.poll_seconds = poll_seconds
+
+        # only the properties some callback reads or sets are kept, the
+        # interactions pick from the options and date bounds callbacks set
+        self.watched = set()
+        for callback in self.callbacks:
+            self.watched |= callback.input_props | callback.output_props
+            self.watched |= {f"{i}.{p}" for i, p in callback.state}
+        self.values = {}
+        self.tabs = {}
+
+    async def _request(self, method, path, body=None):
+        """
+        Returns whether a request succeeded and its JSON body, if any
+        """
+        try:
+            async with self.session.request(
+                method, self.url + path, json=body
+            ) as response:
+                if response.content_type == "application/json":
+                    data = await response.json()
+                else:
+                    data = None
+                    await response.read()
+                return response.status < 400, data
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False, None
+
+    async def _get(self, name, path):
+        """
+        Returns the JSON body of a GET request, recorded under name
+        """
+        start = time.perf_counter()
+        ok, data = await self._request("GET", path)
+        self.stats.record(name, time.perf_counter() - start, ok)
+        return data if ok else None
+
+    async def _call(self, callback, changed):
+        """
+        Runs a callback, returns the "id.prop" of the outputs it set
+
+        The latency of a background callback runs until its result is polled.
+        """
+        body = callback.payload(self.values, changed)
+        start = time.perf_counter()
+
+        ok, data = await self._request("POST", "/_dash-update-component", body)
+        while ok and data and "cacheKey" in data and "response" not in data:
+            await asyncio.sleep(self.poll_seconds)
+            query = f"?cacheKey={data['cacheKey']}&job={data['job']}"
+            ok, polled = await self._request(
+                "POST", "/_dash-update-component" + query, body
+            )
+            # progress updates keep the job, 204 means the job set nothing
+            if polled is None or "response" in polled:
+                data = polled
+
+        self.stats.record(callback.name, time.perf_counter() - start, ok)
+
+        set_props = set()
+        response = (data or {}).get("response") if ok else None
+        for component, props in (response or {}).items():
+            for prop, value in props.items():
+                prop_id = f"{component}.{prop}"
+                if prop_id in self.watched:
+                    self.values[prop_id] = value
+                set_props.add(prop_id)
+        return set_props
+
+    async def _run(self, changed, triggered=None):
+        """
+        Runs the callbacks triggered by changed properties and their chain
+
+        Inputs
+        ------
+        changed: set of "id.prop", properties that changed
+        triggered: list of Callback, run in the first round instead of those
+                   listening to changed, for the initial calls of a page load
+        """
+        if triggered is None:
+            triggered = [c for c in self.callbacks if c.input_props & changed]
+
+        for _ in range(max_chain):
+            if not triggered:
+                return
+
+            produced = set().union(*(c.output_props for c in triggered))
+            ready = [
+                c for c in triggered if not c.input_props & (produced - c.output_props)
+            ] or triggered
+            waiting = [c for c in triggered if c not in ready]
+
+            results = await asyncio.gather(*(self._call(c, changed) for c in ready))
+            outputs = set().union(*results)
+
+            # the waiting callbacks run next with their inputs still changed
+            changed = outputs.union(*(c.input_props & changed for c in waiting))
+            triggered = waiting + [
+                c
+                for c in self.callbacks
+                if c.input_props & outputs and c not in waiting
+            ]
+
+    async def load(self):
+        """
+        Loads the page and runs the initial callbacks
+        """
+        await self._get("page", "/")
+        layout = await self._get("layout", "/_dash-layout")
+        if layout is None:
+            return False
+
+        self.values = {
+            prop: value
+            for prop, value in layout_props(layout).items()
+            if prop in self.watched
+        }
+        self.tabs = tab_values(layout)
+
+        initial = [c for c in self.callbacks if not c.prevent_initial_call]
+        await self._run(set(), initial)
+        return True
+
+    async def set(self, **props):
+        """
+        Sets properties as the user would in the browser
+
+        Inputs
+        ------
+        props: "id.prop" to its new value, passed as a dict with **
+        """
+        for prop_id, value in props.items():
+            if prop_id in self.watched:
+                self.values[prop_id] = value
+        await self._run(set(props))
+
+    async def interact(self):
+        """
+        Makes one interaction picked by interaction_weights
+        """
+        kind = self.rng.choices(
+            list(interaction_weights), weights=list(interaction_weights.values())
+        )[0]
+
+        if kind == "tab" and self.tabs:
+            tabs_id, values = self.rng.choice(list(self.tabs.items()))
+            await self.set(**{f"{tabs_id}.value": self.rng.choice(values)})
+
+        elif kind == "module":
+            options = self.values.get("module-dropdown.options") or []
+            if options:
+                option = self.rng.choice(options)
+                await self.set(**{"module-dropdown.value": option["value"]})
+
+        elif kind == "dates":
+            bounds = [
+                self.values.get("date-slider.min_date_allowed"),
+                self.values.get("date-slider.max_date_allowed"),
+            ]
+            if all(bounds):
+                first, last = (date.fromisoformat(str(d)[:10]) for d in bounds)
+                days = max((last - first).days, 0)
+                start, end = sorted(
+                    first + timedelta(days=self.rng.randint(0, days)) for _ in range(2)
+                )
+                await self.set(
+                    **{
+                        "date-slider.start_date": str(start),
+                        "date-slider.end_date": str(end),
+                    }
+                )
+
+    async def run(self, deadline):
+        """
+        Runs sessions of a page load and interactions until the deadline
+        """
+        while time.monotonic() < deadline:
+            if not await self.load():
+                continue
+            for _ in range(session_interactions):
+                await asyncio.sleep(self.rng.expovariate(1 / self.think_seconds))
+                if time.monotonic() >= deadline:
+                    return
+                await self.interact()
+
+
+async def run_step(url, callbacks, users, seconds, think_seconds, poll_seconds, seed):
+    """
+    Runs a number of virtual users for some seconds, returns the step summary
+    """
+    stats = LoadStats()
+    timeout = aiohttp.ClientTimeout(total=120)
+    connector = aiohttp.TCPConnector(limit=0)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        start = time.monotonic()
+        deadline = start + seconds
+        await asyncio.gather(
+            *(
+                VirtualUser(
+                    session,
+                    url,
+                    callbacks,
+                    stats,
+                    random.Random(seed + user),
+                    think_seconds,
+                    poll_seconds,
+                ).run(deadline)
+                for user in range(users)
+            )
+        )
+        elapsed = time.monotonic() - start
+
+    return {"users": users, "seconds": elapsed, **stats.summary(elapsed)}
+
+
+async def run_ramp(url, users, seconds, think_seconds, poll_seconds, seed=0):
+    """
+    Runs the steps of a ramp of concurrent virtual users against a dashboard
+
+    Inputs
+    ------
+    url: str, url of the running dashboard
+    users: list of int, virtual users of each step
+    seconds: float, duration of each step
+    think_seconds: float, mean wait of a user between two interactions
+    poll_seconds: float, wait between two polls of a background callback
+    seed: int, seed of the users' choices
+
+    Returns
+    -------
+    steps: list of dict, the summary of each step, see LoadStats.summary
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url.rstrip("/") + "/_dash-dependencies") as response:
+            response.raise_for_status()
+            callbacks = [Callback(spec) for spec in await response.json()]
+
+    steps = []
+    for n in users:
+        step = await run_step(
+            url, callbacks, n, seconds, think_seconds, poll_seconds, seed
+        )
+        steps.append(step)
+        print(report([steps[-1]]), flush=True)
+    return steps
+
+
+# -------------------------------------------------------------
+########################
+#  SYNTHETIC SERVER    #
+########################
+def serve_synthetic(port, workdir, courses, students, modules, items_per_module):
+    """
+    Runs the dashboard on a synthetic export, in a process of its own
+    """
+    import app
+    from dataset import DatasetStore
+    from synthetic import generate_module_data, generate_status, write_module_csv
+
+    df = generate_module_data(
+        courses=courses,
+        students=students,
+        modules=modules,
+        items_per_module=items_per_module,
+    )
+    csv_path = os.path.join(workdir, "module_data.csv")
+    status_path = os.path.join(workdir, "status.csv")
+    write_module_csv(df, csv_path)
+    generate_status(df).to_csv(status_path)
+
+    app.store = DatasetStore(csv_path, status_path)
+    app.app.run(host="127.0.0.1", port=port, debug=False, threaded=True)
+
+
+async def wait_until_up(url, timeout=300, server=None):
+    """
+    Waits until the dashboard answers its layout, raises TimeoutError otherwise
+
+    Inputs
+    ------
+    url: str, url of the dashboard
+    timeout: float, seconds to wait
+    server: multiprocessing.Process, serving the dashboard, RuntimeError is
+            raised as soon as it exits
+    """
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if server is not None and not server.is_alive():
+                raise RuntimeError(
+                    f"The dashboard server exited with code {server.exitcode}"
+                )
+            try:
+                async with session.get(url + "/_dash-layout") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"The dashboard at {url} did not start")
+
+
+# -------------------------------------------------------------
+########################
+#  REPORTING           #
+########################
+def report(steps):
+    """
+    Returns the summaries of steps as a text table
+    """
+    lines = []
+    for step in steps:
+        lines.append(
+            f"{step['users']} users: {step['requests_per_second']:.1f} requests/s, "
+            f"{step['error_rate']:.1%} errors"
+        )
+        lines.append(
+            f"  {'request':<40} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>7}"
+        )
+        for name, result in step["callbacks"].items():
+            lines.append(
+                f"  {name:<40} {result['count']:>7} {result['p50'] * 1000:>8.1f} "
+                f"{result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+                f"{result['error_rate']:>7.1%}"
+            )
+    return "\n".join(lines)
+
+
+def compare(steps, baseline, tolerance=regression_tolerance):
+    """
+    Returns the requests whose p95 latency regressed against a baseline run
+
+    Inputs
+    ------
+    steps: list of dict, step summaries of this run
+    baseline: list of dict, step summaries of a previous run
+    tolerance: float, allowed ratio of the p95 latency to the baseline's
+
+    Returns
+    -------
+    regressions: list of (users, request name, ratio)
+    """
+    previous = {step["users"]: step["callbacks"] for step in baseline}
+
+    regressions = []
+    for step in steps:
+        for name, result in step["callbacks"].items():
+            before = previous.get(step["users"], {}).get(name)
+            if before is None or before["p95"] == 0:
+                continue
+
+            ratio = result["p95"] / before["p95"]
+            if ratio > tolerance:
+                regressions.append((step["users"], name, ratio))
+    return regressions
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay dashboard sessions of a ramp of concurrent users "
+        "against the callback endpoint"
+    )
+    parser.add_argument(
+        "--url", help="running dashboard (default: start one on a synthetic export)"
+    )
+    parser.add_argument(
+        "--users",
+        default=",".join(str(n) for n in default_users),
+        help="comma separated virtual users of each step of the ramp",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=default_step_seconds, help="seconds per step"
+    )
+    parser.add_argument(
+        "--think",
+        type=float,
+        default=default_think_seconds,
+        help="mean seconds between two interactions of a user",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=default_poll_seconds,
+        help="seconds between two polls of a background callback",
+    )
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument("--courses", type=int, default=2)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--items-per-module", type=int, default=10)
+    parser.add_argument("--baseline", help="compare against the results in this json")
+    parser.add_argument("--save", help="write the results to this json")
+    parser.add_argument("--tolerance", type=float, default=regression_tolerance)
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        raise SystemExit("The load test needs aiohttp: pip install aiohttp")
+
+    users = [int(n) for n in args.users.split(",")]
+    server = None
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.url
+        if url is None:
+            url = f"http://127.0.0.1:{args.port}"
+            server = multiprocessing.get_context("spawn").Process(
+                target=serve_synthetic,
+                args=(
+                    args.port,
+                    workdir,
+                    args.courses,
+                    args.students,
+                    args.modules,
+                    args.items_per_module,
+                ),
+                daemon=True,
+            )
+            server.start()
+
+        try:
+            asyncio.run(wait_until_up(url.rstrip("/"), server=server))
+            steps = asyncio.run(
+                run_ramp(url, users, args.seconds, args.think, args.poll)
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(steps, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(steps, json.load(f), args.tolerance)
+        for n, name, ratio in regressions:
+            print(f"REGRESSION {n} users {name}: {ratio:.2f}x the baseline p95")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
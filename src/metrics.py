@@ -0,0 +1,254 @@
+# imports
+import functools
+import logging
+import threading
+import time
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Upper bounds of the histogram buckets
+duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+payload_buckets = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+# Phase of the time of a callback not attributed to a phase by a lap
+unattributed_phase = "other"
+
+
+# -------------------------------------------------------------
+########################
+#  HISTOGRAM           #
+########################
+class Histogram:
+    """
+    Prometheus histogram with one series per combination of label values
+
+    Inputs
+    ------
+    name: str, metric name
+    description: str, HELP text of the metric
+    labels: tuple of str, label names
+    buckets: tuple of float, ascending upper bounds of the buckets
+    """
+
+    def __init__(self, name, description, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+
+        # label values to [bucket counts, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """
+        Adds one observation to the series of the label values
+        """
+        with self._lock:
+            series = self._series.setdefault(
+                label_values, [[0] * len(self.buckets), 0.0, 0]
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Returns the lines of the histogram in the Prometheus text format
+        """
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = [
+                    f'{label}="{_escape(value)}"'
+                    for label, value in zip(self.labels, label_values)
+                ]
+
+                for bound, bucket_count in zip(self.buckets, counts):
+                    bucket = ",".join(labels + [f'le="{bound:g}"'])
+                    lines.append(f"{self.name}_bucket{{{bucket}}} {bucket_count}")
+                bucket = ",".join(labels + ['le="+Inf"'])
+                lines.append(f"{self.name}_bucket{{{bucket}}} {count}")
+
+                series = "{" + ",".join(labels) + "}"
+                lines.append(f"{self.name}_sum{series} {total:g}")
+                lines.append(f"{self.name}_count{series} {count}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# -------------------------------------------------------------
+########################
+#  CALLBACK METRICS    #
+########################
+class CallbackMetrics:
+    """
+    Latency, phase and payload histograms of the Dash callbacks
+
+    A callback wrapped by instrument() is timed as a whole. Inside it, lap()
+    attributes the time since the previous lap to a phase, so the plot
+    functions split a callback into its DataFrame work ('frame'), building
+    the plotly figure ('figure') and converting it to a dict ('to_dict').
+    Time left over, e.g. a figure cache hit, counts as 'other'. Laps outside
+    an instrumented callback are ignored.
+
+    The size of the response body is recorded by observe_response(), to be
+    registered as an after_request hook of the Flask server.
+
+    Inputs
+    ------
+    slow_seconds: float, callbacks slower than this are logged with their inputs
+    """
+
+    def __init__(self, slow_seconds=1.0):
+        self.slow_seconds = slow_seconds
+
+        self.duration = Histogram(
+            "dash_callback_duration_seconds",
+            "Wall time of the Dash callbacks",
+            ("callback",),
+            duration_buckets,
+        )
+        self.phase_duration = Histogram(
+            "dash_callback_phase_seconds",
+            "Wall time of the Dash callbacks per phase",
+            ("callback", "phase"),
+            duration_buckets,
+        )
+        self.payload = Histogram(
+            "dash_callback_payload_bytes",
+            "Size of the Dash callback responses before compression",
+            ("callback",),
+            payload_buckets,
+        )
+
+        self._local = threading.local()
+
+    def instrument(self, callback):
+        """
+        Returns the callback wrapped to record its wall time and phases
+        """
+        name = callback.__name__
+
+        @functools.wraps(callback)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            self._local.lap = start
+            self._local.phases = {}
+            if has_request_context():
+                g.dash_callback = name
+
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                phases = self._local.phases
+                phases[unattributed_phase] = end - self._local.lap
+                self._local.phases = None
+
+                seconds = end - start
+                self.duration.observe(seconds, name)
+                for phase, phase_seconds in phases.items():
+                    self.phase_duration.observe(phase_seconds, name, phase)
+
+                if seconds > self.slow_seconds:
+                    logger.warning(
+                        "Slow callback %s%r took %.3fs (%s)",
+                        name,
+                        args,
+                        seconds,
+                        ", ".join(f"{p} {s:.3f}s" for p, s in phases.items()),
+                    )
+
+        return wrapper
+
+    def lap(self, phase):
+        """
+        Attributes the time since the previous lap of the callback to phase
+        """
+        phases = getattr(self._local, "phases", None)
+        if phases is None:
+            return
+
+        now = time.perf_counter()
+        phases[phase] = phases.get(phase, 0.0) + now - self._local.lap
+        self._local.lap = now
+
+    def observe_response(self, response):
+        """
+        Records the body size of a callback response, returns the response
+        """
+        name = g.pop("dash_callback", None)
+        if name is not None and not response.direct_passthrough:
+            self.payload.observe(len(response.get_data()), name)
+        return response
+
+    def render(self, figure_cache=None):
+        """
+        Returns the histograms and figure cache counters in the Prometheus
+        text format
+        """
+        lines = self.duration.render()
+        lines += self.phase_duration.render()
+        lines += self.payload.render()
+
+        if figure_cache is not None:
+            lines += _render_cache(figure_cache.stats())
+
+        return "\n".join(lines) + "\n"
+
+
+def _render_cache(stats):
+    lines = []
+    for name, description in (
+        ("hits", "Figure cache lookups that found the figure"),
+        ("misses", "Figure cache lookups that built the figure"),
+    ):
+        metric = f"dash_figure_cache_{name}_total"
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        for callback, lookups in sorted(stats["callbacks"].items()):
+            lines.append(f'{metric}{{callback="{_escape(callback)}"}} {lookups[name]}')
+
+    metric = "dash_figure_cache_hit_ratio"
+    lines += [
+        f"# HELP {metric} Fraction of the figure cache lookups that hit",
+        f"# TYPE {metric} gauge",
+    ]
+    for callback, lookups in sorted(stats["callbacks"].items()):
+        total = lookups["hits"] + lookups["misses"]
+        ratio = lookups["hits"] / total if total else 0.0
+        lines.append(f'{metric}{{callback="{_escape(callback)}"}} {ratio:g}')
+
+    for name, kind, description in (
+        ("evictions_total", "counter", "Figures evicted from the figure cache"),
+        ("entries", "gauge", "Figures held by the figure cache"),
+        ("bytes", "gauge", "JSON bytes of the figures held by the figure cache"),
+    ):
+        metric = f"dash_figure_cache_{name}"
+        value = stats[name.removesuffix("_total")]
+        lines += [
+            f"# HELP {metric} {description}",
+            f"# TYPE {metric} {kind}",
+            f"{metric} {value}",
+        ]
+    return lines
+
+
+# Metrics of the dashboard callbacks, shared by app.py and the plot functions
+# of figures.py that lap their phases
+callback_metrics = CallbackMetrics()
@@ -0,0 +1,343 @@
+# imports
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from canvas import fetch_progress
+from shards import shard_status_path
+from synthetic import generate_module_data
+
+# Optional: the mock server needs aiohttp, as the fetcher does
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Canvas leaves out the items of modules holding more than this many
+inline_items_limit = 100
+
+# Requests the rate limit bucket holds and refills per second
+rate_limit_bucket = 700.0
+rate_limit_refill = 200.0
+
+
+# -------------------------------------------------------------
+########################
+#  MOCK DATA           #
+########################
+def _iso(timestamp):
+    return None if pd.isna(timestamp) else timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def canvas_objects(df):
+    """
+    Returns the Canvas API objects of module data
+
+    Inputs
+    ------
+    df: dataframe, module data with the module_data.csv schema, e.g. from
+        generate_module_data
+
+    Returns
+    -------
+    courses: dict, course id (str) to the course object
+    students: dict, course id to its list of user objects
+    modules: dict, (course id, student id) to the student's module objects,
+             each with its items and their completion
+    """
+    courses, students, modules = {}, {}, {}
+
+    for row in df.itertuples(index=False):
+        course, student = str(row.course_id), str(row.student_id)
+
+        if course not in courses:
+            courses[course] = {"id": int(row.course_id), "name": str(row.course_name)}
+            students[course] = {}
+        if student not in students[course]:
+            students[course][student] = {
+                "id": int(row.student_id),
+                "name": str(row.student_name),
+                "sortable_name": str(row.student_name),
+            }
+
+        student_modules = modules.setdefault((course, student), [])
+        if not student_modules or student_modules[-1]["id"] != row.module_id:
+            student_modules.append(
+                {
+                    "id": int(row.module_id),
+                    "name": str(row.module_name),
+                    "position": int(row.module_position),
+                    "items_count": int(row.items_count),
+                    "state": str(row.state),
+                    "unlock_at": _iso(row.unlock_at),
+                    "completed_at": _iso(row.completed_at),
+                    "items": [],
+                }
+            )
+
+        item = {
+            "id": int(row.items_id),
+            "title": str(row.items_title),
+            "position": int(row.items_position),
+            "indent": int(row.items_indent),
+            "type": str(row.items_type),
+            "module_id": int(row.items_module_id),
+        }
+        if row.item_cp_req_type is not None and not pd.isna(row.item_cp_req_type):
+            item["completion_requirement"] = {
+                "type": str(row.item_cp_req_type),
+                "completed": bool(row.item_cp_req_completed),
+            }
+        student_modules[-1]["items"].append(item)
+
+    students = {course: list(users.values()) for course, users in students.items()}
+    return courses, students, modules
+
+
+# -------------------------------------------------------------
+########################
+#  MOCK SERVER         #
+########################
+class MockCanvas:
+    """
+    Local server answering the Canvas endpoints the fetcher uses
+
+    Serves the courses, student enrollments, modules and module items of
+    module data, paginated through Link headers, with a per-request latency,
+    a rate limit bucket reported in X-Rate-Limit-Remaining that answers 403
+    "Rate Limit Exceeded" once empty, and a fraction of requests failing
+    with a 500.
+
+    Inputs
+    ------
+    df: dataframe, module data served, see canvas_objects
+    latency: float, seconds each request takes
+    fail_rate: float, fraction of requests answered with a 500
+    rate_limit: bool, apply the rate limit bucket
+    """
+
+    def __init__(self, df, latency=0.02, fail_rate=0.0, rate_limit=True):
+        if web is None:
+            raise ImportError(
+                "The mock Canvas server needs aiohttp: pip install aiohttp"
+            )
+
+        self.courses, self.students, self.modules = canvas_objects(df)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+
+        self.requests = 0
+        self._bucket = rate_limit_bucket
+        self._refilled = time.monotonic()
+
+        # a new-style middleware, aiohttp passes old-style ones the app
+        @web.middleware
+        async def middleware(request, handler):
+            return await self._middleware(request, handler)
+
+        self.app = web.Application(middlewares=[middleware])
+        self.app.add_routes(
+            [
+                web.get("/api/v1/courses", self.list_courses),
+                web.get("/api/v1/courses/{course}", self.course),
+                web.get("/api/v1/courses/{course}/users", self.users),
+                web.get("/api/v1/courses/{course}/modules", self.list_modules),
+                web.get("/api/v1/courses/{course}/modules/{module}/items", self.items),
+            ]
+        )
+
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        self._bucket = min(
+            rate_limit_bucket,
+            self._bucket + (now - self._refilled) * rate_limit_refill,
+        )
+        self._refilled = now
+
+        if self.rate_limit:
+            self._bucket -= 1
+            if self._bucket < 0:
+                return web.Response(
+                    status=403,
+                    text="403 Forbidden (Rate Limit Exceeded)",
+                    headers={"X-Rate-Limit-Remaining": "0.0"},
+                )
+
+        if random.random() < self.fail_rate:
+            return web.Response(status=500, text="Internal Server Error")
+
+        response = await handler(request)
+        response.headers["X-Rate-Limit-Remaining"] = f"{max(self._bucket, 0):.1f}"
+        return response
+
+    def _page(self, request, objects):
+        """
+        Returns a page of objects with the Link header of the next page
+        """
+        page = int(request.query.get("page", 1))
+        size = min(int(request.query.get("per_page", 10)), 100)
+
+        headers = {}
+        if page * size < len(objects):
+            url = request.url.update_query(page=page + 1)
+            headers["Link"] = f'<{url}>; rel="next"'
+        return web.json_response(
+            objects[(page - 1) * size : page * size], headers=headers
+        )
+
+    def _course(self, request):
+        course = request.match_info["course"]
+        if course not in self.courses:
+            raise web.HTTPNotFound()
+        return course
+
+    async def list_courses(self, request):
+        return self._page(request, list(self.courses.values()))
+
+    async def course(self, request):
+        return web.json_response(self.courses[self._course(request)])
+
+    async def users(self, request):
+        return self._page(request, self.students[self._course(request)])
+
+    def _student_modules(self, request):
+        key = (self._course(request), request.query.get("student_id", ""))
+        if key not in self.modules:
+            raise web.HTTPNotFound()
+        return self.modules[key]
+
+    async def list_modules(self, request):
+        modules = self._student_modules(request)
+
+        if request.query.get("include[]") != "items":
+            modules = [
+                {k: v for k, v in module.items() if k != "items"} for module in modules
+            ]
+        else:
+            modules = [
+                (
+                    module
+                    if len(module["items"]) <= inline_items_limit
+                    else {k: v for k, v in module.items() if k != "items"}
+                )
+                for module in modules
+            ]
+        return self._page(request, modules)
+
+    async def items(self, request):
+        for module in self._student_modules(request):
+            if str(module["id"]) == request.match_info["module"]:
+                return self._page(request, module["items"])
+        raise web.HTTPNotFound()
+
+
+async def run_benchmark(df, concurrency, latency, fail_rate, data_dir):
+    """
+    Fetches module data from a mock server on localhost, returns the fetch stats
+    """
+    server = MockCanvas(df, latency=latency, fail_rate=fail_rate)
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    try:
+        return await fetch_progress(
+            f"http://127.0.0.1:{port}",
+            "mock-token",
+            data_dir,
+            shard_status_path(data_dir),
+            concurrency=concurrency,
+        )
+    finally:
+        await runner.cleanup()
+
+
+def check_output(df, data_dir):
+    """
+    Returns the courses whose fetched csv differs from the module data served
+    """
+    mismatched = []
+    for course, expected in df.groupby("course_id", observed=True):
+        path = os.path.join(data_dir, str(course), "module_data.csv")
+        fetched = pd.read_csv(path)
+
+        keys = ["student_id", "items_id"]
+        expected = expected.sort_values(keys)
+        fetched = fetched.sort_values(keys)
+        if len(fetched) != len(expected) or not (
+            (fetched[keys].to_numpy() == expected[keys].to_numpy()).all()
+            and (
+                fetched["state"].astype(str).to_numpy()
+                == expected["state"].astype(str).to_numpy()
+            ).all()
+        ):
+            mismatched.append(str(course))
+    return mismatched
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Canvas fetcher against a local mock Canvas API"
+    )
+    parser.add_argument("--courses", type=int, default=2)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--items-per-module", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds per request"
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.01, help="fraction of requests failing"
+    )
+    parser.add_argument(
+        "--data-dir", help="directory to fetch into (default: a temporary one)"
+    )
+    args = parser.parse_args()
+
+    df = generate_module_data(
+        courses=args.courses,
+        students=args.students,
+        modules=args.modules,
+        items_per_module=args.items_per_module,
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        data_dir = args.data_dir or workdir
+        stats = asyncio.run(
+            run_benchmark(df, args.concurrency, args.latency, args.fail_rate, data_dir)
+        )
+        mismatched = check_output(df, data_dir)
+
+    print(
+        f"Fetched {stats['rows']} rows of {stats['students']} students in "
+        f"{stats['seconds']:.2f}s: {stats['rows'] / stats['seconds']:.0f} rows/s, "
+        f"{stats['requests'] / stats['seconds']:.0f} requests/s "
+        f"({stats['retries']} retried, {stats['throttled']} rate limited)"
+    )
+    if mismatched:
+        print(f"MISMATCH in courses {', '.join(mismatched)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
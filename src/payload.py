@@ -0,0 +1,175 @@
+# imports
+import base64
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------
+########################
+#  DOWNSAMPLING        #
+########################
+def lttb_indices(x, y, max_points):
+    """
+    Returns the indices of the points kept by largest triangle three buckets
+
+    The first and last points are kept, the points in between are split into
+    max_points - 2 buckets and from each bucket the point forming the largest
+    triangle with the point kept from the previous bucket and the average of
+    the next bucket is kept. Peaks, troughs and steps of the line survive,
+    unlike with every n-th point.
+
+    Inputs
+    ------
+    x: np.array, ascending x values as numbers
+    y: np.array, y values
+    max_points: int, number of points kept, at least 3
+
+    Returns
+    -------
+    indices: np.array, ascending indices of the kept points
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket boundaries of the points between the first and the last one
+    bounds = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+
+        # Average of the next bucket, the last point for the last bucket
+        next_end = bounds[bucket + 2] if bucket + 2 < len(bounds) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        indices[bucket + 1] = previous
+
+    return indices
+
+
+def downsample_line(x, y, max_points):
+    """
+    Returns the points of a line reduced to at most max_points
+
+    Inputs
+    ------
+    x: pd.Series, ascending dates or numbers
+    y: pd.Series, y values
+    max_points: int, number of points kept, None keeps every point
+
+    Returns
+    -------
+    x, y: pd.Series, the kept points
+    """
+    if max_points is None or len(x) <= max_points:
+        return x, y
+
+    numbers = pd.to_datetime(x) if x.dtype == object else x
+    if pd.api.types.is_datetime64_any_dtype(numbers):
+        numbers = numbers.astype("int64")
+
+    indices = lttb_indices(numbers.to_numpy(), y.to_numpy(), max(max_points, 3))
+    return x.iloc[indices], y.iloc[indices]
+
+
+# -------------------------------------------------------------
+########################
+#  SERIALIZATION       #
+########################
+# Integer types tried, smallest first, for float arrays holding whole numbers
+compact_int_types = [np.uint8, np.int8, np.uint16, np.int16, np.int32]
+
+
+def _narrowest(array):
+    """
+    Returns a float array of whole numbers in the smallest integer type
+    holding them, None when it holds other values or no integer type fits
+    """
+    if len(array) == 0 or not np.isfinite(array).all():
+        return None
+    if not (array == np.round(array)).all():
+        return None
+
+    low, high = array.min(), array.max()
+    for int_type in compact_int_types:
+        info = np.iinfo(int_type)
+        if info.min <= low and high <= info.max:
+            return array.astype(int_type)
+    return None
+
+
+def narrow_values(values):
+    """
+    Returns values as the smallest integer array when they are whole numbers
+
+    Called on the values of a trace before the figure is built. Plotly 6 and
+    later send a numpy array as a typed array of its own dtype, 1 or 2 bytes
+    per value instead of 8. Older plotly sends it as a JSON list, where
+    integers are written without the ".0" of floats. Any other values are
+    returned unchanged.
+
+    Inputs
+    ------
+    values: array-like of numbers, e.g. a pd.Series of percentages
+
+    Returns
+    -------
+    values: np.array of the narrowed integers, or the values unchanged
+    """
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return values
+
+    narrowed = _narrowest(array)
+    return values if narrowed is None else narrowed
+
+
+def compact_array(values):
+    """
+    Returns a typed array of floats as integers when they are whole numbers
+
+    Plotly 6 and later hold the numeric arrays of figure dicts as typed
+    arrays, base64 encoded with their dtype, and already narrow integer
+    arrays. Float arrays of whole numbers, such as percentages rounded to
+    integers, are narrowed here to the smallest integer type holding them.
+    Figures built by older plotly hold lists, which are returned unchanged,
+    as is any other value; see narrow_values for those.
+    """
+    if not isinstance(values, dict) or not values.get("dtype", "").startswith("f"):
+        return values
+
+    array = np.frombuffer(base64.b64decode(values["bdata"]), dtype=values["dtype"])
+    array = _narrowest(array)
+    if array is None:
+        return values
+    return {
+        **values,
+        "dtype": array.dtype.str[1:],
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def compact_figure(fig):
+    """
+    Returns the figure dict with the x and y arrays of its traces compacted
+    """
+    for trace in fig["data"]:
+        for axis in ("x", "y"):
+            if axis in trace:
+                trace[axis] = compact_array(trace[axis])
+    return fig
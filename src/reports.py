@@ -0,0 +1,274 @@
+# imports
+import argparse
+import html
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from aggregates import select_modules
+from dataset import DatasetStore
+from figures import (
+    item_completion_barplot,
+    module_completion_barplot,
+    module_completion_lineplot,
+    module_completion_table,
+)
+from shards import CourseShardStore, shard_status_path
+from sqlstore import SqlStore
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Store the reports are rendered from. It is opened before the workers are
+# forked so they share the datasets, and their aggregates, of the parent.
+store = None
+
+# plotly.js is written once next to the course folders and loaded by every page
+plotlyjs_file = "plotly.min.js"
+
+page_template = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="../{plotlyjs}"></script>
+<style>
+body {{ font-family: sans-serif; background-color: #F8F8FF; margin: 20px; }}
+h1 {{ background-color: #aab4c2; color: white; padding: 5px; text-align: center; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: center; }}
+th {{ background-color: lightgray; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{sections}
+</body>
+</html>
+"""
+
+
+# -------------------------------------------------------------
+########################
+#  RENDERING           #
+########################
+def open_store(data_path, status_path):
+    """
+    Returns the store of an export, a course folder directory, a SQLite
+    database written by sqlstore.py or a single csv
+
+    Workers keep a single course of a course folder directory in memory.
+    """
+    if data_path.endswith(".sqlite"):
+        return SqlStore(data_path, status_path)
+    if os.path.isdir(data_path):
+        return CourseShardStore(data_path, status_path, memory_budget=0)
+    return DatasetStore(data_path, status_path)
+
+
+def _start_worker(data_path, status_path):
+    """
+    Opens the store in a worker that was not forked from the parent
+    """
+    global store
+    if store is None:
+        store = open_store(data_path, status_path)
+
+
+def report_sections(dataset, val):
+    """
+    Returns the HTML of the figures and the table of a module dropdown value
+
+    The figures are built by the plot functions of the dashboard from the
+    aggregates of the dataset, as the callbacks build them.
+
+    Inputs
+    ------
+    dataset: Dataset, of the course
+    val: str, module id or 'All'
+
+    Returns
+    -------
+    sections: list of str, HTML fragments
+    """
+    cube = select_modules(dataset.state_cube, val, dataset.state_cube_slices)
+    items = select_modules(dataset.item_completion, val, dataset.item_completion_slices)
+    timeline = dataset.completion_timeline
+    if val != "All":
+        timeline = timeline[timeline.module_id == val]
+
+    figures = [
+        module_completion_barplot(cube, dataset.module_dict),
+        module_completion_lineplot(
+            timeline, dataset.module_dict, dataset.min_date, dataset.max_date
+        ),
+        item_completion_barplot(items, dataset.module_dict),
+    ]
+    sections = [
+        pio.to_html(fig, include_plotlyjs=False, full_html=False, validate=False)
+        for fig in figures
+    ]
+
+    table = module_completion_table(cube, dataset.module_dict)
+    sections.append(table.to_html(index=False))
+    return sections
+
+
+def render_course(course, course_name, output, modules=False):
+    """
+    Writes the report of a course, and of each of its modules, as static HTML
+
+    Inputs
+    ------
+    course: str, course id
+    course_name: str, shown in the titles
+    output: str, directory holding one folder per course
+    modules: bool, also write one report per module
+
+    Returns
+    -------
+    course: str, course id
+    pages: int, number of pages written
+    seconds: float, wall time
+    """
+    start = time.perf_counter()
+    dataset = store.get(course)
+
+    course_dir = os.path.join(output, course)
+    os.makedirs(course_dir, exist_ok=True)
+
+    pages = [("index.html", "All", course_name)]
+    if modules:
+        pages += [
+            (f"module_{module}.html", module, f"{course_name}: {module_name}")
+            for module, module_name in dataset.module_dict.items()
+        ]
+
+    for filename, val, title in pages:
+        sections = "\n".join(
+            f"<div>{section}</div>" for section in report_sections(dataset, val)
+        )
+        with open(os.path.join(course_dir, filename), "w", encoding="utf-8") as f:
+            f.write(
+                page_template.format(
+                    title=html.escape(str(title)),
+                    plotlyjs=plotlyjs_file,
+                    sections=sections,
+                )
+            )
+
+    return course, len(pages), time.perf_counter() - start
+
+
+def render_reports(data_path, status_path, output, modules=False, workers=None):
+    """
+    Writes the report of every course of an export using a pool of processes
+
+    The parent opens the store once, so a single csv export is read and its
+    aggregates built before the workers are forked and shared by all of
+    them. Each worker renders whole courses; the courses of a course folder
+    directory are loaded by the worker rendering them.
+
+    Inputs
+    ------
+    data_path: str, module_data.csv export or directory of course folders
+    status_path: str, path of the status.csv written by the export
+    output: str, directory the reports are written to
+    modules: bool, also write one report per module
+    workers: int, processes, one per core by default
+
+    Returns
+    -------
+    pages: dict, course id to the number of pages written
+    """
+    global store
+    store = open_store(data_path, status_path)
+    courses = store.courses()
+    if not courses:
+        logger.warning("No course of %s is listed in %s", data_path, status_path)
+        return {}
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, plotlyjs_file), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
+    # forked workers inherit the store, others open it again
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    pages = {}
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=context,
+        initializer=_start_worker,
+        initargs=(data_path, status_path),
+    ) as pool:
+        futures = [
+            pool.submit(render_course, course, name, output, modules)
+            for course, name in courses.items()
+        ]
+        for future in as_completed(futures):
+            course, course_pages, seconds = future.result()
+            pages[course] = course_pages
+            logger.info("Rendered course %s in %.2fs", course, seconds)
+
+    return pages
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the dashboard figures and table of every course "
+        "to static HTML"
+    )
+    parser.add_argument(
+        "data",
+        help="module_data.csv export, its .sqlite database or directory holding "
+        "one folder per course",
+    )
+    parser.add_argument(
+        "-o", "--output", default="../reports", help="directory the reports go to"
+    )
+    parser.add_argument(
+        "--status",
+        help="status.csv written by the export (default: the status.csv of a "
+        "course folder directory, ../data/SAMPLE_status.csv otherwise)",
+    )
+    parser.add_argument(
+        "--modules", action="store_true", help="also write one report per module"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="processes to render with (default: one per core)"
+    )
+    args = parser.parse_args()
+
+    status = args.status
+    if status is None:
+        if os.path.isdir(args.data):
+            status = shard_status_path(args.data)
+        else:
+            status = "../data/SAMPLE_status.csv"
+
+    start = time.perf_counter()
+    pages = render_reports(args.data, status, args.output, args.modules, args.workers)
+    if not pages:
+        raise SystemExit(f"No course of {args.data} is listed in {status}")
+    print(
+        f"Wrote {sum(pages.values())} pages of {len(pages)} courses to "
+        f"{args.output} in {time.perf_counter() - start:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
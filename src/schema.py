@@ -0,0 +1,182 @@
+# imports
+import argparse
+import gc
+import os
+
+import numpy as np
+import pandas as pd
+
+from snapshot import load_module_data
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Module level fields, the same on every item row of a student and module
+progress_cols = [
+    "course_id",
+    "module_id",
+    "student_id",
+    "state",
+    "unlock_at",
+    "completed_at",
+]
+
+# Item level fields, the same for every student of an item
+item_cols = [
+    "items_title",
+    "items_position",
+    "items_indent",
+    "items_type",
+    "items_module_id",
+    "item_cp_req_type",
+]
+
+
+# -------------------------------------------------------------
+########################
+#  STAR SCHEMA         #
+########################
+class StarSchema:
+    """
+    Module data split into dimension tables and two fact tables
+
+    The export repeats the module fields of a student (state, timestamps,
+    module and course names) on each of its item rows. The split keeps them
+    once per row of the table they belong to:
+
+    courses, modules, items, students: one row per id with its names and
+        positions
+    module_progress: one row per student and module with its state, unlock
+        and completion times, in module order
+    item_progress: one row per student and item holding the row of the item
+        in `items` and whether the student completed it, in student order
+
+    Module metrics read module_progress, which is `items_count` times
+    smaller than the module data and holds each enrollment once.
+
+    Inputs
+    ------
+    df: dataframe, module data sorted by sort_by_module
+    """
+
+    def __init__(self, df):
+        # names of the last row of each id, as id_lookup
+        self.courses = _dimension(df, "course_id", ["course_name"])
+        self.modules = _dimension(
+            df,
+            "module_id",
+            ["course_id", "module_name", "module_position", "items_count"],
+        )
+        self.students = _dimension(df, "student_id", ["student_name"])
+
+        # first row of each item of each module, as build_item_completion
+        item_groups = df.groupby(["module_id", "items_id"], observed=True, sort=False)
+        self.items = item_groups[item_cols].first().reset_index()
+
+        self.module_progress = (
+            df[progress_cols]
+            .drop_duplicates(["module_id", "student_id"])
+            .reset_index(drop=True)
+        )
+
+        # rows without an item are left out, as in build_item_completion
+        item = item_groups.ngroup().to_numpy()
+        students = df["student_id"].cat.codes.to_numpy()
+        rows = np.flatnonzero(item >= 0)
+        order = rows[np.argsort(students[rows], kind="stable")]
+
+        self.item_progress = pd.DataFrame(
+            {
+                "student_id": df["student_id"].iloc[order].reset_index(drop=True),
+                "item": item[order].astype(np.int32),
+                "completed": (df["item_cp_req_completed"] == True).to_numpy()[order],
+            }
+        )
+
+    def tables(self):
+        """
+        Returns the table name to dataframe of every table of the schema
+        """
+        return {
+            "courses": self.courses,
+            "modules": self.modules,
+            "items": self.items,
+            "students": self.students,
+            "module_progress": self.module_progress,
+            "item_progress": self.item_progress,
+        }
+
+    def memory_usage(self):
+        """
+        Returns the table name to the bytes held by each table
+        """
+        return {
+            name: int(table.memory_usage(deep=True).sum())
+            for name, table in self.tables().items()
+        }
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def _dimension(df, key, cols):
+    """
+    Returns one row per id of df, in order of first row, with its last fields
+    """
+    return df.groupby(key, observed=True, sort=False)[cols].last().reset_index()
+
+
+def resident_bytes():
+    """
+    Returns the resident memory of the process, None where /proc is missing
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report the memory of module data before and after the split "
+        "into a star schema"
+    )
+    parser.add_argument("csv", help="path of the module_data.csv export")
+    args = parser.parse_args()
+
+    def megabytes(n):
+        return "n/a" if n is None else f"{n / 1024**2:.1f} MB"
+
+    start_rss = resident_bytes()
+    data = load_module_data(args.csv)
+    rows, data_bytes = len(data), int(data.memory_usage(deep=True).sum())
+    data_rss = resident_bytes()
+
+    schema = StarSchema(data)
+    del data
+    gc.collect()
+    schema_rss = resident_bytes()
+
+    tables = schema.memory_usage()
+    print(f"module data: {rows} rows, {megabytes(data_bytes)}")
+    for name, table in schema.tables().items():
+        print(f"  {name:<16} {len(table):>10} rows  {megabytes(tables[name])}")
+    print(f"star schema: {megabytes(sum(tables.values()))}")
+
+    if start_rss is not None:
+        print(
+            f"resident memory: {megabytes(data_rss)} with the module data, "
+            f"{megabytes(schema_rss)} with the star schema "
+            f"(process start {megabytes(start_rss)})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# imports
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from dataset import (
+    Dataset,
+    PhaseTimer,
+    course_versions,
+    format_seconds,
+    read_status,
+)
+from snapshot import load_course_tables, load_module_data
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Directory the export and canvas.py write the course folders to
+default_data_dir = "../data/Tableau"
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def shard_status_path(data_dir):
+    """
+    Returns the status.csv of a course folder directory, next to the folders
+    """
+    return os.path.join(data_dir, "status.csv")
+
+
+# -------------------------------------------------------------
+########################
+#  COURSE SHARDS       #
+########################
+class CourseShardStore:
+    """
+    Per-course datasets loaded on first access and evicted when cold
+
+    The export writes one folder per course, `<data_dir>/<course id>/`,
+    holding that course's module_data.csv and/or its snapshot. A course is
+    loaded with all its lookup tables the first time it is requested and is
+    kept in a least recently used order. Once the resident courses exceed the
+    memory budget the coldest ones are dropped, so memory grows with the
+    courses in active use rather than with the catalogue.
+
+    Inputs
+    ------
+    data_dir: str, directory holding one folder per course
+    status_path: str, path of the status.csv written by the export, see
+                 shard_status_path
+    memory_budget: int, bytes of course datasets kept resident, the most
+                   recently used course is always kept
+    """
+
+    def __init__(self, data_dir, status_path, memory_budget=2 * 1024**3):
+        self.data_dir = data_dir
+        self.status_path = status_path
+        self.memory_budget = memory_budget
+
+        self.loads = 0
+        self.evictions = 0
+
+        self._status = read_status(status_path)
+        self._shards = OrderedDict()
+        self._sizes = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def shard_path(self, course_id):
+        """
+        Returns the module_data.csv path of a course
+        """
+        return os.path.join(self.data_dir, str(course_id), "module_data.csv")
+
+    def courses(self):
+        """
+        Returns the course id to course name of every course with a folder
+        """
+        status = self._status
+        return {
+            course: name
+            for course, name in zip(status["Course Id"], status["Course Name"])
+            if os.path.isdir(os.path.join(self.data_dir, course))
+        }
+
+    def versions(self):
+        """
+        Returns the course id to 'Data Updated On' of every dated course
+        """
+        return course_versions(self._status)
+
+    def memory_usage(self):
+        """
+        Returns the bytes held by the resident course datasets
+        """
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, course_id):
+        """
+        Returns the dataset of a course, loading it on first access
+
+        Returns None when the course has no folder in the data directory.
+        """
+        course_id = str(course_id)
+
+        with self._lock:
+            if course_id in self._shards:
+                self._shards.move_to_end(course_id)
+                return self._shards[course_id]
+
+            # one lock per course so concurrent requests load it only once
+            loading = self._loading.setdefault(course_id, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if course_id in self._shards:
+                    self._shards.move_to_end(course_id)
+                    return self._shards[course_id]
+
+            if not os.path.isdir(os.path.join(self.data_dir, course_id)):
+                return None
+
+            dataset = self._load(course_id)
+            self._publish(course_id, dataset)
+            return dataset
+
+    def _load(self, course_id):
+        version = course_versions(self._status).get(course_id)
+
+        seconds = {}
+        timer = PhaseTimer(seconds)
+        data = load_module_data(self.shard_path(course_id))
+        tables = load_course_tables(self.shard_path(course_id)) or {}
+        timer.lap("load_module_data")
+        dataset = Dataset(data, version, tables.get(course_id))
+        timer.lap("dataset")
+
+        logger.info(
+            "Read course %s in %s, dataset: %s",
+            course_id,
+            format_seconds(seconds),
+            format_seconds(dataset.build_seconds),
+        )
+        self.loads += 1
+        return dataset
+
+    def _publish(self, course_id, dataset):
+        with self._lock:
+            self._shards[course_id] = dataset
+            self._shards.move_to_end(course_id)
+            self._sizes[course_id] = dataset.memory_usage()
+            logger.info(
+                "Loaded course %s (%d bytes)", course_id, self._sizes[course_id]
+            )
+
+            while (
+                len(self._shards) > 1 and sum(self._sizes.values()) > self.memory_budget
+            ):
+                evicted, _ = self._shards.popitem(last=False)
+                del self._sizes[evicted]
+                self.evictions += 1
+                logger.info("Evicted course %s", evicted)
+
+    def refresh(self):
+        """
+        Reloads the resident courses whose export is newer, returns True if any
+
+        Courses that are not resident only pick up the new status, they are
+        loaded from the refreshed export on their next access.
+        """
+        self._status = read_status(self.status_path)
+        versions = course_versions(self._status)
+
+        with self._lock:
+            stale = [
+                course
+                for course, dataset in self._shards.items()
+                if course in versions
+                and (dataset.version is None or versions[course] > dataset.version)
+            ]
+
+        for course_id in stale:
+            self._publish(course_id, self._load(course_id))
+
+        return bool(stale)
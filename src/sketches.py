@@ -0,0 +1,202 @@
+# imports
+import math
+
+import numpy as np
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Quartiles more than this many interquartile ranges away are outliers
+whisker_iqr = 1.5
+
+
+# -------------------------------------------------------------
+########################
+#  QUANTILE SKETCH     #
+########################
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of non-negative values with a relative error bound
+
+    Values are counted in logarithmic buckets, bucket k holding the values in
+    (gamma^(k-1), gamma^k] with gamma = (1 + accuracy) / (1 - accuracy), so
+    every quantile is answered within `accuracy` of a value of that rank. The
+    number of buckets grows with the log of the value range, not with the
+    number of values: durations from one second to one year take under a
+    thousand buckets at 1% accuracy. Two sketches of the same accuracy merge
+    by adding their bucket counts, so chunks of an export are sketched
+    separately and combined.
+
+    Inputs
+    ------
+    accuracy: float, relative accuracy of the quantiles, between 0 and 1
+    """
+
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        # bucket key to count, values of 0 are counted apart
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        """
+        Adds values to the sketch, missing and negative values are skipped
+
+        Inputs
+        ------
+        values: array-like of float
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values) & (values >= 0)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+
+        keys = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        for key, count in zip(*np.unique(keys, return_counts=True)):
+            self.buckets[int(key)] = self.buckets.get(int(key), 0) + int(count)
+
+    def merge(self, other):
+        """
+        Adds the counts of another sketch of the same accuracy to this one
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("Only sketches of the same accuracy can be merged")
+
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _value(self, key):
+        # the value of a bucket within the relative accuracy of all its values
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def _sorted(self):
+        """
+        Returns the bucket values and counts in ascending order, zeros first
+        """
+        keys = sorted(self.buckets)
+        values = [0.0] + [self._value(key) for key in keys]
+        counts = [self.zeros] + [self.buckets[key] for key in keys]
+        return np.array(values), np.array(counts, dtype=np.int64)
+
+    def quantile(self, q):
+        """
+        Returns the value of quantile q, NaN for an empty sketch
+
+        Inputs
+        ------
+        q: float, between 0 and 1
+        """
+        if self.count == 0:
+            return math.nan
+
+        values, counts = self._sorted()
+        return self._quantile(values, np.cumsum(counts), q)
+
+    def _quantile(self, values, cumulative, q):
+        rank = q * (self.count - 1)
+        value = values[np.searchsorted(cumulative, rank, side="right")]
+
+        # the buckets of the extremes are replaced by the exact extremes
+        return float(min(max(value, self.min), self.max))
+
+    def box_stats(self):
+        """
+        Returns the box plot statistics of the values
+
+        Returns
+        -------
+        stats: dict, as returned by exact_box_stats, None for an empty sketch
+        """
+        if self.count == 0:
+            return None
+
+        values, counts = self._sorted()
+        cumulative = np.cumsum(counts)
+        q1, median, q3 = (
+            self._quantile(values, cumulative, q) for q in (0.25, 0.5, 0.75)
+        )
+        low, high = _fences(q1, q3)
+
+        below, above = values < low, values > high
+        inside = values[~below & ~above & (counts > 0)]
+        return {
+            "count": self.count,
+            "min": self.min,
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "max": self.max,
+            "lowerfence": float(max(inside.min(), self.min)) if len(inside) else q1,
+            "upperfence": float(min(inside.max(), self.max)) if len(inside) else q3,
+            "outliers_low": int(counts[below].sum()),
+            "outliers_high": int(counts[above].sum()),
+        }
+
+
+# -------------------------------------------------------------
+########################
+#  HELPER FUNCTIONS    #
+########################
+def _fences(q1, q3):
+    """
+    Returns the bounds beyond which values are outliers
+    """
+    iqr = q3 - q1
+    return q1 - whisker_iqr * iqr, q3 + whisker_iqr * iqr
+
+
+def exact_box_stats(values):
+    """
+    Returns the box plot statistics of values computed from every value
+
+    Inputs
+    ------
+    values: array-like of float, missing and negative values are skipped
+
+    Returns
+    -------
+    stats: dict, with the 'count', 'min', 'q1', 'median', 'q3' and 'max' of
+           the values, the whisker ends 'lowerfence' and 'upperfence' (the
+           extreme values within 1.5 interquartile ranges of the quartiles)
+           and the number of values beyond them, 'outliers_low' and
+           'outliers_high'. None when there are no values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values) & (values >= 0)]
+    if len(values) == 0:
+        return None
+
+    q1, median, q3 = (float(q) for q in np.quantile(values, [0.25, 0.5, 0.75]))
+    low, high = _fences(q1, q3)
+    inside = values[(values >= low) & (values <= high)]
+
+    return {
+        "count": len(values),
+        "min": float(values.min()),
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "max": float(values.max()),
+        "lowerfence": float(inside.min()),
+        "upperfence": float(inside.max()),
+        "outliers_low": int((values < low).sum()),
+        "outliers_high": int((values > high).sum()),
+    }
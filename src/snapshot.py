@@ -0,0 +1,531 @@
+# imports
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateAccumulator
+from dimensions import sort_by_module
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Bump when the on-disk layout changes so stale snapshots are re-ingested
+snapshot_format = 1
+
+# dtype conversion
+categorical_cols = [
+    "course_id",
+    "module_id",
+    "module_name",
+    "state",
+    "student_id",
+    "student_name",
+    "items_id",
+    "items_title",
+    "items_type",
+    "items_module_id",
+    "item_cp_req_type",
+    "item_cp_req_completed",
+    "course_name",
+]
+
+datetime_cols = ["completed_at", "unlock_at"]
+
+
+# -------------------------------------------------------------
+########################
+#  CSV LOADING         #
+########################
+def convert_module_data(df):
+    """
+    Returns the raw module data with the dashboard column types applied
+
+    Inputs
+    ------
+    df: dataframe, as read from a module_data.csv export
+
+    Returns
+    -------
+    df: dataframe, timestamps as datetimes, ids and labels as categories and
+        rows ordered by module
+    """
+    # The sample export carries the pandas index as an unnamed first column
+    df = df.drop(columns=[col for col in df.columns if col.startswith("Unnamed")])
+
+    # convert the timestamp to datetime format
+    # fix the column data types
+    for col in datetime_cols:
+        df[col] = pd.to_datetime(df[col])
+    for col in categorical_cols:
+        df[col] = df[col].astype("category")
+
+    # order the rows by module so each module is a contiguous slice
+    return sort_by_module(df)
+
+
+def read_module_csv(path):
+    """
+    Returns the module data read from a module_data.csv export
+
+    Inputs
+    ------
+    path: str, path of the csv export
+
+    Returns
+    -------
+    df: dataframe, as returned by convert_module_data
+    """
+    return convert_module_data(pd.read_csv(path))
+
+
+# -------------------------------------------------------------
+########################
+#  SNAPSHOT FORMAT     #
+########################
+# A snapshot is a directory holding one .npy file per column and a
+# meta.json describing how to rebuild the typed column from it:
+#   category -> col_NN.npy (integer codes) and col_NN.categories.npy
+#   datetime -> col_NN.npy (int64 ticks of the recorded unit, NaT as min int)
+#   values   -> col_NN.npy (numeric or fixed width string values)
+# The .npy files are memory-mapped on load so only touched pages are read.
+# A snapshot written by the streaming ingest also holds the aggregate tables
+# of every course in aggregates.pkl, which datasets reuse instead of
+# building them again.
+def snapshot_path(csv_path):
+    """
+    Returns the snapshot directory that belongs to a csv export
+    """
+    return os.path.splitext(csv_path)[0] + ".snapshot"
+
+
+def _as_saveable(values):
+    """
+    Returns values as an array that np.save can write without pickling
+    """
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    return values
+
+
+def write_snapshot(df, path):
+    """
+    Writes df as a typed columnar snapshot
+
+    Inputs
+    ------
+    df: dataframe, as returned by convert_module_data
+    path: str, snapshot directory, created if missing
+    """
+    os.makedirs(path, exist_ok=True)
+
+    # meta.json marks a complete snapshot, drop it while the columns are rewritten
+    meta_path = os.path.join(path, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        name = f"col_{i:02d}"
+        series = df[col]
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(path, f"{name}.npy"), series.cat.codes.to_numpy())
+            np.save(
+                os.path.join(path, f"{name}.categories.npy"),
+                _as_saveable(series.cat.categories),
+            )
+            columns.append({"name": col, "file": name, "kind": "category"})
+
+        elif pd.api.types.is_datetime64_dtype(series.dtype):
+            unit = np.datetime_data(series.dtype)[0]
+            np.save(os.path.join(path, f"{name}.npy"), series.to_numpy().view("i8"))
+            columns.append(
+                {"name": col, "file": name, "kind": "datetime", "unit": unit}
+            )
+
+        else:
+            np.save(os.path.join(path, f"{name}.npy"), _as_saveable(series))
+            columns.append({"name": col, "file": name, "kind": "values"})
+
+    meta = {"format": snapshot_format, "rows": len(df), "columns": columns}
+
+    # meta.json is written last so a partially written snapshot is never read
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_snapshot(path):
+    """
+    Returns the module data stored in a typed columnar snapshot
+
+    Inputs
+    ------
+    path: str, snapshot directory written by write_snapshot
+
+    Returns
+    -------
+    df: dataframe, with the same columns and types as convert_module_data
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    columns = {}
+    for column in meta["columns"]:
+        values = np.load(os.path.join(path, f"{column['file']}.npy"), mmap_mode="r")
+
+        if column["kind"] == "category":
+            categories = np.load(os.path.join(path, f"{column['file']}.categories.npy"))
+            columns[column["name"]] = pd.Categorical.from_codes(values, categories)
+        elif column["kind"] == "datetime":
+            columns[column["name"]] = values.view(f"datetime64[{column['unit']}]")
+        else:
+            columns[column["name"]] = values
+
+    return pd.DataFrame(columns, copy=False)
+
+
+def snapshot_is_current(csv_path, path):
+    """
+    Returns True when the snapshot exists, is complete and is newer than the csv
+    """
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+
+    with open(meta_path) as f:
+        if json.load(f).get("format") != snapshot_format:
+            return False
+
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(meta_path) >= os.path.getmtime(csv_path)
+
+
+def load_module_data(csv_path):
+    """
+    Returns the module data, from its snapshot when one is current
+
+    Inputs
+    ------
+    csv_path: str, path of the module_data.csv export
+
+    Returns
+    -------
+    df: dataframe, as returned by convert_module_data
+    """
+    path = snapshot_path(csv_path)
+    if snapshot_is_current(csv_path, path):
+        return read_snapshot(path)
+
+    return read_module_csv(csv_path)
+
+
+def load_course_tables(csv_path):
+    """
+    Returns the aggregate tables stored with the snapshot of an export
+
+    Inputs
+    ------
+    csv_path: str, path of the module_data.csv export
+
+    Returns
+    -------
+    tables: dict, course id to the tables yielded by
+            AggregateAccumulator.course_tables, None when the snapshot is not
+            current or was written without them
+    """
+    path = snapshot_path(csv_path)
+    if not snapshot_is_current(csv_path, path):
+        return None
+
+    with open(os.path.join(path, "meta.json")) as f:
+        aggregates = json.load(f).get("aggregates")
+    if aggregates is None:
+        return None
+    return pd.read_pickle(os.path.join(path, aggregates))
+
+
+def ingest(csv_path, path=None, chunksize=None):
+    """
+    Converts a module_data.csv export into a typed columnar snapshot
+
+    Inputs
+    ------
+    csv_path: str, path of the csv export
+    path: str, snapshot directory, next to the csv by default
+    chunksize: int, rows read at a time, the whole csv is read at once if None
+
+    Returns
+    -------
+    path: str, snapshot directory
+    """
+    path = path or snapshot_path(csv_path)
+
+    if chunksize:
+        stream_ingest(csv_path, path, chunksize)
+    else:
+        write_snapshot(read_module_csv(csv_path), path)
+    return path
+
+
+# -------------------------------------------------------------
+########################
+#  STREAMING INGEST    #
+########################
+# Exports larger than memory are converted in two passes over fixed-size
+# chunks. The first pass parses each chunk, folds it into an
+# AggregateAccumulator and appends its columns to scratch files, with the
+# categories coded in order of appearance. The second pass scatters every
+# chunk into memory-mapped columns at its module-sorted position, recoding
+# the categories to the sorted order read_module_csv gives them, so the
+# snapshot is identical to the one written from the whole csv. The aggregate
+# tables of the accumulator are stored next to the columns.
+def _encode_chunk(values, kind, state):
+    """
+    Returns a chunk column as a plain array, updating the column state
+
+    Inputs
+    ------
+    values: series, chunk column
+    kind: str, 'category', 'datetime' or 'values'
+    state: dict, per column state carried from one chunk to the next
+    """
+    if kind == "category":
+        codes, uniques = pd.factorize(values)
+        lookup = state.setdefault("lookup", {})
+        recode = np.array(
+            [lookup.setdefault(value, len(lookup)) for value in uniques], dtype=np.int32
+        )
+
+        encoded = np.full(len(codes), -1, dtype=np.int32)
+        encoded[codes >= 0] = recode[codes[codes >= 0]]
+        return encoded
+
+    if kind == "datetime":
+        values = pd.to_datetime(values)
+        # the unit of the first chunk holding a timestamp is kept, an all NaT
+        # chunk is the minimum int64 in every unit
+        if "unit" not in state or (state.get("empty") and values.notna().any()):
+            state["unit"] = np.datetime_data(values.dtype)[0]
+            state["empty"] = not values.notna().any()
+        return values.to_numpy().astype(f"datetime64[{state['unit']}]").view("i8")
+
+    if values.dtype == object:
+        raise ValueError(f"Column {values.name} is neither numeric nor categorical")
+    return values.to_numpy()
+
+
+def stream_ingest(csv_path, path, chunksize=1_000_000):
+    """
+    Converts a module_data.csv export into a snapshot reading it in chunks
+
+    Peak memory is bounded by the chunk size and the aggregates of the
+    accumulator rather than by the size of the csv. The aggregate tables of
+    every course are stored in the snapshot, see load_course_tables.
+
+    Inputs
+    ------
+    csv_path: str, path of the csv export
+    path: str, snapshot directory, created if missing
+    chunksize: int, rows read at a time
+
+    Returns
+    -------
+    accumulator: AggregateAccumulator, the dimension dictionaries and
+                 aggregates of the whole export
+    """
+    os.makedirs(path, exist_ok=True)
+
+    # meta.json marks a complete snapshot, drop it while the columns are rewritten
+    meta_path = os.path.join(path, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    scratch = tempfile.mkdtemp(prefix=".ingest-", dir=path)
+    accumulator = AggregateAccumulator()
+
+    # name, kind, encoding state and (byte offset, dtype) of every chunk
+    columns = None
+    chunk_rows = []
+
+    try:
+        # first pass, parse, accumulate and append each chunk to the scratch files
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = chunk.drop(
+                columns=[col for col in chunk.columns if col.startswith("Unnamed")]
+            )
+
+            if columns is None:
+                columns = [
+                    {
+                        "name": col,
+                        "kind": (
+                            "category"
+                            if col in categorical_cols
+                            else "datetime" if col in datetime_cols else "values"
+                        ),
+                        "state": {},
+                        "chunks": [],
+                    }
+                    for col in chunk.columns
+                ]
+
+            for col in datetime_cols:
+                chunk[col] = pd.to_datetime(chunk[col])
+            accumulator.update(chunk)
+
+            for i, column in enumerate(columns):
+                values = _encode_chunk(
+                    chunk[column["name"]], column["kind"], column["state"]
+                )
+                scratch_file = os.path.join(scratch, f"col_{i:02d}.raw")
+                offset = (
+                    os.path.getsize(scratch_file) if os.path.exists(scratch_file) else 0
+                )
+                with open(scratch_file, "ab") as f:
+                    values.tofile(f)
+                column["chunks"].append((offset, values.dtype))
+
+            chunk_rows.append(len(chunk))
+
+        def read_chunk(i, c):
+            offset, dtype = columns[i]["chunks"][c]
+            return np.fromfile(
+                os.path.join(scratch, f"col_{i:02d}.raw"),
+                dtype=dtype,
+                count=chunk_rows[c],
+                offset=offset,
+            )
+
+        # categories sorted as astype("category") sorts them
+        for column in columns:
+            if column["kind"] == "category":
+                appearance = pd.Index(list(column["state"].get("lookup", {})))
+                categories = pd.Categorical(appearance).categories
+                column["categories"] = categories
+                column["recode"] = categories.get_indexer(appearance)
+                column["dtype"] = pd.Categorical.from_codes([], categories).codes.dtype
+            elif column["kind"] == "datetime":
+                column["dtype"] = np.dtype("i8")
+            else:
+                column["dtype"] = np.result_type(
+                    *(dtype for _, dtype in column["chunks"])
+                )
+
+        def recoded(i, c):
+            values = read_chunk(i, c)
+            column = columns[i]
+            if column["kind"] == "category":
+                values = np.where(values >= 0, column["recode"][values], -1)
+            return values.astype(column["dtype"])
+
+        # second pass, module sorted position of every row (NaN modules first)
+        module = next(i for i, c in enumerate(columns) if c["name"] == "module_id")
+        buckets = len(columns[module]["categories"]) + 1
+
+        counts = np.zeros(buckets, dtype=np.int64)
+        for c in range(len(chunk_rows)):
+            counts += np.bincount(recoded(module, c) + 1, minlength=buckets)
+        cursor = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        positions_file = os.path.join(scratch, "positions.raw")
+        with open(positions_file, "wb") as f:
+            for c in range(len(chunk_rows)):
+                codes = recoded(module, c).astype(np.int64) + 1
+                order = np.argsort(codes, kind="stable")
+                ordered = codes[order]
+                rank = np.arange(len(ordered)) - np.searchsorted(ordered, ordered)
+
+                positions = np.empty(len(codes), dtype=np.int64)
+                positions[order] = cursor[ordered] + rank
+                positions.tofile(f)
+
+                cursor += np.bincount(codes, minlength=buckets)
+
+        rows = sum(chunk_rows)
+        starts = np.concatenate([[0], np.cumsum(chunk_rows)])
+        meta_columns = []
+
+        for i, column in enumerate(columns):
+            name = f"col_{i:02d}"
+            out = np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.npy"),
+                mode="w+",
+                dtype=column["dtype"],
+                shape=(rows,),
+            )
+            for c in range(len(chunk_rows)):
+                positions = np.fromfile(
+                    positions_file,
+                    dtype=np.int64,
+                    count=chunk_rows[c],
+                    offset=int(starts[c]) * 8,
+                )
+                out[positions] = recoded(i, c)
+            out.flush()
+            del out
+
+            meta_column = {"name": column["name"], "file": name, "kind": column["kind"]}
+            if column["kind"] == "category":
+                np.save(
+                    os.path.join(path, f"{name}.categories.npy"),
+                    _as_saveable(column["categories"]),
+                )
+            elif column["kind"] == "datetime":
+                meta_column["unit"] = column["state"]["unit"]
+            meta_columns.append(meta_column)
+
+        pd.to_pickle(
+            dict(accumulator.course_tables()), os.path.join(path, "aggregates.pkl")
+        )
+        meta = {
+            "format": snapshot_format,
+            "rows": rows,
+            "columns": meta_columns,
+            "aggregates": "aggregates.pkl",
+        }
+
+        # meta.json is written last so a partially written snapshot is never read
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return accumulator
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a module_data.csv export into a dashboard snapshot"
+    )
+    parser.add_argument("csv", help="path of the module_data.csv export")
+    parser.add_argument(
+        "-o", "--output", help="snapshot directory (default: next to the csv)"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="read the csv this many rows at a time, for exports larger than memory",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = ingest(args.csv, args.output, args.chunksize)
+    print(f"Wrote {path} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,684 @@
+# imports
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+from contextlib import closing
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from aggregates import (
+    _finish_completion_timeline,
+    _finish_item_completion,
+    _finish_state_cube,
+    completion_durations,
+    duration_accuracy,
+)
+from bitmaps import StudentBitmaps
+from dataset import (
+    Dataset,
+    PhaseTimer,
+    course_versions,
+    date_bounds,
+    format_seconds,
+    id_lookup,
+    module_title,
+    read_status,
+    split_courses,
+)
+from sketches import QuantileSketch
+from snapshot import datetime_cols, load_module_data
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Columns of the module_data table and their SQLite type, in export order.
+# Timestamps are ISO text, so they sort and compare as dates, and
+# item_cp_req_completed is 1, 0 or NULL.
+table_columns = {
+    "completed_at": "TEXT",
+    "course_id": "INTEGER",
+    "module_id": "INTEGER",
+    "items_count": "INTEGER",
+    "module_name": "TEXT",
+    "module_position": "INTEGER",
+    "state": "TEXT",
+    "unlock_at": "TEXT",
+    "student_id": "INTEGER",
+    "student_name": "TEXT",
+    "items_id": "INTEGER",
+    "items_title": "TEXT",
+    "items_position": "INTEGER",
+    "items_indent": "INTEGER",
+    "items_type": "TEXT",
+    "items_module_id": "INTEGER",
+    "item_cp_req_type": "TEXT",
+    "item_cp_req_completed": "INTEGER",
+    "course_name": "TEXT",
+}
+
+# Indexes of the module_data table, each covering the queries of one group:
+# module states, student lookups, date bounds and item completion
+table_indexes = {
+    "module_data_module": "course_id, module_id, state, student_id",
+    "module_data_student": "course_id, student_id, module_id",
+    "module_data_completed": "course_id, completed_at",
+    "module_data_item": "course_id, module_id, items_id, item_cp_req_completed, "
+    "student_id",
+}
+
+# Dimension tables holding the name of the last row of each id, as
+# id_lookup does, so the dropdowns never scan module_data: their keys, name
+# column and indexes
+dimension_tables = {
+    "courses": ("course_id", "course_name", ["course_id"]),
+    "modules": ("course_id, module_id", "module_name", ["course_id, module_id"]),
+    "students": (
+        "course_id, student_id",
+        "student_name",
+        ["course_id, student_id", "course_id, name_key"],
+    ),
+}
+
+# Enrollments read at a time when sketching the durations of a course
+fetch_rows = 100_000
+
+
+# -------------------------------------------------------------
+########################
+#  INGEST              #
+########################
+def sql_path(csv_path):
+    """
+    Returns the SQLite database that belongs to a csv export
+    """
+    return os.path.splitext(csv_path)[0] + ".sqlite"
+
+
+def _sql_rows(chunk):
+    """
+    Returns the rows of a chunk of the csv as tuples sqlite3 can bind
+    """
+    chunk = chunk.reindex(columns=list(table_columns))
+
+    for col in datetime_cols:
+        chunk[col] = pd.to_datetime(chunk[col]).dt.strftime("%Y-%m-%d %H:%M:%S")
+    completed = chunk["item_cp_req_completed"].astype(str).str.upper()
+    chunk["item_cp_req_completed"] = completed.map({"TRUE": 1, "FALSE": 0})
+
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    return chunk.itertuples(index=False, name=None)
+
+
+def ingest_sql(csv_path, db_path=None, chunksize=1_000_000):
+    """
+    Converts a module_data.csv export into an indexed SQLite database
+
+    The csv is read a fixed number of rows at a time, so the export never
+    has to fit in memory. The database is written next to its final path
+    and moved in place once complete, a running dashboard keeps reading the
+    previous one until then.
+
+    Inputs
+    ------
+    csv_path: str, path of the csv export
+    db_path: str, database path, next to the csv by default
+    chunksize: int, rows read at a time
+
+    Returns
+    -------
+    db_path: str, database path
+    """
+    db_path = db_path or sql_path(csv_path)
+    building = db_path + ".building"
+    if os.path.exists(building):
+        os.remove(building)
+
+    with closing(sqlite3.connect(building)) as con:
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+
+        columns = ", ".join(f"{col} {kind}" for col, kind in table_columns.items())
+        con.execute(f"CREATE TABLE module_data ({columns})")
+
+        insert = (
+            f"INSERT INTO module_data VALUES ({', '.join('?' * len(table_columns))})"
+        )
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            con.executemany(insert, _sql_rows(chunk))
+
+        # indexes are built once the rows are in, which is faster than
+        # updating them row by row
+        for name, columns in table_indexes.items():
+            con.execute(f"CREATE INDEX {name} ON module_data ({columns})")
+
+        # lower case names for the prefix search, with Python's unicode rules
+        con.create_function(
+            "name_key", 1, lambda name: None if name is None else name.lower()
+        )
+        for table, (keys, label, indexes) in dimension_tables.items():
+            key = ", name_key(student_name) AS name_key" if table == "students" else ""
+            con.execute(
+                f"CREATE TABLE {table} AS SELECT {keys}, {label}{key} "
+                f"FROM module_data WHERE rowid IN "
+                f"(SELECT MAX(rowid) FROM module_data GROUP BY {keys})"
+            )
+            for i, columns in enumerate(indexes):
+                con.execute(f"CREATE INDEX {table}_{i} ON {table} ({columns})")
+
+        con.execute("ANALYZE")
+        con.commit()
+
+    os.replace(building, db_path)
+    return db_path
+
+
+# -------------------------------------------------------------
+########################
+#  SQL DATASET         #
+########################
+class StudentNames(Mapping):
+    """
+    Student id (str) to student name of a course, read from the database
+
+    Unknown ids map to "" as with the defaultdict of an in-memory dataset.
+    """
+
+    def __init__(self, store, course):
+        self.store = store
+        self.course = course
+
+    def __getitem__(self, student_id):
+        names = self.store.query(
+            "SELECT student_name FROM students WHERE course_id = ? AND student_id = ?",
+            (self.course, str(student_id)),
+        )
+        return str(names.student_name.iloc[0]) if len(names) else ""
+
+    def __iter__(self):
+        ids = self.store.query(
+            "SELECT student_id FROM students WHERE course_id = ?", (self.course,)
+        )
+        return iter(ids.student_id.astype(str))
+
+    def __len__(self):
+        return int(
+            self.store.query(
+                "SELECT COUNT(*) AS n FROM students WHERE course_id = ?", (self.course,)
+            ).n.iloc[0]
+        )
+
+
+class SqlStudentIndex:
+    """
+    The StudentIndex lookups of a course answered by the database indexes
+
+    Each lookup reads the rows of one student through the
+    (course_id, student_id) index, whatever the size of the course.
+    """
+
+    def __init__(self, store, course):
+        self.store = store
+        self.course = course
+
+    def _dates(self, frame):
+        for col in datetime_cols:
+            frame[col] = pd.to_datetime(frame[col])
+        return frame
+
+    def student_modules(self, student_id):
+        """
+        Returns the module state and timestamps of a student, see StudentIndex
+        """
+        return self._dates(
+            self.store.query(
+                "SELECT module_id, state, unlock_at, completed_at FROM module_data "
+                "WHERE course_id = ? AND student_id = ? "
+                "GROUP BY module_id ORDER BY module_id",
+                (self.course, str(student_id)),
+            )
+        )
+
+    def student_items(self, student_id):
+        """
+        Returns the item completions of a student, see StudentIndex
+        """
+        items = self.store.query(
+            "SELECT module_id, items_id, items_title, items_position, "
+            "item_cp_req_completed = 1 AS completed FROM module_data "
+            "WHERE course_id = ? AND student_id = ? ORDER BY module_id, rowid",
+            (self.course, str(student_id)),
+        )
+        items["completed"] = items.completed.fillna(0).astype(bool)
+        return items
+
+    @property
+    def modules(self):
+        """
+        Returns the module state and timestamps of every student of the course
+        """
+        return self._dates(
+            self.store.query(
+                "SELECT module_id, student_id, state, unlock_at, completed_at "
+                "FROM module_data WHERE course_id = ? GROUP BY module_id, student_id",
+                (self.course,),
+            )
+        )
+
+    def search(self, text, limit=50):
+        """
+        Returns the ids of the students whose name starts with text, see StudentIndex
+        """
+        text = (text or "").lower()
+        names = self.store.query(
+            "SELECT student_id, name_key FROM students "
+            "WHERE course_id = ? AND name_key >= ? "
+            "ORDER BY name_key, student_id LIMIT ?",
+            (self.course, text, limit),
+        )
+
+        ids = []
+        for student_id, name in zip(names.student_id, names.name_key):
+            if not str(name).startswith(text):
+                break
+            ids.append(str(student_id))
+        return ids
+
+    def memory_usage(self):
+        return 0
+
+
+class SqlDataset:
+    """
+    The aggregates of one course queried from the SQLite database of an export
+
+    Exposes the attributes of Dataset the dashboard reads. The state cube,
+    completion timeline and item completion are GROUP BY queries finished by
+    the same functions as the in-memory aggregates, so the helpers and plot
+    functions give the same results on either backend. Only these
+    aggregates are held in memory, the rows stay in the database and the
+    student views read them through its indexes.
+
+    Inputs
+    ------
+    store: SqlStore, database of the export
+    course: str, course id
+    version: pd.Timestamp, 'Data Updated On' of the export the data came from
+    """
+
+    # the aggregates are filtered by module id rather than sliced by code
+    dimension_index = None
+    state_cube_slices = None
+    item_completion_slices = None
+
+    def __init__(self, store, course, version=None):
+        self.store = store
+        self.course = str(course)
+        self.version = version
+
+        self.build_seconds = {}
+        timer = PhaseTimer(self.build_seconds)
+        params = (self.course,)
+
+        modules = store.query(
+            "SELECT module_id, module_name FROM modules "
+            "WHERE course_id = ? ORDER BY module_id",
+            params,
+        )
+        self.module_dict = id_lookup(
+            modules.module_id, modules.module_name, module_title
+        )
+        self.course_dict = defaultdict(str, {self.course: store.courses()[self.course]})
+        self.student_dict = StudentNames(store, self.course)
+        self.total_students = len(self.student_dict)
+        self.student_index = SqlStudentIndex(store, self.course)
+        timer.lap("lookup_dicts")
+
+        # Distinct student counts per course, module and state
+        keys = ["course_id", "module_id"]
+        counts = store.query(
+            "SELECT course_id, module_id, state, COUNT(DISTINCT student_id) AS n "
+            "FROM module_data WHERE course_id = ? GROUP BY module_id, state",
+            params,
+        )
+        totals = store.query(
+            "SELECT course_id, module_id, COUNT(DISTINCT student_id) AS n "
+            "FROM module_data WHERE course_id = ? GROUP BY module_id",
+            params,
+        )
+        self.state_cube = _finish_state_cube(
+            counts.set_index(keys + ["state"]).n, totals.set_index(keys).n
+        )
+        module_totals = totals.set_index("module_id").n
+        timer.lap("state_cube")
+
+        # Cumulative distinct completers per module and day
+        daily = store.query(
+            "SELECT module_id, date(first_completion) AS date, COUNT(*) AS n FROM "
+            "(SELECT module_id, MIN(completed_at) AS first_completion "
+            "FROM module_data WHERE course_id = ? AND state = 'completed' "
+            "AND completed_at IS NOT NULL GROUP BY module_id, student_id) "
+            "GROUP BY module_id, date ORDER BY module_id, date",
+            params,
+        )
+        # typed, a course without completions has no rows to infer them from
+        daily["date"] = pd.to_datetime(daily.date)
+        self.completion_timeline = _finish_completion_timeline(
+            daily.set_index(["module_id", "date"]).n.astype("int64"), module_totals
+        )
+        timer.lap("completion_timeline")
+
+        # Distinct students who completed each item of each module, the title
+        # and position of an item are those of its first row
+        items = store.query(
+            "SELECT module_id, items_id, MIN(rowid) AS first_row, items_title, "
+            "items_position, COUNT(DISTINCT CASE WHEN item_cp_req_completed = 1 "
+            "THEN student_id END) AS completers "
+            "FROM module_data WHERE course_id = ? AND items_id IS NOT NULL "
+            "GROUP BY module_id, items_id ORDER BY first_row",
+            params,
+        )
+        self.item_completion = _finish_item_completion(
+            items.drop(columns="first_row").set_index(["module_id", "items_id"]),
+            module_totals,
+        )
+        timer.lap("item_completion")
+
+        # Quantile sketch of the time to complete of each module, from the
+        # completed enrollments read a batch at a time
+        self.duration_sketches = {
+            module: QuantileSketch(duration_accuracy) for module in self.module_dict
+        }
+        with store.cursor(
+            "SELECT module_id, state, unlock_at, completed_at FROM module_data "
+            "WHERE course_id = ? AND state = 'completed' AND unlock_at IS NOT NULL "
+            "AND completed_at IS NOT NULL GROUP BY module_id, student_id",
+            params,
+        ) as cursor:
+            for batch in iter(lambda: cursor.fetchmany(fetch_rows), []):
+                enrollments = pd.DataFrame(
+                    batch, columns=["module_id", "state", "unlock_at", "completed_at"]
+                )
+                for col in datetime_cols:
+                    enrollments[col] = pd.to_datetime(enrollments[col])
+
+                durations = completion_durations(enrollments)
+                for module, seconds in durations.groupby(
+                    enrollments.module_id.astype(str).to_numpy()
+                ):
+                    self.duration_sketches.setdefault(
+                        module, QuantileSketch(duration_accuracy)
+                    ).add(seconds)
+        timer.lap("duration_sketches")
+
+        # Date bounds of the DatePickerRange
+        bounds = store.query(
+            "SELECT MIN(completed_at), MAX(completed_at), MIN(unlock_at), "
+            "MAX(unlock_at) FROM module_data WHERE course_id = ?",
+            params,
+        ).iloc[0]
+        self.min_date, self.max_date = date_bounds(
+            (bounds.iloc[0], bounds.iloc[1]), (bounds.iloc[2], bounds.iloc[3])
+        )
+        timer.lap("date_bounds")
+
+        # Students per module, per module state and per completed item, built
+        # on first use by student_bitmaps
+        self._student_bitmaps = None
+        self._bitmaps_lock = threading.Lock()
+
+    @property
+    def student_bitmaps(self):
+        """
+        Returns the StudentBitmaps of the course, queried on first use
+        """
+        with self._bitmaps_lock:
+            if self._student_bitmaps is None:
+                params = (self.course,)
+                students = self.store.query(
+                    "SELECT student_id FROM students WHERE course_id = ? "
+                    "ORDER BY student_id",
+                    params,
+                )
+                self._student_bitmaps = StudentBitmaps(
+                    list(students.student_id.astype(str)),
+                    self.store.query(
+                        "SELECT module_id, student_id, state FROM module_data "
+                        "WHERE course_id = ? GROUP BY module_id, student_id",
+                        params,
+                    ),
+                    self.store.query(
+                        "SELECT DISTINCT items_id, student_id FROM module_data "
+                        "WHERE course_id = ? AND item_cp_req_completed = 1",
+                        params,
+                    ),
+                )
+        return self._student_bitmaps
+
+    def memory_usage(self):
+        """
+        Returns the bytes held by the aggregate tables
+        """
+        frames = [self.state_cube, self.completion_timeline, self.item_completion]
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+
+# -------------------------------------------------------------
+########################
+#  SQL STORE           #
+########################
+class SqlStore:
+    """
+    Holds one SqlDataset per course of the SQLite database of an export
+
+    A course is queried the first time it is requested. Memory grows with
+    the aggregates of the courses served, not with the rows of the export,
+    which stay on disk. Each thread reads through its own read only
+    connection.
+
+    Inputs
+    ------
+    db_path: str, database written by ingest_sql
+    status_path: str, path of the status.csv written by the export
+    """
+
+    def __init__(self, db_path, status_path):
+        self.db_path = db_path
+        self.status_path = status_path
+
+        self._status = read_status(status_path)
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+        # connections are reopened after a refresh replaced the database
+        self._generation = 0
+        self._local = threading.local()
+        self._courses = self._read_courses()
+
+    def _connection(self):
+        local = self._local
+        key = (self._generation, os.getpid())
+        if getattr(local, "key", None) != key:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            local.connection = sqlite3.connect(uri, uri=True)
+            local.key = key
+        return local.connection
+
+    def query(self, sql, params=()):
+        """
+        Returns the result of a query as a dataframe
+        """
+        return pd.read_sql_query(sql, self._connection(), params=params)
+
+    def cursor(self, sql, params=()):
+        """
+        Returns a cursor over the result of a query, closed on leaving a with block
+        """
+        return closing(self._connection().execute(sql, params))
+
+    def _read_courses(self):
+        courses = self.query("SELECT course_id, course_name FROM courses")
+        return dict(zip(courses.course_id.astype(str), courses.course_name))
+
+    def courses(self):
+        """
+        Returns the course id to course name of every course served
+        """
+        return dict(self._courses)
+
+    def versions(self):
+        """
+        Returns the course id to 'Data Updated On' of every dated course
+        """
+        return course_versions(self._status)
+
+    def get(self, course_id):
+        """
+        Returns the dataset of a course, None when the course is unknown
+        """
+        course_id = str(course_id)
+        if course_id not in self._courses:
+            return None
+
+        with self._lock:
+            dataset = self._datasets.get(course_id)
+        if dataset is None:
+            dataset = self._load(course_id)
+            with self._lock:
+                dataset = self._datasets.setdefault(course_id, dataset)
+        return dataset
+
+    def _load(self, course_id):
+        dataset = SqlDataset(self, course_id, self.versions().get(course_id))
+        logger.info(
+            "Queried course %s in %s",
+            course_id,
+            format_seconds(dataset.build_seconds),
+        )
+        return dataset
+
+    def refresh(self):
+        """
+        Reopens the database when the status changed, returns True if it did
+
+        The database is expected to have been replaced by ingest_sql. Courses
+        whose status is newer are dropped and queried again on their next
+        access.
+        """
+        status = read_status(self.status_path)
+        versions = course_versions(status)
+
+        if versions == self.versions():
+            return False
+
+        with self._lock:
+            stale = [
+                course
+                for course, dataset in self._datasets.items()
+                if course in versions
+                and (dataset.version is None or versions[course] > dataset.version)
+            ]
+
+        self._generation += 1
+        self._status = status
+        self._courses = self._read_courses()
+        with self._lock:
+            for course in stale:
+                self._datasets.pop(course, None)
+
+        logger.info("Reopened %s", self.db_path)
+        return True
+
+
+# -------------------------------------------------------------
+########################
+#  CHECKING            #
+########################
+def compare_backends(csv_path, db_path, status_path):
+    """
+    Returns what differs between the in-memory and the SQL datasets of an export
+
+    Inputs
+    ------
+    csv_path: str, path of the csv export
+    db_path: str, database written by ingest_sql from it
+    status_path: str, path of the status.csv written by the export
+
+    Returns
+    -------
+    mismatched: list of (course id, attribute name)
+    """
+    store = SqlStore(db_path, status_path)
+
+    mismatched = []
+    for course, frame in split_courses(load_module_data(csv_path)):
+        memory, sql = Dataset(frame), store.get(course)
+
+        for name in ("state_cube", "completion_timeline", "item_completion"):
+            try:
+                pd.testing.assert_frame_equal(
+                    getattr(memory, name),
+                    getattr(sql, name),
+                    check_dtype=False,
+                    check_index_type=False,
+                )
+            except AssertionError:
+                mismatched.append((course, name))
+
+        for name in ("module_dict", "total_students", "min_date", "max_date"):
+            if getattr(memory, name) != getattr(sql, name):
+                mismatched.append((course, name))
+    return mismatched
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a module_data.csv export into an indexed SQLite database"
+    )
+    parser.add_argument("csv", help="path of the module_data.csv export")
+    parser.add_argument("--db", help="database path (default: next to the csv)")
+    parser.add_argument(
+        "--chunksize", type=int, default=1_000_000, help="rows read at a time"
+    )
+    parser.add_argument(
+        "--status",
+        default="../data/SAMPLE_status.csv",
+        help="status.csv written by the export, for --check",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the aggregates with those of the in-memory dataset",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    db_path = ingest_sql(args.csv, args.db, args.chunksize)
+    print(
+        f"Wrote {db_path} ({os.path.getsize(db_path) / 1024**2:.1f} MB) "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+    if args.check:
+        mismatched = compare_backends(args.csv, db_path, args.status)
+        for course, name in mismatched:
+            print(f"MISMATCH in {name} of course {course}")
+        if mismatched:
+            raise SystemExit(1)
+        print("The aggregates match the in-memory dataset")
+
+
+if __name__ == "__main__":
+    main()
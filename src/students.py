@@ -0,0 +1,141 @@
+# imports
+import bisect
+
+import numpy as np
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Module level columns, the same on every item row of a student and module
+module_cols = ["module_id", "state", "unlock_at", "completed_at"]
+
+# Item level columns
+item_cols = ["module_id", "items_id", "items_title", "items_position"]
+
+
+# -------------------------------------------------------------
+########################
+#  STUDENT INDEX       #
+########################
+class StudentIndex:
+    """
+    Module states, completion times and item completions of every student
+
+    The module progress of the star schema is reordered by student code once,
+    and its item progress is already in student order, so the rows of a
+    student are one contiguous slice found from the student code. Looking up
+    a student reads that slice alone and never scans the rows of the other
+    students, so it takes the same time whatever the cohort size.
+
+    Inputs
+    ------
+    schema: StarSchema, of the module data
+    dimension_index: DimensionIndex, built from the module data
+    student_dict: dict, student id (str) to student name
+    """
+
+    def __init__(self, schema, dimension_index, student_dict):
+        self.dimension_index = dimension_index
+        self.schema = schema
+
+        n_students = len(dimension_index.values["student"])
+
+        # stable, so the modules of a student stay in module order
+        students = schema.module_progress["student_id"].cat.codes.to_numpy()
+        order = np.argsort(students, kind="stable")
+
+        self.modules = (
+            schema.module_progress[module_cols].iloc[order].reset_index(drop=True)
+        )
+        self._module_bounds = np.searchsorted(
+            students[order], np.arange(n_students + 1)
+        )
+
+        self._item_bounds = np.searchsorted(
+            schema.item_progress["student_id"].cat.codes.to_numpy(),
+            np.arange(n_students + 1),
+        )
+
+        # lower case names in sorted order for the prefix search
+        names = sorted(
+            (str(name).lower(), student_id) for student_id, name in student_dict.items()
+        )
+        self._names = [name for name, _ in names]
+        self._name_ids = [student_id for _, student_id in names]
+
+    def _rows(self, bounds, student_id):
+        code = self.dimension_index.code("student", student_id)
+        if code < 0:
+            return slice(0, 0)
+        return slice(int(bounds[code]), int(bounds[code + 1]))
+
+    def student_modules(self, student_id):
+        """
+        Returns the module state and timestamps of a student
+
+        Inputs
+        ------
+        student_id: str, student id
+
+        Returns
+        -------
+        modules: dataframe, one row per module of the student with columns
+                 'module_id', 'state', 'unlock_at' and 'completed_at', empty
+                 when the student is unknown
+        """
+        return self.modules.iloc[self._rows(self._module_bounds, student_id)]
+
+    def student_items(self, student_id):
+        """
+        Returns the item completions of a student
+
+        Inputs
+        ------
+        student_id: str, student id
+
+        Returns
+        -------
+        items: dataframe, one row per item of the student with columns
+               'module_id', 'items_id', 'items_title', 'items_position' and
+               'completed' (bool), empty when the student is unknown
+        """
+        facts = self.schema.item_progress.iloc[
+            self._rows(self._item_bounds, student_id)
+        ]
+        items = self.schema.items[item_cols].iloc[facts["item"]]
+        items = items.reset_index(drop=True)
+        items["completed"] = facts["completed"].to_numpy()
+        return items
+
+    def search(self, text, limit=50):
+        """
+        Returns the ids of the students whose name starts with text
+
+        Inputs
+        ------
+        text: str, start of the name, case insensitive
+        limit: int, most ids returned
+
+        Returns
+        -------
+        student_ids: list of str, in name order
+        """
+        text = (text or "").lower()
+        start = bisect.bisect_left(self._names, text)
+
+        ids = []
+        for name, student_id in zip(
+            self._names[start : start + limit], self._name_ids[start : start + limit]
+        ):
+            if not name.startswith(text):
+                break
+            ids.append(student_id)
+        return ids
+
+    def memory_usage(self):
+        """
+        Returns the bytes held by the reordered module rows, the item rows
+        are those of the star schema
+        """
+        return int(self.modules.memory_usage(deep=True).sum())
@@ -0,0 +1,255 @@
+# imports
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+########################
+#  GLOBAL VARIABLES    #
+########################
+# Column order of the module_data.csv export
+export_columns = [
+    "completed_at",
+    "course_id",
+    "module_id",
+    "items_count",
+    "module_name",
+    "module_position",
+    "state",
+    "unlock_at",
+    "student_id",
+    "student_name",
+    "items_id",
+    "items_title",
+    "items_position",
+    "items_indent",
+    "items_type",
+    "items_module_id",
+    "item_cp_req_type",
+    "item_cp_req_completed",
+    "course_name",
+]
+
+# Completion requirement of each item type
+item_requirements = {
+    "Page": "must_view",
+    "Discussion": "must_contribute",
+    "Video": "must_view",
+    "Quiz": "must_submit",
+    "Assignment": "must_submit",
+    "File": "must_view",
+}
+
+
+# -------------------------------------------------------------
+########################
+#  GENERATOR           #
+########################
+def generate_module_data(
+    courses=1,
+    students=100,
+    modules=10,
+    items_per_module=5,
+    item_types=("Page", "Discussion", "Video", "Quiz"),
+    completion_rate=0.6,
+    optional_rate=0.1,
+    start_date="2023-01-01",
+    date_spread=180,
+    seed=0,
+):
+    """
+    Returns synthetic module data with the schema of the module_data.csv export
+
+    Every student of a course has one row per item of every module of the
+    course. Completion gets less likely with the module position, completed
+    modules are dated within `date_spread` days of `start_date` and later
+    modules are completed later. Modules that are not locked have an unlock
+    date, about a day before the completion of completed ones.
+
+    Inputs
+    ------
+    courses: int, number of courses
+    students: int, students enrolled in each course
+    modules: int, modules in each course
+    items_per_module: int, items in each module
+    item_types: tuple of str, item types drawn for the items
+    completion_rate: float, probability a student completed the first module
+    optional_rate: float, fraction of items without a completion requirement
+    start_date: str, first completion date
+    date_spread: int, days over which completions are spread
+    seed: int, random seed
+
+    Returns
+    -------
+    df: dataframe, courses * students * modules * items_per_module rows
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(pd.Timestamp(start_date), "s")
+
+    # one row per course, student, module and item, in export order
+    grid = np.indices((courses, students, modules, items_per_module)).reshape(4, -1)
+    course, student, module, item = grid
+    rows = grid.shape[1]
+
+    course_id = 1000 + course
+    module_id = 10_000 + course * modules + module
+    student_id = 100_000 + course * students + student
+    items_id = 1_000_000 + (course * modules + module) * items_per_module + item
+
+    # module state of each course, student and module pair
+    enrollments = courses * students * modules
+    enrollment = (course * students + student) * modules + module
+    position = np.arange(enrollments) % modules
+    completed = rng.random(enrollments) < completion_rate * (
+        1 - 0.5 * position / max(modules - 1, 1)
+    )
+    state = np.where(
+        completed,
+        "completed",
+        rng.choice(["locked", "unlocked", "started"], size=enrollments),
+    )
+
+    # completion dates drift later with the module position
+    offset = (
+        (position + rng.random(enrollments)) / modules * date_spread * 86_400
+    ).astype("int64")
+    completed_at = np.where(completed, start + offset, np.datetime64("NaT"))
+
+    # item requirements and their completion
+    item_key = (course * modules + module) * items_per_module + item
+    item_count = courses * modules * items_per_module
+    types = rng.choice(list(item_types), size=item_count)
+    optional = rng.random(item_count) < optional_rate
+    requirement = np.where(
+        optional,
+        None,
+        np.array([item_requirements.get(t) for t in types], dtype=object),
+    )
+
+    module_state = state[enrollment]
+    item_done = np.where(
+        module_state == "completed",
+        True,
+        (module_state == "started") & (rng.random(rows) < 0.5),
+    )
+    item_cp_req_completed = np.where(optional[item_key], None, item_done)
+
+    # modules other than locked ones were unlocked, completed ones a
+    # lognormal number of hours (about a day) before their completion
+    hours = rng.lognormal(np.log(24), 1.0, size=enrollments)
+    unlock_at = np.where(
+        state == "locked",
+        np.datetime64("NaT"),
+        np.maximum(start, start + offset - (hours * 3600).astype("int64")),
+    )
+
+    df = pd.DataFrame(
+        {
+            "completed_at": completed_at[enrollment],
+            "course_id": course_id,
+            "module_id": module_id,
+            "items_count": items_per_module,
+            "module_name": pd.Categorical.from_codes(
+                module,
+                [f"Module {m + 1}: Synthetic Topic {m + 1}" for m in range(modules)],
+            ),
+            "module_position": module + 1,
+            "state": module_state,
+            "unlock_at": unlock_at[enrollment],
+            "student_id": student_id,
+            "student_name": pd.Categorical.from_codes(
+                course * students + student,
+                [f"student{s:06d}" for s in range(courses * students)],
+            ),
+            "items_id": items_id,
+            "items_title": pd.Categorical.from_codes(
+                module * items_per_module + item,
+                [
+                    f"Module {m + 1} Item {i + 1}"
+                    for m in range(modules)
+                    for i in range(items_per_module)
+                ],
+            ),
+            "items_position": item + 1,
+            "items_indent": 0,
+            "items_type": types[item_key],
+            "items_module_id": module_id,
+            "item_cp_req_type": requirement[item_key],
+            "item_cp_req_completed": item_cp_req_completed,
+            "course_name": pd.Categorical.from_codes(
+                course, [f"Synthetic Course {c + 1}" for c in range(courses)]
+            ),
+        }
+    )
+    return df[export_columns]
+
+
+def generate_status(df, updated_on="2023-07-01 00:00:00"):
+    """
+    Returns the status.csv rows of the courses in synthetic module data
+    """
+    courses = df[["course_id", "course_name"]].drop_duplicates()
+    return pd.DataFrame(
+        {
+            "Course Id": courses["course_id"].to_numpy(),
+            "Course Name": courses["course_name"].astype(str).to_numpy(),
+            "Status": "Success",
+            "Message": "Course folder has been created in data directory",
+            "Data Updated On": updated_on,
+        }
+    )
+
+
+def write_module_csv(df, path):
+    """
+    Writes module data as a csv with the date format of the export
+    """
+    df.to_csv(path, index=False, date_format="%Y-%m-%d %H:%M")
+
+
+# -------------------------------------------------------------
+########################
+#  COMMAND LINE        #
+########################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write synthetic data with the module_data.csv schema"
+    )
+    parser.add_argument("output", help="path of the csv to write")
+    parser.add_argument("--status", help="also write a status.csv to this path")
+    parser.add_argument("--courses", type=int, default=1)
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--items-per-module", type=int, default=5)
+    parser.add_argument(
+        "--item-types", default="Page,Discussion,Video,Quiz", help="comma separated"
+    )
+    parser.add_argument("--completion-rate", type=float, default=0.6)
+    parser.add_argument("--optional-rate", type=float, default=0.1)
+    parser.add_argument("--start-date", default="2023-01-01")
+    parser.add_argument("--date-spread", type=int, default=180, help="days")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = generate_module_data(
+        courses=args.courses,
+        students=args.students,
+        modules=args.modules,
+        items_per_module=args.items_per_module,
+        item_types=tuple(args.item_types.split(",")),
+        completion_rate=args.completion_rate,
+        optional_rate=args.optional_rate,
+        start_date=args.start_date,
+        date_spread=args.date_spread,
+        seed=args.seed,
+    )
+    write_module_csv(df, args.output)
+    if args.status:
+        generate_status(df).to_csv(args.status)
+
+    print(f"Wrote {len(df)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
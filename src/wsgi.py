@@ -0,0 +1,51 @@
+# imports
+import gc
+
+from app import app, reload_interval, store
+from dataset import StatusWatcher
+
+# -----------------------------------------------------------
+########################
+#  WSGI ENTRY POINT    #
+########################
+# Production entry point for a pre-forking WSGI server, see gunicorn.conf.py.
+# Importing this module loads the data and builds every lookup table, so when
+# the server imports it before forking (preload) all workers share the pages
+# of one copy instead of each reading the export.
+server = app.server
+
+
+def preload_courses(store):
+    """
+    Builds the dataset of every course a store serves in the current process
+
+    A DatasetStore builds its datasets when it is created. A CourseShardStore
+    and a SqlStore build a course the first time it is requested, which
+    after a fork happens in each worker separately. Requesting every course
+    here builds them once, before the fork. A CourseShardStore keeps the
+    courses that fit its memory budget; the courses it evicts are loaded by
+    each worker on first use.
+    """
+    for course in store.courses():
+        store.get(course)
+
+
+preload_courses(store)
+
+# The loaded data lives until the next reload. Freezing it moves it out of the
+# garbage collector's generations, so collections in the workers do not write
+# to (and thereby copy) the pages shared with the parent.
+gc.freeze()
+
+
+def start_status_watcher():
+    """
+    Starts reloading the data in the background in the current process
+
+    Threads do not survive a fork, so every worker starts its own watcher
+    after it is forked. A reloaded dataset is private to the worker that
+    loaded it.
+    """
+    watcher = StatusWatcher(store, reload_interval)
+    watcher.start()
+    return watcher
@@ -0,0 +1,74 @@
+# imports
+import os
+import sys
+
+import pytest
+
+# the modules of the dashboard import each other by name, as when run from src
+src_dir = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+sys.path.insert(0, src_dir)
+
+from dataset import Dataset, DatasetStore, split_courses
+from snapshot import read_module_csv
+from synthetic import generate_module_data, generate_status, write_module_csv
+
+
+# -------------------------------------------------------------
+########################
+#  FIXTURES            #
+########################
+@pytest.fixture(scope="session")
+def module_data():
+    """
+    Synthetic module data of two courses
+    """
+    return generate_module_data(
+        courses=2, students=48, modules=4, items_per_module=3, seed=1
+    )
+
+
+@pytest.fixture
+def export(tmp_path, module_data):
+    """
+    Paths of the module_data.csv and status.csv written from module_data
+    """
+    csv_path = str(tmp_path / "module_data.csv")
+    status_path = str(tmp_path / "status.csv")
+    write_module_csv(module_data, csv_path)
+    generate_status(module_data).to_csv(status_path)
+    return csv_path, status_path
+
+
+@pytest.fixture(scope="session")
+def course(tmp_path_factory, module_data):
+    """
+    Module data of the first course read back from its csv, and its Dataset
+    """
+    csv_path = str(tmp_path_factory.mktemp("course") / "module_data.csv")
+    write_module_csv(module_data, csv_path)
+    _, frame = next(iter(split_courses(read_module_csv(csv_path))))
+    return frame, Dataset(frame)
+
+
+@pytest.fixture(scope="session")
+def dashboard(tmp_path_factory, module_data):
+    """
+    The app module, serving the synthetic module data
+    """
+    workdir = tmp_path_factory.mktemp("dashboard")
+    csv_path, status_path = str(workdir / "module_data.csv"), str(
+        workdir / "status.csv"
+    )
+    write_module_csv(module_data, csv_path)
+    generate_status(module_data).to_csv(status_path)
+
+    # the paths of app.py are relative to src
+    cwd = os.getcwd()
+    os.chdir(src_dir)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+
+    app.store = DatasetStore(csv_path, status_path)
+    return app
@@ -0,0 +1,178 @@
+# imports
+import pandas as pd
+import pytest
+
+from aggregates import (
+    build_completion_timeline,
+    build_item_completion,
+    build_schema_item_completion,
+    build_state_cube,
+    completion_window,
+    select_modules,
+    state_percentages,
+)
+from dataset import Dataset
+from snapshot import convert_module_data
+
+
+# -------------------------------------------------------------
+########################
+#  BASELINE            #
+########################
+# The per-module filters the aggregates replaced, computed on the module data
+def baseline_percentage(df, module, state):
+    df_module = df[df.module_id.astype(str) == module]
+    if df_module.shape[0] == 0:
+        return 0
+    return (
+        df_module[df_module.state == state].student_id.unique().size
+        / df_module.student_id.unique().size
+    )
+
+
+def baseline_percentage_date(df, module, date):
+    df_module = df[df.module_id.astype(str) == module]
+    completed = df_module[
+        (df_module.state == "completed") & (df_module.completed_at.dt.date <= date)
+    ]
+    return completed.student_id.unique().size / df_module.student_id.unique().size
+
+
+def baseline_item_completers(df, module, item):
+    df_item = df[
+        (df.module_id.astype(str) == module) & (df.items_id.astype(str) == item)
+    ]
+    return df_item[df_item.item_cp_req_completed == True].student_id.unique().size
+
+
+@pytest.fixture(scope="module")
+def edited(module_data):
+    """
+    Module data of one course where two items of a module share a title and
+    some students are not enrolled in the last module, with its Dataset
+    """
+    df = module_data[module_data.course_id == module_data.course_id.iloc[0]].copy()
+    modules = sorted(df.module_id.unique())
+
+    # two items of the first module share the title of its first item
+    first = df[df.module_id == modules[0]]
+    items = sorted(first.items_id.unique())
+    df["items_title"] = df.items_title.astype(str)
+    title = first.items_title.astype(str).iloc[0]
+    df.loc[df.items_id.isin(items[:2]), "items_title"] = title
+
+    # a third of the students have no rows in the last module
+    students = sorted(df.student_id.unique())
+    dropped = (df.module_id == modules[-1]) & df.student_id.isin(
+        students[: len(students) // 3]
+    )
+    df = convert_module_data(df[~dropped].reset_index(drop=True))
+    return df, Dataset(df)
+
+
+# -------------------------------------------------------------
+########################
+#  TESTS               #
+########################
+def test_state_percentages_match_baseline(edited):
+    df, dataset = edited
+    cube = dataset.state_cube
+
+    pd.testing.assert_frame_equal(cube, build_state_cube(df))
+    for module in dataset.module_dict:
+        rows = select_modules(cube, module, dataset.state_cube_slices)
+        percentages = state_percentages(rows).iloc[0]
+        for state in ("unlocked", "started", "completed"):
+            assert percentages[state] == pytest.approx(
+                baseline_percentage(df, module, state) * 100
+            )
+
+
+def test_completion_window_matches_baseline(edited):
+    df, dataset = edited
+    timeline = dataset.completion_timeline
+
+    pd.testing.assert_frame_equal(timeline, build_completion_timeline(df))
+
+    dates = sorted(df.completed_at.dropna().dt.date.unique())
+    before = dates[0] - pd.Timedelta(days=1)
+    for date in [before] + dates[:: max(len(dates) // 20, 1)] + [dates[-1]]:
+        window = completion_window(timeline, dataset.min_date, date)
+        last = window.groupby("module_id").last()
+
+        for module in dataset.module_dict:
+            percentage = 0.0
+            if module in last.index:
+                row = last.loc[module]
+                percentage = row.completers / row.total
+            assert percentage == pytest.approx(
+                baseline_percentage_date(df, module, date)
+            )
+
+
+def test_item_completion_by_id(edited):
+    df, dataset = edited
+    items = dataset.item_completion
+
+    pd.testing.assert_frame_equal(items, build_item_completion(df), check_dtype=False)
+    pd.testing.assert_frame_equal(items, build_schema_item_completion(dataset.schema))
+
+    for (module, item), row in items.iterrows():
+        assert row.completers == baseline_item_completers(df, module, item)
+
+    # items sharing a title keep a row each, in position order
+    first = str(sorted(df.module_id.unique())[0])
+    rows = select_modules(items, first, dataset.item_completion_slices)
+    assert len(rows) == df[df.module_id.astype(str) == first].items_id.nunique()
+    assert rows.items_title.duplicated().sum() == 1
+    assert rows.items_position.is_monotonic_increasing
+
+
+def test_item_completion_module_denominator(edited):
+    df, dataset = edited
+    items = dataset.item_completion
+
+    for module, rows in df.groupby(df.module_id.astype(str)):
+        assert (select_modules(items, module).total == rows.student_id.nunique()).all()
+
+    # the students of the last module, not of the course
+    last = str(sorted(df.module_id.unique())[-1])
+    total = select_modules(items, last).total.iloc[0]
+    assert total < df.student_id.nunique()
+
+
+def test_module_slices(edited):
+    df, dataset = edited
+    index = dataset.dimension_index
+
+    rows = index.module_rows
+    assert sum(s.stop - s.start for s in rows.values()) == len(df)
+    for module, rows_slice in rows.items():
+        assert (df.module_id.iloc[rows_slice].astype(str) == module).all()
+        assert index.code("module", module) >= 0
+
+    for aggregate, slices in [
+        (dataset.state_cube, dataset.state_cube_slices),
+        (dataset.item_completion, dataset.item_completion_slices),
+    ]:
+        for module in dataset.module_dict:
+            pd.testing.assert_frame_equal(
+                select_modules(aggregate, module, slices),
+                select_modules(aggregate, module),
+            )
+    assert index.code("module", "missing") == -1
+
+
+def test_star_schema(edited):
+    df, dataset = edited
+    schema = dataset.schema
+
+    enrollments = df.drop_duplicates(["module_id", "student_id"])
+    assert len(schema.module_progress) == len(enrollments)
+    assert len(schema.students) == df.student_id.nunique()
+    assert len(schema.items) == len(df[["module_id", "items_id"]].drop_duplicates())
+
+    facts = schema.item_progress
+    assert len(facts) == len(df)
+    assert facts.completed.sum() == (df.item_cp_req_completed == True).sum()
+    assert facts.student_id.cat.codes.is_monotonic_increasing
@@ -0,0 +1,66 @@
+# imports
+import pytest
+
+from bitmaps import StudentSet, intersection, union
+
+
+def test_counts_match_nunique(course):
+    frame, dataset = course
+    bitmaps = dataset.student_bitmaps
+
+    for module, rows in frame.groupby("module_id", observed=True):
+        assert len(bitmaps.students(module)) == rows.student_id.nunique()
+
+    for (module, state), rows in frame.groupby(["module_id", "state"], observed=True):
+        assert len(bitmaps.students(module, state)) == rows.student_id.nunique()
+
+    completed = frame[frame.item_cp_req_completed == True]
+    for item, rows in completed.groupby("items_id", observed=True):
+        assert len(bitmaps.completed_item(item)) == rows.student_id.nunique()
+
+    assert len(bitmaps.students("missing")) == 0
+
+
+def test_state_percentage(course):
+    frame, dataset = course
+    bitmaps = dataset.student_bitmaps
+    first, second = (str(module) for module in dataset.modules[:2])
+    modules = frame.module_id.astype(str)
+
+    def students(module, state=None):
+        rows = frame[modules == module]
+        if state is not None:
+            rows = rows[rows.state == state]
+        return set(rows.student_id.astype(str))
+
+    enrolled = students(first) | students(second)
+    completed = students(first, "completed") | students(second, "completed")
+    assert bitmaps.state_percentage([first, second], "completed") == pytest.approx(
+        len(completed) / len(enrolled)
+    )
+
+    # completed the first module but not the second
+    only_first = students(first, "completed") - students(second, "completed")
+    assert bitmaps.state_percentage(
+        [first], "completed", excluded=[second]
+    ) == pytest.approx(len(only_first) / len(students(first)))
+
+    group = sorted(students(first))[: len(students(first)) // 2]
+    assert bitmaps.state_percentage(
+        [first], "completed", group=bitmaps.group(group + ["missing"])
+    ) == pytest.approx(len(students(first, "completed") & set(group)) / len(group))
+
+    assert bitmaps.state_percentage([], "completed") == 0
+
+
+def test_set_operations():
+    size = 200
+    a = StudentSet.from_codes([0, 5, 63, 64, 199], size)
+    b = StudentSet.from_codes([5, 64, 100], size)
+
+    assert list((a & b).codes()) == [5, 64]
+    assert list((a | b).codes()) == [0, 5, 63, 64, 100, 199]
+    assert list((a - b).codes()) == [0, 63, 199]
+    assert len(union([a, b], size)) == 6
+    assert len(intersection([], size)) == size
+    assert len(StudentSet.empty(size)) == 0
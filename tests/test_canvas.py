@@ -0,0 +1,60 @@
+# imports
+import asyncio
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from canvas import export_date, next_link, update_status
+from shards import CourseShardStore, shard_status_path
+
+
+def test_next_link():
+    header = (
+        '<https://canvas.test/api/v1/courses?page=1>; rel="current", '
+        '<https://canvas.test/api/v1/courses?page=2>; rel="next", '
+        '<https://canvas.test/api/v1/courses?page=9>; rel="last"'
+    )
+    assert next_link(header) == "https://canvas.test/api/v1/courses?page=2"
+    assert next_link('<https://canvas.test/a>; rel="last"') is None
+    assert next_link(None) is None
+
+
+def test_export_date():
+    assert export_date("2023-03-04T05:06:07Z") == "2023-03-04 05:06"
+    assert export_date("2023-03-04T05:06:07+02:00") == "2023-03-04 03:06"
+    assert export_date(None) == ""
+
+
+def test_update_status_replaces_course_row(tmp_path):
+    status_path = str(tmp_path / "status.csv")
+    update_status(status_path, 1, "One", datetime(2023, 1, 1))
+    update_status(status_path, 2, "Two", datetime(2023, 1, 2))
+    update_status(status_path, 1, "One again", datetime(2023, 1, 3))
+
+    status = pd.read_csv(status_path, index_col=0)
+    assert list(status["Course Id"]) == [2, 1]
+    assert list(status["Course Name"]) == ["Two", "One again"]
+    assert list(status["Data Updated On"]) == [
+        "2023-01-02 00:00:00",
+        "2023-01-03 00:00:00",
+    ]
+
+
+def test_fetch_round_trip(tmp_path, module_data):
+    pytest.importorskip("aiohttp")
+    from mock_canvas import check_output, run_benchmark
+
+    data_dir = str(tmp_path)
+    stats = asyncio.run(
+        run_benchmark(module_data, 8, latency=0, fail_rate=0.05, data_dir=data_dir)
+    )
+
+    assert stats["courses"] == module_data.course_id.nunique()
+    assert stats["rows"] == len(module_data)
+    assert check_output(module_data, data_dir) == []
+
+    store = CourseShardStore(data_dir, shard_status_path(data_dir))
+    assert sorted(store.courses()) == sorted(
+        str(course) for course in module_data.course_id.unique()
+    )
@@ -0,0 +1,109 @@
+# imports
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+from plotly.io.json import to_json_plotly
+
+src_dir = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+node = shutil.which("node")
+
+
+@pytest.fixture(scope="module")
+def clientside_app(dashboard):
+    """
+    A second app module with the module dropdown handled clientside, serving
+    the same store as dashboard
+    """
+    spec = importlib.util.spec_from_file_location(
+        "app_clientside", os.path.join(src_dir, "app.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+
+    cwd = os.getcwd()
+    os.environ["DASHBOARD_CLIENTSIDE_MODULES"] = "1"
+    os.chdir(src_dir)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+        del os.environ["DASHBOARD_CLIENTSIDE_MODULES"]
+
+    module.store = dashboard.store
+    yield module
+    del sys.modules[spec.name]
+
+
+def _clientside_functions(app):
+    """
+    Returns the output "id.prop" to the (namespace, function) of every
+    clientside callback, and the outputs of the server callbacks
+    """
+    functions, server = {}, set()
+    for callback in app.app._callback_list:
+        function = callback.get("clientside_function")
+        if function:
+            functions[callback["output"]] = (
+                function["namespace"],
+                function["function_name"],
+            )
+        else:
+            server.add(callback["output"])
+    return functions, server
+
+
+def _select(function, figures, module):
+    """
+    Returns what a function of assets/clientside.js returns, run by node
+    """
+    script = (
+        "global.window = {};"
+        f"require({json.dumps(os.path.join(src_dir, 'assets', 'clientside.js'))});"
+        "const [namespace, name, figures, module] = JSON.parse(process.argv[1]);"
+        "const result = window.dash_clientside[namespace][name](figures, module);"
+        "process.stdout.write(JSON.stringify(result === undefined ? null : result));"
+    )
+    argument = json.dumps([*function, json.loads(figures), module])
+    output = subprocess.run(
+        [node, "-e", script, argument], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_module_callbacks_registered(clientside_app, dashboard):
+    functions, server = _clientside_functions(clientside_app)
+    assert set(functions) == {"plot1.figure", "plot3.figure", "plot4.figure"}
+    assert not server & set(functions)
+    assert "module-figures.data" in server
+
+    # the default app serves the module figures itself
+    functions, server = _clientside_functions(dashboard)
+    assert not functions
+    assert {"plot1.figure", "plot3.figure", "plot4.figure"} <= server
+
+
+@pytest.mark.skipif(node is None, reason="needs node to run assets/clientside.js")
+def test_clientside_figures_match_server(clientside_app):
+    app = clientside_app
+    functions, _ = _clientside_functions(app)
+    course = next(iter(app.store.courses()))
+    dataset = app.store.get(course)
+
+    # sent to the browser as JSON, as the dcc.Store data
+    figures = to_json_plotly(app.update_module_figures(course, "All"))
+
+    server = {
+        "plot1.figure": app.update_module,
+        "plot3.figure": app.update_items,
+        "plot4.figure": app.update_durations,
+    }
+    for option in app.module_options(dataset):
+        module = option["value"]
+        for output, callback in server.items():
+            expected = json.loads(to_json_plotly(callback(course, module)))
+            assert _select(functions[output], figures, module) == expected
@@ -0,0 +1,80 @@
+# imports
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from aggregates import completion_window
+from dataset import Dataset, DatasetStore, date_bounds
+from snapshot import read_module_csv
+from sqlstore import SqlStore, ingest_sql
+from synthetic import generate_module_data, generate_status, write_module_csv
+
+
+@pytest.fixture
+def no_completions(tmp_path):
+    """
+    Paths of the export of a course nobody has completed a module of
+    """
+    df = generate_module_data(
+        students=20, modules=3, items_per_module=2, completion_rate=0.0
+    )
+    csv_path, status_path = str(tmp_path / "module_data.csv"), str(
+        tmp_path / "status.csv"
+    )
+    write_module_csv(df, csv_path)
+    generate_status(df).to_csv(status_path)
+    return csv_path, status_path
+
+
+def test_date_bounds():
+    completed = (pd.Timestamp("2023-02-01 10:00"), pd.Timestamp("2023-03-01"))
+    unlocked = (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-04-01"))
+
+    assert date_bounds(completed, unlocked) == (date(2023, 2, 1), date(2023, 3, 1))
+    assert date_bounds((pd.NaT, pd.NaT), unlocked) == (
+        date(2023, 1, 1),
+        date(2023, 4, 1),
+    )
+    assert date_bounds((None, None), (pd.NaT, pd.NaT)) == (date.today(),) * 2
+
+
+def test_completion_window_open_bounds(course):
+    _, dataset = course
+    timeline = dataset.completion_timeline
+
+    assert len(completion_window(timeline, None, None)) == len(timeline)
+    window = completion_window(timeline, pd.NaT, dataset.min_date)
+    assert (window.date.dt.date == dataset.min_date).all()
+
+
+def test_course_without_completions(no_completions, tmp_path):
+    csv_path, status_path = no_completions
+    data = read_module_csv(csv_path)
+    assert data.completed_at.isna().all()
+
+    unlocked = data.unlock_at.dropna()
+    expected = (unlocked.min().date(), unlocked.max().date())
+
+    dataset = Dataset(data)
+    assert (dataset.min_date, dataset.max_date) == expected
+    assert dataset.completion_timeline.empty
+
+    db_path = ingest_sql(csv_path, str(tmp_path / "module_data.sqlite"))
+    sql = SqlStore(db_path, status_path).get(str(data.course_id.iloc[0]))
+    assert (sql.min_date, sql.max_date) == expected
+
+
+def test_dashboard_without_completions(dashboard, no_completions, monkeypatch):
+    csv_path, status_path = no_completions
+    monkeypatch.setattr(dashboard, "store", DatasetStore(csv_path, status_path))
+    course = next(iter(dashboard.store.courses()))
+    dataset = dashboard.store.get(course)
+
+    _, _, _, min_date, max_date, start_date, end_date = dashboard.update_course(course)
+    assert (min_date, max_date) == (dataset.min_date, dataset.max_date)
+    assert (start_date, end_date) == (min_date, max_date)
+
+    assert not dashboard.update_lineplot(course)["data"]
+    dashboard.update_lineplot_range(str(start_date), str(end_date), course)
+    dashboard.serve_layout()
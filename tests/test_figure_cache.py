@@ -0,0 +1,47 @@
+# imports
+from figure_cache import FigureCache, figure_bytes
+
+
+def _figure(points):
+    return {"data": [{"x": list(range(points)), "y": [1.5] * points}], "layout": {}}
+
+
+def test_evicts_by_bytes():
+    small, large = _figure(10), _figure(1000)
+    cache = FigureCache(max_entries=100, max_bytes=figure_bytes(large) + 100)
+
+    cache.get_or_build(("plot", 1, None), lambda: small)
+    cache.get_or_build(("plot", 2, None), lambda: small)
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] == 2 * figure_bytes(small)
+
+    # the large figure only fits once the least recently used ones are gone
+    cache.get_or_build(("plot", 1, None), lambda: small)
+    cache.get_or_build(("plot", 3, None), lambda: large)
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes
+    assert stats["evictions"] >= 1
+    assert cache.get_or_build(("plot", 3, None), lambda: None) is large
+
+
+def test_figure_larger_than_budget_not_cached():
+    large = _figure(1000)
+    cache = FigureCache(max_bytes=figure_bytes(large) - 1)
+
+    assert cache.get_or_build(("plot", 1, None), lambda: large) is large
+    assert len(cache) == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_evicts_by_entries():
+    cache = FigureCache(max_entries=2)
+    for i in range(3):
+        cache.get_or_build(("plot", i, None), lambda: _figure(5))
+
+    assert len(cache) == 2
+    assert cache.stats()["misses"] == 3
+    cache.get_or_build(("plot", 2, None), lambda: None)
+    assert cache.stats()["hits"] == 1
+
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
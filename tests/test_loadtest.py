@@ -0,0 +1,66 @@
+# imports
+import asyncio
+import random
+import threading
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+import loadtest
+from loadtest import Callback, LoadStats, VirtualUser
+
+
+@pytest.fixture(scope="module")
+def dashboard_url(dashboard):
+    """
+    Url of the dashboard served on localhost from a thread
+    """
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, dashboard.app.server, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+def _counts(stats):
+    return {name: len(latencies) for name, latencies in stats.latencies.items()}
+
+
+async def _session(url, kinds, monkeypatch):
+    """
+    Returns the requests of a page load and of each interaction of kinds
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url + "/_dash-dependencies") as response:
+            callbacks = [Callback(spec) for spec in await response.json()]
+
+        stats = LoadStats()
+        user = VirtualUser(session, url, callbacks, stats, random.Random(0), 0, 0.1)
+        assert await user.load()
+        counts = [_counts(stats)]
+
+        for kind in kinds:
+            monkeypatch.setattr(loadtest, "interaction_weights", {kind: 1.0})
+            await user.interact()
+            counts.append(_counts(stats))
+    return stats, counts
+
+
+def test_interactions_send_requests(dashboard_url, monkeypatch):
+    stats, (loaded, module, dates) = asyncio.run(
+        _session(dashboard_url, ["module", "dates"], monkeypatch)
+    )
+    assert not stats.errors
+
+    # update_module and update_items
+    for name in ("plot1.figure", "plot3.figure"):
+        assert module[name] == loaded[name] + 1
+    assert module["plot2.figure"] == loaded["plot2.figure"]
+
+    # update_lineplot_range
+    assert dates["plot2.figure"] == module["plot2.figure"] + 1
+    assert dates["plot1.figure"] == module["plot1.figure"]
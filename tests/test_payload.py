@@ -0,0 +1,73 @@
+# imports
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from payload import compact_array, downsample_line, lttb_indices, narrow_values
+
+
+@pytest.mark.parametrize("max_points", [3, 10, 100])
+def test_lttb_keeps_endpoints_within_budget(max_points):
+    rng = np.random.default_rng(0)
+    x = np.arange(1000)
+    y = rng.normal(size=1000).cumsum()
+
+    indices = lttb_indices(x, y, max_points)
+
+    assert len(indices) == max_points
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_keeps_peak():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[237] = 100
+
+    assert 237 in lttb_indices(x, y, 20)
+
+
+def test_lttb_short_line_unchanged():
+    assert list(lttb_indices(np.arange(5), np.arange(5), 10)) == list(range(5))
+
+
+def test_downsample_line_dates():
+    x = pd.Series(pd.date_range("2023-01-01", periods=400).date)
+    y = pd.Series(np.arange(400) % 17, dtype=float)
+
+    kept_x, kept_y = downsample_line(x, y, 50)
+
+    assert len(kept_x) == len(kept_y) == 50
+    assert kept_x.iloc[0] == x.iloc[0] and kept_x.iloc[-1] == x.iloc[-1]
+    assert downsample_line(x, y, None)[0] is x
+
+
+def test_narrow_values():
+    narrowed = narrow_values(pd.Series([0.0, 50.0, 100.0]))
+    assert narrowed.dtype == np.uint8
+    assert list(narrowed) == [0, 50, 100]
+
+    assert narrow_values([-1.0, 300.0]).dtype == np.int16
+
+    fractions = pd.Series([0.5, 1.0])
+    assert narrow_values(fractions) is fractions
+    assert narrow_values(["a", "b"]) == ["a", "b"]
+
+
+def test_compact_array():
+    def typed(array):
+        return {
+            "dtype": array.dtype.str[1:],
+            "bdata": base64.b64encode(array.tobytes()).decode(),
+        }
+
+    compacted = compact_array(typed(np.array([1.0, 2.0, 250.0])))
+    assert compacted["dtype"] == "u1"
+    values = np.frombuffer(base64.b64decode(compacted["bdata"]), dtype="u1")
+    assert list(values) == [1, 2, 250]
+
+    fractions = typed(np.array([0.25, 1.0]))
+    assert compact_array(fractions) is fractions
+    assert compact_array([1.0, 2.0]) == [1.0, 2.0]
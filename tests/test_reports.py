@@ -0,0 +1,37 @@
+# imports
+import os
+import sys
+
+import pytest
+
+import reports
+from shards import shard_status_path
+from synthetic import generate_status, write_module_csv
+
+
+def test_course_folders_default_status(tmp_path, module_data, monkeypatch):
+    data_dir = tmp_path / "Tableau"
+    for course, frame in module_data.groupby("course_id"):
+        os.makedirs(data_dir / str(course))
+        write_module_csv(frame, str(data_dir / str(course) / "module_data.csv"))
+    generate_status(module_data).to_csv(shard_status_path(str(data_dir)))
+
+    output = tmp_path / "reports"
+    monkeypatch.setattr(
+        sys, "argv", ["reports.py", str(data_dir), "-o", str(output), "--workers", "1"]
+    )
+    reports.main()
+
+    for course in module_data.course_id.unique():
+        assert (output / str(course) / "index.html").exists()
+
+
+def test_no_courses_fails(tmp_path, monkeypatch):
+    data_dir = tmp_path / "Tableau"
+    os.makedirs(data_dir)
+    monkeypatch.setattr(
+        sys, "argv", ["reports.py", str(data_dir), "-o", str(tmp_path / "reports")]
+    )
+
+    with pytest.raises(SystemExit, match="No course"):
+        reports.main()
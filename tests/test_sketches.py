@@ -0,0 +1,64 @@
+# imports
+import math
+
+import numpy as np
+import pytest
+
+from sketches import QuantileSketch, exact_box_stats
+
+
+@pytest.fixture(scope="module")
+def durations():
+    rng = np.random.default_rng(0)
+    return rng.lognormal(mean=10, sigma=2, size=5000)
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_quantiles_within_relative_accuracy(durations, accuracy):
+    sketch = QuantileSketch(accuracy)
+    sketch.add(durations)
+
+    for q in (0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1):
+        exact = np.quantile(durations, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= accuracy * exact * 1.001
+
+
+def test_box_stats_close_to_exact(durations):
+    sketch = QuantileSketch(0.01)
+    sketch.add(durations)
+
+    stats, exact = sketch.box_stats(), exact_box_stats(durations)
+
+    assert stats["count"] == exact["count"]
+    assert stats["min"] == exact["min"] and stats["max"] == exact["max"]
+    for key in ("q1", "median", "q3", "lowerfence", "upperfence"):
+        assert stats[key] == pytest.approx(exact[key], rel=0.03)
+    for key in ("outliers_low", "outliers_high"):
+        assert abs(stats[key] - exact[key]) <= 0.01 * exact["count"]
+
+
+def test_merge_equals_adding_together(durations):
+    whole = QuantileSketch()
+    whole.add(durations)
+
+    merged = QuantileSketch()
+    for chunk in np.array_split(durations, 7):
+        part = QuantileSketch()
+        part.add(chunk)
+        merged.merge(part)
+
+    assert merged.count == whole.count
+    assert merged.buckets == whole.buckets
+    assert merged.box_stats() == whole.box_stats()
+
+
+def test_zeros_missing_and_empty():
+    sketch = QuantileSketch()
+    assert math.isnan(sketch.quantile(0.5))
+    assert sketch.box_stats() is None
+    assert exact_box_stats([np.nan, -1]) is None
+
+    sketch.add([0, 0, 0, np.nan, -5, 10])
+    assert sketch.count == 4
+    assert sketch.quantile(0.5) == 0
+    assert sketch.quantile(1) == 10
@@ -0,0 +1,69 @@
+# imports
+import pandas as pd
+import pytest
+
+from dataset import Dataset, split_courses
+from snapshot import (
+    load_course_tables,
+    read_module_csv,
+    read_snapshot,
+    snapshot_path,
+    stream_ingest,
+    write_snapshot,
+)
+
+
+def _read(path):
+    """
+    Returns the snapshot in memory, its columns are memory maps otherwise
+    """
+    return read_snapshot(path).copy()
+
+
+def test_snapshot_round_trip(export, tmp_path):
+    csv_path, _ = export
+    expected = read_module_csv(csv_path)
+
+    path = str(tmp_path / "whole.snapshot")
+    write_snapshot(expected, path)
+
+    pd.testing.assert_frame_equal(_read(path), expected)
+
+
+@pytest.mark.parametrize("chunksize", [7, 97, 1000, 10**6])
+def test_stream_ingest_matches_whole_csv(export, tmp_path, chunksize):
+    csv_path, _ = export
+
+    path = str(tmp_path / "stream.snapshot")
+    stream_ingest(csv_path, path, chunksize)
+
+    pd.testing.assert_frame_equal(_read(path), read_module_csv(csv_path))
+
+
+def test_stream_aggregates_match_dataset(export):
+    csv_path, _ = export
+    stream_ingest(csv_path, snapshot_path(csv_path), 250)
+
+    tables = load_course_tables(csv_path)
+    courses = dict(split_courses(read_module_csv(csv_path)))
+    assert set(tables) == set(courses)
+
+    for course, frame in courses.items():
+        dataset = Dataset(frame)
+        for name in ("state_cube", "completion_timeline", "item_completion"):
+            pd.testing.assert_frame_equal(
+                tables[course][name],
+                getattr(dataset, name),
+                check_dtype=False,
+                check_index_type=False,
+            )
+
+        sketches = tables[course]["duration_sketches"]
+        assert set(sketches) == set(dataset.duration_sketches)
+        for module, sketch in sketches.items():
+            assert sketch.count == dataset.duration_sketches[module].count
+
+
+def test_course_tables_missing_without_snapshot(export):
+    csv_path, _ = export
+    assert load_course_tables(csv_path) is None
@@ -0,0 +1,31 @@
+# imports
+from dataset import Dataset, split_courses
+from snapshot import read_module_csv
+from sqlstore import SqlStore, compare_backends, ingest_sql
+
+
+def test_backends_match(export, tmp_path):
+    csv_path, status_path = export
+    db_path = ingest_sql(csv_path, str(tmp_path / "module_data.sqlite"), 250)
+
+    assert compare_backends(csv_path, db_path, status_path) == []
+
+
+def test_bitmaps_match(export, tmp_path):
+    csv_path, status_path = export
+    db_path = ingest_sql(csv_path, str(tmp_path / "module_data.sqlite"))
+    store = SqlStore(db_path, status_path)
+
+    for course, frame in split_courses(read_module_csv(csv_path)):
+        memory = Dataset(frame).student_bitmaps
+        sql = store.get(course).student_bitmaps
+
+        assert memory.size == sql.size
+        for module in frame.module_id.unique():
+            assert len(memory.students(module)) == len(sql.students(module))
+            for state in ("unlocked", "started", "completed"):
+                assert len(memory.students(module, state)) == len(
+                    sql.students(module, state)
+                )
+        for item in frame.items_id.unique():
+            assert len(memory.completed_item(item)) == len(sql.completed_item(item))
@@ -0,0 +1,55 @@
+# imports
+from students import StudentIndex
+
+
+def test_search_prefix(course):
+    _, dataset = course
+    by_name = [
+        student
+        for _, student in sorted(
+            (name, student) for student, name in dataset.student_dict.items()
+        )
+    ]
+    names = dataset.student_dict
+
+    assert dataset.student_index.search("STUDENT00001") == [
+        student for student in by_name if names[student].startswith("student00001")
+    ]
+    assert dataset.student_index.search("student", limit=5) == by_name[:5]
+    assert dataset.student_index.search("nobody") == []
+
+
+def test_search_case_insensitive_in_name_order(course):
+    _, dataset = course
+    students = list(dataset.student_dict)[:4]
+    names = dict(zip(students, ["bob", "Alice", "alan", "ALBERT"]))
+    index = StudentIndex(dataset.schema, dataset.dimension_index, names)
+
+    assert index.search("al") == [students[2], students[3], students[1]]
+    assert index.search("Al", limit=2) == [students[2], students[3]]
+    assert index.search("") == [students[2], students[3], students[1], students[0]]
+
+
+def test_student_rows_match_module_data(course):
+    frame, dataset = course
+
+    for student in list(dataset.student_dict)[:10]:
+        rows = frame[frame.student_id.astype(str) == student]
+
+        modules = dataset.student_index.student_modules(student)
+        expected = rows.drop_duplicates(["module_id", "student_id"])
+        assert list(modules.module_id.astype(str)) == list(
+            expected.module_id.astype(str)
+        )
+        assert list(modules.state.astype(str)) == list(expected.state.astype(str))
+
+        items = dataset.student_index.student_items(student)
+        assert sorted(items.items_id.astype(str)) == sorted(rows.items_id.astype(str))
+        completed = rows[rows.item_cp_req_completed == True].items_id.astype(str)
+        assert sorted(items[items.completed].items_id.astype(str)) == sorted(completed)
+
+
+def test_unknown_student(course):
+    _, dataset = course
+    assert dataset.student_index.student_modules("missing").empty
+    assert dataset.student_index.student_items("missing").empty